@@ -0,0 +1,436 @@
+"""
+Suíte de carga da API de cadastro_aluno.
+
+Cria um banco de teste (SQLite ou MySQL, conforme --settings), popula com um
+conjunto de dados de tamanho fixo, sobe a API de core.urls em um servidor
+WSGI local e dispara requisições concorrentes em TODAS as rotas de
+cadastro_aluno/api.py. Para cada rota mostra p50/p95/p99 e req/s e compara
+com a baseline gravada em benchmarks/baseline.json: se alguma rota piorar
+além da tolerância, o processo termina com código 1. Uma rota que sai da
+tolerância é medida de novo antes de contar como regressão, para não acusar
+picos isolados (GC, disco, outro processo na máquina).
+
+Uso (a partir de backend/):
+    python benchmarks/carga.py                            # SQLite, compara com a baseline
+    python benchmarks/carga.py --salvar-baseline          # grava uma nova baseline
+    python benchmarks/carga.py --settings core.settings   # MySQL (cria o banco test_<NAME>)
+    python benchmarks/carga.py --rotas listar_disciplinas consultar_alunos
+
+A baseline só vale para a máquina em que foi gerada: ao trocar de máquina
+(ou de CI), grave uma nova com --salvar-baseline antes de comparar.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from pathlib import Path
+from socketserver import ThreadingMixIn
+from urllib.parse import quote
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+BACKEND = Path(__file__).resolve().parent.parent
+BASELINE = Path(__file__).resolve().parent / "baseline.json"
+PREFIXO = "/api/v1/cadastro_aluno/"
+
+ESTADOS = {
+    "SP": "Sudeste", "RJ": "Sudeste", "MG": "Sudeste", "ES": "Sudeste",
+    "PR": "Sul", "SC": "Sul", "RS": "Sul",
+    "BA": "Nordeste", "PE": "Nordeste", "CE": "Nordeste",
+    "GO": "Centro-Oeste", "DF": "Centro-Oeste", "AM": "Norte", "PA": "Norte",
+}
+NOMES = ["João", "Maria", "José", "Ana", "Antônio", "Francisca", "Luís", "Márcia", "Pedro", "Lúcia",
+         "Paulo", "Sônia", "Carlos", "Patrícia", "Gabriel", "Letícia", "Rafael", "Cecília", "André", "Inês"]
+SOBRENOMES = ["Silva", "Santos", "Oliveira", "Souza", "Rodrigues", "Ferreira", "Alves", "Pereira",
+              "Lima", "Gomes", "Ribeiro", "Araújo", "Conceição", "Gonçalves", "Simões", "Magalhães"]
+
+
+##################### Banco e dados #################################
+def criar_banco():
+    """
+    Cria o banco de teste do alias 'default' (como o runner de testes do Django)
+    e devolve o nome original, para destruir no fim.
+    """
+    from django.db import connection
+
+    if connection.vendor == "sqlite":
+        # Arquivo temporário em vez do SQLite em memória: o servidor atende
+        # cada requisição em uma thread, com a sua própria conexão.
+        arquivo = Path(tempfile.mkdtemp(prefix="carga-")) / "carga.sqlite3"
+        connection.settings_dict.setdefault("TEST", {})["NAME"] = str(arquivo)
+    nome_original = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    return nome_original
+
+
+def destruir_banco(nome_original):
+    from django.db import connection
+
+    connection.creation.destroy_test_db(nome_original, verbosity=0)
+
+
+def popular(args, reserva):
+    """
+    Popula o banco com um conjunto de dados determinístico (--semente) e
+    separa 'reserva' registros descartáveis por tabela para as rotas de DELETE.
+    """
+    from cadastro_aluno import busca, estatisticas
+    from cadastro_aluno.models import TbAlunos, TbDisciplinas, TbEnderecos, TbNotas, TbTarefas
+
+    rng = random.Random(args.semente)
+    lote = 2000
+    siglas = list(ESTADOS)
+
+    def endereco(i, prefixo):
+        estado = siglas[i % len(siglas)]
+        return TbEnderecos(
+            cep=f"{prefixo}{i:04d}-{i % 1000:03d}", endereco=f"Rua {i}", bairro=f"Bairro {i % 50}",
+            cidade=f"Cidade {estado}-{i % 20}", estado=estado, regiao=ESTADOS[estado],
+        )
+
+    TbEnderecos.objects.bulk_create([endereco(i, "0") for i in range(args.enderecos)], batch_size=lote)
+    TbEnderecos.objects.bulk_create([endereco(i, "9") for i in range(reserva)], batch_size=lote)
+    TbDisciplinas.objects.bulk_create([
+        TbDisciplinas(disciplina=f"Disciplina {i}", carga=rng.choice([40, 60, 80]), semestre=i % 10 + 1)
+        for i in range(args.disciplinas + reserva)
+    ], batch_size=lote)
+
+    ids_enderecos = list(TbEnderecos.objects.filter(cep__startswith="0").order_by("id").values_list("id", flat=True))
+    ids_disciplinas = list(TbDisciplinas.objects.order_by("id").values_list("id", flat=True))
+    disciplinas, disciplinas_reserva = ids_disciplinas[:args.disciplinas], ids_disciplinas[args.disciplinas:]
+
+    TbAlunos.objects.bulk_create([
+        TbAlunos(
+            matricula=f"B{i:07d}", nome=f"{rng.choice(NOMES)} {rng.choice(SOBRENOMES)} {rng.choice(SOBRENOMES)}",
+            email=f"aluno{i}@exemplo.com", endereco_id=rng.choice(ids_enderecos), nome_mae=f"{rng.choice(NOMES)} {rng.choice(SOBRENOMES)}",
+        )
+        for i in range(args.alunos + reserva)
+    ], batch_size=lote)
+    ids_alunos = list(TbAlunos.objects.order_by("id").values_list("id", flat=True))
+    alunos, alunos_reserva = ids_alunos[:args.alunos], ids_alunos[args.alunos:]
+
+    notas = [
+        TbNotas(aluno_id=aluno_id, disciplina_id=rng.choice(disciplinas), nota=Decimal(rng.randint(0, 1000)) / 100)
+        for aluno_id in alunos
+        for _ in range(args.notas_por_aluno)
+    ]
+    TbNotas.objects.bulk_create(notas, batch_size=lote)
+    ids_notas = list(TbNotas.objects.order_by("id").values_list("id", flat=True))
+    # bulk_create não dispara post_save: o índice de busca e o resumo das
+    # notas são montados de uma vez.
+    busca.reconstruir()
+    estatisticas.recalcular(None)
+    TbTarefas.objects.bulk_create([
+        TbTarefas(tipo="inserir_lote", estado=TbTarefas.CONCLUIDA, processados=100, total=100,
+                  resultado={"criados": 100, "com_erro": 0, "resultados": []})
+        for _ in range(50)
+    ])
+
+    return {
+        "alunos": alunos,
+        "enderecos": ids_enderecos,
+        "disciplinas": disciplinas,
+        "notas": ids_notas[reserva:],
+        "tarefas": list(TbTarefas.objects.values_list("id", flat=True)),
+        "nomes": [n.split()[1] for n in TbAlunos.objects.filter(id__in=alunos[:50]).values_list("nome", flat=True)],
+        # Registros que podem ser apagados, um por requisição de DELETE.
+        "reserva": {
+            "alunos": alunos_reserva,
+            "enderecos": list(TbEnderecos.objects.filter(cep__startswith="9").order_by("id").values_list("id", flat=True)),
+            "disciplinas": disciplinas_reserva,
+            "notas": ids_notas[:reserva],
+        },
+    }
+
+
+##################### Cenários #################################
+# Um cenário por handler de cadastro_aluno/api.py (chave = nome da função).
+# Cada um recebe os ids do banco populado e o número da requisição e devolve
+# (método, caminho relativo a PREFIXO, corpo JSON ou None).
+def _um(lista, i):
+    return lista[i % len(lista)]
+
+
+def _arquivo_csv(conteudo, campo="arquivo"):
+    """
+    Corpo multipart/form-data com um único arquivo CSV.
+    """
+    fronteira = "----carga"
+    corpo = (
+        f"--{fronteira}\r\n"
+        f'Content-Disposition: form-data; name="{campo}"; filename="dados.csv"\r\n'
+        "Content-Type: text/csv\r\n\r\n"
+        f"{conteudo}\r\n--{fronteira}--\r\n"
+    )
+    return corpo.encode(), f"multipart/form-data; boundary={fronteira}"
+
+
+CENARIOS = {
+    # Disciplinas
+    "consulta_disciplinas_por_ids": lambda d, i: ("GET", "disciplinas-por-ids?ids=" + ",".join(str(_um(d['disciplinas'], i * 20 + j)) for j in range(20)), None),
+    "consulta_discplina": lambda d, i: ("GET", f"disciplina-por-id/{_um(d['disciplinas'], i)}", None),
+    "consulta_disciplinas_por_semestre": lambda d, i: ("GET", f"disciplina-por-semestre/{i % 10 + 1}", None),
+    "listar_disciplinas": lambda d, i: ("GET", "disciplinas", None),
+    "estatisticas_cache_disciplinas": lambda d, i: ("GET", "estatisticas-cache-disciplinas", None),
+    "inserir_disciplina": lambda d, i: ("POST", "inserir-disciplina/", {"disciplina": f"Nova {i}", "carga": 60, "semestre": 1}),
+    "inserir_disciplinas_lote": lambda d, i: ("POST", "inserir-disciplinas-lote/", [
+        {"disciplina": f"Lote {i}-{j}", "carga": 60, "semestre": 2} for j in range(20)
+    ]),
+    "atualizar_disciplina": lambda d, i: ("PUT", f"atualizar-disciplina/{_um(d['disciplinas'], i)}", {"carga": 40 + i % 3 * 20}),
+    "atualizar_disciplinas_lote": lambda d, i: ("PATCH", "atualizar-disciplinas-lote/", [
+        {"id": _um(d["disciplinas"], i * 10 + j), "carga": 40 + (i + j) % 3 * 20} for j in range(10)
+    ]),
+    "deletar_disciplina": lambda d, i: ("DELETE", f"deletar-disciplina/{d['reserva']['disciplinas'][i]}", None),
+    # Endereços
+    "consulta_enderecos_por_ids": lambda d, i: ("GET", "enderecos-por-ids?ids=" + ",".join(str(_um(d['enderecos'], i * 50 + j)) for j in range(50)), None),
+    "consultar_alunos_por_localidade": lambda d, i: ("GET", "alunos-por-localidade" + ("?estado=SP" if i % 2 else ""), None),
+    "consulta_enderecos": lambda d, i: ("GET", f"enderecos-por-id/{_um(d['enderecos'], i)}", None),
+    "consulta_enderecos_por_estado": lambda d, i: ("GET", f"enderecos-por-estado/{_um(list(ESTADOS), i)}", None),
+    "consulta_enderecos_por_cep": lambda d, i: ("GET", f"enderecos-por-cep/0{i % 100:02d}", None),
+    "inserir_endereco": lambda d, i: ("POST", "inserir-endereco/", {
+        "cep": f"1{i:04d}-000", "endereco": "Rua Nova", "cidade": "São Paulo", "estado": "SP",
+    }),
+    "inserir_enderecos_lote": lambda d, i: ("POST", "inserir-enderecos-lote/", [
+        {"cep": f"2{i:04d}-{j:03d}", "endereco": "Rua Lote", "cidade": "Recife", "estado": "PE"} for j in range(20)
+    ]),
+    "atualizar_endereco": lambda d, i: ("PUT", f"atualizar-enderecos/{_um(d['enderecos'], i)}", {"bairro": f"Centro {i}"}),
+    "atualizar_enderecos_lote": lambda d, i: ("PATCH", "atualizar-enderecos-lote/", [
+        {"id": _um(d["enderecos"], i * 50 + j), "bairro": f"Centro {j}"} for j in range(50)
+    ]),
+    "deletar_endereco": lambda d, i: ("DELETE", f"deletar-endereco/{d['reserva']['enderecos'][i]}", None),
+    # Alunos
+    "consultar_alunos": lambda d, i: ("GET", f"consultar-alunos?limite=100&cursor={_um(d['alunos'], i * 97)}", None),
+    "consultar_alunos_por_ids": lambda d, i: ("GET", "alunos-por-ids?ids=" + ",".join(str(_um(d['alunos'], i * 50 + j)) for j in range(50)), None),
+    "consultar_aluno_id": lambda d, i: ("GET", f"aluno-por-id/{_um(d['alunos'], i)}", None),
+    "consultar_aluno_detalhe": lambda d, i: ("GET", f"aluno-detalhe/{_um(d['alunos'], i)}", None),
+    "consultar_alunos_detalhe": lambda d, i: ("GET", f"consultar-alunos-detalhe?limite=100&cursor={_um(d['alunos'], i * 97)}", None),
+    "consultar_alunos_por_nome": lambda d, i: ("GET", f"alunos-por-nome/{_um(d['nomes'], i)}", None),
+    "exportar_alunos": lambda d, i: ("GET", f"exportar-alunos?formato={('csv', 'ndjson')[i % 2]}&estado={_um(list(ESTADOS), i)}", None),
+    "atualizar_aluno": lambda d, i: ("PUT", f"atualizar-aluno/{_um(d['alunos'], i)}", {"nome": f"Aluno Atualizado {i}"}),
+    "atualizar_alunos_lote": lambda d, i: ("PATCH", "atualizar-alunos-lote/", [
+        {"id": _um(d["alunos"], i * 50 + j), "email": f"lote{i}x{j}@escola.br"} for j in range(50)
+    ]),
+    "deletar_aluno": lambda d, i: ("DELETE", f"deletar-alunos/{d['reserva']['alunos'][i]}", None),
+    "inserir_aluno": lambda d, i: ("POST", "inserir-aluno/", {"matricula": f"N{i:07d}", "nome": f"Aluno Novo {i}"}),
+    "inserir_alunos_lote": lambda d, i: ("POST", "inserir-alunos-lote/", [
+        {"matricula": f"L{i:05d}{j:02d}", "nome": f"Aluno Lote {i} {j}"} for j in range(20)
+    ]),
+    "importar_csv": lambda d, i: ("POST", "importar-csv/alunos", _arquivo_csv(
+        "matricula,nome,email\n" + "".join(f"I{i:05d}{j:02d},Aluno Importado {j},i{i}x{j}@escola.br\n" for j in range(50))
+    )),
+    # Notas
+    "consultar_nota_id": lambda d, i: ("GET", f"nota-por-id/{_um(d['notas'], i)}", None),
+    "consultar_notas_por_aluno": lambda d, i: ("GET", f"notas-por-aluno/{_um(d['alunos'], i)}", None),
+    "consultar_notas_por_disciplina": lambda d, i: ("GET", f"notas-por-disciplina/{_um(d['disciplinas'], i)}", None),
+    "inserir_nota": lambda d, i: ("POST", "inserir-nota/", {
+        "aluno_id": _um(d["alunos"], i), "disciplina_id": _um(d["disciplinas"], i), "nota": "7.5",
+    }),
+    "atualizar_nota": lambda d, i: ("PUT", f"atualizar-nota/{_um(d['notas'], i)}", {"nota": str(i % 11)}),
+    "deletar_nota": lambda d, i: ("DELETE", f"deletar-nota/{d['reserva']['notas'][i]}", None),
+    "consultar_boletim": lambda d, i: ("GET", f"boletim?aluno_id={_um(d['alunos'], i)}", None),
+    "consultar_estatisticas_disciplina": lambda d, i: ("GET", f"estatisticas-disciplina/{_um(d['disciplinas'], i)}", None),
+    "consultar_estatisticas_semestre": lambda d, i: ("GET", f"estatisticas-semestre/{i % 10 + 1}", None),
+    "consultar_ranking": lambda d, i: ("GET", f"ranking?semestre={i % 10 + 1}&n={(10, 50)[i % 2]}", None),
+    # Tarefas (só o enfileiramento e a consulta; a execução fica no pool do servidor)
+    "enfileirar_inserir_lote": lambda d, i: ("POST", "tarefas/inserir-lote/alunos", [
+        {"matricula": f"J{i:05d}{j:02d}", "nome": f"Aluno Tarefa {i} {j}"} for j in range(20)
+    ]),
+    "enfileirar_importar_csv": lambda d, i: ("POST", "tarefas/importar-csv/alunos", _arquivo_csv(
+        "matricula,nome\n" + "".join(f"K{i:05d}{j:02d},Aluno Importado {j}\n" for j in range(50))
+    )),
+    "enfileirar_deletar_alunos": lambda d, i: ("POST", "tarefas/deletar-alunos", [10**9 + i * 20 + j for j in range(20)]),
+    "consultar_tarefa": lambda d, i: ("GET", f"tarefas/{_um(d['tarefas'], i)}", None),
+}
+
+
+def rotas_sem_cenario():
+    from cadastro_aluno.api import router
+
+    handlers = {op.view_func.__name__ for pv in router.path_operations.values() for op in pv.operations}
+    return sorted(handlers - set(CENARIOS))
+
+
+##################### Servidor e carga #################################
+class _Servidor(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+class _Silencioso(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def subir_servidor():
+    from django.conf import settings
+    from django.core.wsgi import get_wsgi_application
+
+    settings.ALLOWED_HOSTS = ["127.0.0.1", "localhost"]
+    # A carga toda vem de um cliente só; o que se mede aqui são as rotas, e
+    # não os limites por cliente do core/admissao.py.
+    settings.ADMISSAO_ATIVA = False
+    # Pelo mesmo motivo, sem o limite da fila de tarefas: as requisições de
+    # enfileiramento chegam bem mais rápido do que as tarefas terminam.
+    settings.TAREFAS_FILA_MAXIMA = 10**6
+    servidor = make_server("127.0.0.1", 0, get_wsgi_application(), _Servidor, _Silencioso)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+def _requisitar(base, metodo, caminho, corpo):
+    if isinstance(corpo, tuple):
+        dados, content_type = corpo  # corpo já codificado (ex: _arquivo_csv)
+    else:
+        dados = None if corpo is None else json.dumps(corpo).encode()
+        content_type = "application/json"
+    pedido = urllib.request.Request(base + quote(caminho, safe="/?=&"), data=dados, method=metodo,
+                                    headers={"Content-Type": content_type})
+    inicio = time.perf_counter()
+    try:
+        with urllib.request.urlopen(pedido) as resposta:
+            resposta.read()
+            status = resposta.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    return time.perf_counter() - inicio, status
+
+
+def _percentil(ordenadas, p):
+    return ordenadas[max(0, math.ceil(p * len(ordenadas)) - 1)]
+
+
+def medir_rota(base, cenario, dados, requisicoes, concorrencia, rodada=0):
+    # Cada rodada usa índices novos: inserts não repetem matrícula/cep e
+    # DELETEs não repetem registro.
+    deslocamento = rodada * requisicoes
+    metodo = cenario(dados, 0)[0]
+    if metodo == "GET":
+        # Aquecimento (caches, imports preguiçosos); só em leituras, para não
+        # gastar os registros descartáveis das rotas de escrita.
+        for i in range(min(10, requisicoes)):
+            _requisitar(base, *cenario(dados, i))
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+        medidas = list(executor.map(lambda i: _requisitar(base, *cenario(dados, i)),
+                                    range(deslocamento, deslocamento + requisicoes)))
+    duracao = time.perf_counter() - inicio
+
+    latencias = sorted(m[0] for m in medidas)
+    return {
+        "p50_ms": round(_percentil(latencias, 0.50) * 1000, 2),
+        "p95_ms": round(_percentil(latencias, 0.95) * 1000, 2),
+        "p99_ms": round(_percentil(latencias, 0.99) * 1000, 2),
+        "req_s": round(requisicoes / duracao, 1),
+        "erros": sum(1 for m in medidas if m[1] >= 400),
+    }
+
+
+##################### Baseline #################################
+def comparar(atual, anterior, tolerancia):
+    """
+    Motivos pelos quais a rota piorou além da tolerância (p95 maior ou req/s menor).
+    """
+    motivos = []
+    if atual["p95_ms"] > anterior["p95_ms"] * (1 + tolerancia):
+        motivos.append(f"p95 {anterior['p95_ms']} -> {atual['p95_ms']} ms")
+    if atual["req_s"] < anterior["req_s"] * (1 - tolerancia):
+        motivos.append(f"{anterior['req_s']} -> {atual['req_s']} req/s")
+    return motivos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--settings", default="core.settings_sqlite",
+                        help="módulo de settings (core.settings_sqlite ou core.settings para MySQL)")
+    parser.add_argument("--alunos", type=int, default=5000)
+    parser.add_argument("--enderecos", type=int, default=1000)
+    parser.add_argument("--disciplinas", type=int, default=60)
+    parser.add_argument("--notas-por-aluno", type=int, default=6)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--requisicoes", type=int, default=200, help="requisições por rota")
+    parser.add_argument("--concorrencia", type=int, default=10)
+    parser.add_argument("--rotas", nargs="*", help="só estas rotas (nomes dos handlers)")
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--salvar-baseline", action="store_true")
+    parser.add_argument("--tolerancia", type=float, default=0.50,
+                        help="piora relativa aceita em p95 e req/s antes de falhar (0.50 = 50%%)")
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(BACKEND))
+    os.environ["DJANGO_SETTINGS_MODULE"] = args.settings
+    import django
+    django.setup()
+
+    faltando = rotas_sem_cenario()
+    if faltando:
+        print(f"Rotas de cadastro_aluno/api.py sem cenário em benchmarks/carga.py: {', '.join(faltando)}")
+        return 2
+    rotas = args.rotas or list(CENARIOS)
+
+    parametros = {k: getattr(args, k) for k in
+                  ("alunos", "enderecos", "disciplinas", "notas_por_aluno", "semente", "requisicoes", "concorrencia")}
+    baseline = None
+    if not args.salvar_baseline and args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text())
+        if baseline["parametros"] != parametros:
+            print("A baseline foi gravada com outros parâmetros; comparação ignorada.")
+            baseline = None
+
+    nome_original = criar_banco()
+    regressoes = []
+    try:
+        inicio = time.perf_counter()
+        # Reserva para duas rodadas: a medição e uma eventual repetição.
+        dados = popular(args, reserva=args.requisicoes * 2)
+        print(f"Banco populado em {time.perf_counter() - inicio:.1f}s ({parametros})")
+        servidor = subir_servidor()
+        base = f"http://127.0.0.1:{servidor.server_port}{PREFIXO}"
+
+        resultados = {}
+        print(f"{'rota':34} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8} {'erros':>6}")
+        for rota in rotas:
+            r = medir_rota(base, CENARIOS[rota], dados, args.requisicoes, args.concorrencia)
+            anterior = baseline and baseline["rotas"].get(rota)
+            if anterior and comparar(r, anterior, args.tolerancia):
+                # Uma rodada ruim isolada costuma ser ruído (GC, disco, outro
+                # processo): só conta como regressão se repetir.
+                r = medir_rota(base, CENARIOS[rota], dados, args.requisicoes, args.concorrencia, rodada=1)
+                regressoes.extend(f"{rota}: {motivo}" for motivo in comparar(r, anterior, args.tolerancia))
+            resultados[rota] = r
+            print(f"{rota:34} {r['p50_ms']:8.2f} {r['p95_ms']:8.2f} {r['p99_ms']:8.2f} {r['req_s']:8.1f} {r['erros']:6d}")
+        servidor.shutdown()
+    finally:
+        destruir_banco(nome_original)
+
+    codigo = 0
+    com_erro = [rota for rota, r in resultados.items() if r["erros"]]
+    if com_erro:
+        print(f"Rotas com respostas de erro: {', '.join(com_erro)}")
+        codigo = 1
+
+    if args.salvar_baseline:
+        args.baseline.write_text(json.dumps({"parametros": parametros, "rotas": resultados}, indent=2) + "\n")
+        print(f"Baseline gravada em {args.baseline}")
+    elif baseline:
+        for regressao in regressoes:
+            print(f"REGRESSÃO {regressao}")
+        if regressoes:
+            codigo = 1
+        else:
+            print(f"Sem regressões em relação à baseline (tolerância {args.tolerancia:.0%}).")
+    elif not args.baseline.exists():
+        print(f"Sem baseline em {args.baseline}; grave uma com --salvar-baseline.")
+    return codigo
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""
+Custo de serialização das respostas de listagem, em ms por 10 mil linhas.
+
+Compara, para cada schema de listagem:
+  - ninja padrão:        validação pydantic linha a linha + json (NinjaJSONEncoder)
+  - pydantic + rápido:   validação pydantic + core.renderizacao.dumps (orjson se instalado)
+  - confiável + rápido:  linhas do ORM direto no dumps (API_SAIDA_CONFIAVEL=True)
+
+As linhas são sintéticas, no mesmo formato dos .values() das rotas, então
+não é preciso banco. Uso (a partir de backend/):
+    python benchmarks/serializacao.py --linhas 10000 --repeticoes 7
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from decimal import Decimal
+from pathlib import Path
+from typing import List
+
+BACKEND = Path(__file__).resolve().parent.parent
+
+
+def linhas_exemplo(n):
+    return {
+        "AlunosSchema": [
+            {"id": i, "matricula": f"{i:08d}", "nome": f"Aluno Número {i}", "email": f"aluno{i}@escola.br",
+             "endereco_id": i % 500 or None, "nome_mae": None if i % 3 else f"Mãe {i}"}
+            for i in range(n)
+        ],
+        "DisciplinaCompletaSchema": [
+            {"id": i, "disciplina": f"Disciplina {i}", "carga": 60, "semestre": i % 10 + 1} for i in range(n)
+        ],
+        "EnderecoCompletoSchema": [
+            {"id": i, "cep": f"{i:05d}-000", "endereco": f"Rua {i}", "bairro": None, "cidade": "São Paulo",
+             "estado": "SP", "regiao": "Sudeste"}
+            for i in range(n)
+        ],
+        "NotaSchema": [
+            {"id": i, "aluno_id": i // 6, "disciplina_id": i % 60, "nota": Decimal(f"{i % 10}.{i % 100:02d}")}
+            for i in range(n)
+        ],
+    }
+
+
+def medir(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--linhas", type=int, default=10000)
+    parser.add_argument("--repeticoes", type=int, default=7)
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(BACKEND))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+    import django
+
+    django.setup()
+    from ninja.responses import NinjaJSONEncoder
+    from pydantic import create_model
+
+    from cadastro_aluno import schemas
+    from core import renderizacao
+
+    print(f"encoder rápido: {'orjson' if renderizacao.orjson else 'json (orjson não instalado)'}")
+    print(f"{'schema':26} {'ninja padrão':>14} {'pydantic+rápido':>16} {'confiável+rápido':>17}   (ms por 10 mil linhas)")
+    for nome, linhas in linhas_exemplo(args.linhas).items():
+        # O ninja valida a resposta inteira como o campo 'response' de um modelo.
+        resposta = create_model(f"Resposta{nome}", response=(List[getattr(schemas, nome)], ...))
+
+        def validar():
+            return resposta.model_validate({"response": linhas}).model_dump()["response"]
+
+        padrao = medir(lambda: json.dumps(validar(), cls=NinjaJSONEncoder), args.repeticoes)
+        pydantic_rapido = medir(lambda: renderizacao.dumps(validar()), args.repeticoes)
+        confiavel = medir(lambda: renderizacao.dumps(linhas), args.repeticoes)
+        escala = 10000 / args.linhas * 1000
+        print(f"{nome:26} {padrao * escala:14.1f} {pydantic_rapido * escala:16.1f} {confiavel * escala:17.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Compara a vazão (req/s) do caminho WSGI (handlers síncronos) com o caminho
+ASGI (handlers async em /cadastro_aluno/async/) sob requisições concorrentes.
+
+Sobe cada servidor em um subprocesso, dispara as mesmas requisições nos dois
+e imprime req/s e latências p50/p95. Usa o banco de DJANGO_SETTINGS_MODULE
+(por padrão core.settings), então rode com o banco de desenvolvimento no ar.
+
+Uso (a partir de backend/):
+    python benchmarks/wsgi_vs_asgi.py --rota "consultar-alunos?limite=50" \
+        --concorrencia 50 --requisicoes 2000
+
+Requer o uvicorn (pip install "backend-django[asgi]" ou uv sync --extra asgi).
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parent.parent
+
+SERVIDOR_WSGI = """
+import os, sys
+sys.path.insert(0, {backend!r})
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIServer, WSGIRequestHandler, make_server
+from core.wsgi import application
+
+class Servidor(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+class Silencioso(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+make_server("127.0.0.1", {porta}, application, Servidor, Silencioso).serve_forever()
+"""
+
+
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def esperar_porta(porta, timeout=30):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        try:
+            with socket.create_connection(("127.0.0.1", porta), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"servidor não subiu na porta {porta}")
+
+
+def subir_servidor(modo, porta):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(BACKEND), os.environ.get("PYTHONPATH")])))
+    if modo == "wsgi":
+        comando = [sys.executable, "-c", SERVIDOR_WSGI.format(backend=str(BACKEND), porta=porta)]
+    else:
+        comando = [sys.executable, "-m", "uvicorn", "core.asgi:application",
+                   "--port", str(porta), "--log-level", "warning", "--no-access-log"]
+    processo = subprocess.Popen(comando, cwd=BACKEND, env=env)
+    esperar_porta(porta)
+    return processo
+
+
+def disparar(url, concorrencia, requisicoes):
+    def uma(_):
+        inicio = time.perf_counter()
+        with urllib.request.urlopen(url) as resposta:
+            resposta.read()
+        return time.perf_counter() - inicio
+
+    # Aquecimento: conexões com o banco, imports preguiçosos, caches.
+    for _ in range(min(20, requisicoes)):
+        uma(None)
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+        latencias = sorted(executor.map(uma, range(requisicoes)))
+    duracao = time.perf_counter() - inicio
+    return {
+        "req_s": requisicoes / duracao,
+        "p50_ms": statistics.median(latencias) * 1000,
+        "p95_ms": latencias[int(len(latencias) * 0.95) - 1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rota", default="consultar-alunos?limite=50",
+                        help="rota relativa a /api/v1/cadastro_aluno/ (e a /async/ no ASGI)")
+    parser.add_argument("--concorrencia", type=int, default=50)
+    parser.add_argument("--requisicoes", type=int, default=2000)
+    args = parser.parse_args()
+
+    caminhos = {
+        "wsgi": f"/api/v1/cadastro_aluno/{args.rota}",
+        "asgi": f"/api/v1/cadastro_aluno/async/{args.rota}",
+    }
+    print(f"rota={args.rota} concorrencia={args.concorrencia} requisicoes={args.requisicoes}")
+    for modo, caminho in caminhos.items():
+        porta = porta_livre()
+        processo = subir_servidor(modo, porta)
+        try:
+            r = disparar(f"http://127.0.0.1:{porta}{caminho}", args.concorrencia, args.requisicoes)
+        finally:
+            processo.terminate()
+            processo.wait()
+        print(f"{modo}: {r['req_s']:8.1f} req/s   p50 {r['p50_ms']:7.1f} ms   p95 {r['p95_ms']:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
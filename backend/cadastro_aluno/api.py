@@ -1,28 +1,134 @@
+import csv
+import io
+import json
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch
+from django.http import JsonResponse, StreamingHttpResponse
 from ninja.errors import HttpError
-from ninja import Router
-from typing import List
+from ninja import Body, File, Router
+from ninja.decorators import decorate_view
+from ninja.files import UploadedFile
+from typing import List, Optional
+from cadastro_aluno import busca, estatisticas, exportacao, geografia, importacao, ranking, tarefas
+from cadastro_aluno.boletim import montar_boletim
+from cadastro_aluno.cache import cache_disciplinas
+from cadastro_aluno.etag import condicional
+from cadastro_aluno.indice_cep import indice_cep, normalizar_cep
+from cadastro_aluno.lote import atualizar_em_lote, inserir_em_lote
 from cadastro_aluno.models import (
     TbAlunos,
     TbDisciplinas,
-    TbEnderecos
+    TbEnderecos,
+    TbEstatisticasDisciplina,
+    TbNotas,
+    TbTarefas
 )
+from cadastro_aluno.signals import registros_alterados
+from core.renderizacao import dumps, saida_confiavel
 router = Router()
 from cadastro_aluno.schemas import (
     AlunosSchema,
+    AlunosPaginaSchema,
+    AlunosPorIdsSchema,
+    AlunoDetalheSchema,
+    AlunosDetalhePaginaSchema,
     AlunoCreateSchema,
     AlunoUpdateSchema,
     DisciplinaUpdateSchema,
     DisciplinaCompletaSchema,
     DisciplinaSchema,
     DisciplinaCreateSchema,
+    DisciplinasPorIdsSchema,
     EnderecoCompletoSchema,
+    EstatisticasCacheSchema,
+    EstatisticasDisciplinaSchema,
+    EstatisticasSemestreSchema,
     EnderecoCreateSchema,
     EnderecoUpdateSchema,
-    MensagemErro)
+    EnderecosPorIdsSchema,
+    AlunosPorLocalidadeSchema,
+    MensagemErro,
+    NotaSchema,
+    NotaCreateSchema,
+    RankingAlunoSchema,
+    TarefaSchema,
+    NotaUpdateSchema,
+    BoletimAlunoSchema,
+    RelatorioLoteSchema,
+    RelatorioAtualizacaoLoteSchema,
+    ImportacaoCsvSchema)
+
+
+def _relatorio_lote(modelo, schema, itens, campo_unico=None):
+    """
+    Monta a resposta dos endpoints de inserção em lote.
+    """
+    if len(itens) > settings.LOTE_MAXIMO_ITENS:
+        return 400, {"mensagem": f"O lote aceita no máximo {settings.LOTE_MAXIMO_ITENS} itens."}
+    try:
+        resultados = inserir_em_lote(modelo, schema, itens, campo_unico)
+    except Exception as e:
+        return 400, {"mensagem": f"Erro ao gravar o lote: {e}"}
+    criados = sum(1 for r in resultados if r["erro"] is None)
+    return {"criados": criados, "com_erro": len(resultados) - criados, "resultados": resultados}
+
+def _relatorio_atualizacao_lote(modelo, schema, itens):
+    """
+    Monta a resposta dos endpoints de atualização em lote.
+    """
+    if len(itens) > settings.LOTE_MAXIMO_ITENS:
+        return 400, {"mensagem": f"O lote aceita no máximo {settings.LOTE_MAXIMO_ITENS} itens."}
+    try:
+        resultados, atualizados = atualizar_em_lote(modelo, schema, itens)
+    except Exception as e:
+        # Ex: matrícula/CEP duplicado. A transação inteira é desfeita.
+        return 400, {"mensagem": f"Erro ao atualizar o lote: {e}"}
+    com_erro = sum(1 for r in resultados if r["erro"] is not None)
+    return {"atualizados": atualizados, "com_erro": com_erro, "resultados": resultados}
+
+def _ids_da_consulta(ids):
+    """
+    Converte '?ids=3,1,3' em [3, 1]: sem repetidos, na ordem pedida, no
+    máximo settings.CONSULTA_IDS_MAXIMO ids.
+    """
+    try:
+        lista = list(dict.fromkeys(int(i) for i in ids.split(",") if i.strip()))
+    except ValueError:
+        raise ValueError("'ids' deve ser uma lista de números separados por vírgula.")
+    if not lista:
+        raise ValueError("Informe ao menos um id em 'ids'.")
+    if len(lista) > settings.CONSULTA_IDS_MAXIMO:
+        raise ValueError(f"No máximo {settings.CONSULTA_IDS_MAXIMO} ids por consulta.")
+    return lista
+
+def _por_ids(request, modelo, schema, ids):
+    """
+    Registros dos 'ids' indexados pelo id (uma consulta com IN) e os
+    ids que não existem.
+    """
+    try:
+        lista = _ids_da_consulta(ids)
+    except ValueError as e:
+        return 400, {"mensagem": str(e)}
+    campos = dict.fromkeys(("id", *schema.model_fields))
+    # Não usa in_bulk: até o Django 5.2 ele não aceita QuerySets com .values().
+    encontrados = {registro["id"]: registro for registro in modelo.objects.filter(id__in=lista).values(*campos)}
+    itens = {i: encontrados[i] for i in lista if i in encontrados}
+    nao_encontrados = [i for i in lista if i not in encontrados]
+    return saida_confiavel({"itens": itens, "nao_encontrados": nao_encontrados})
 
-    
 ##################### Disciplinas #################################
+@router.get("/disciplinas-por-ids", response={200: DisciplinasPorIdsSchema, 400: MensagemErro})
+@decorate_view(condicional(TbDisciplinas))
+def consulta_disciplinas_por_ids(request, ids: str):
+    """
+    Várias disciplinas de uma vez: ?ids=1,2,3. A resposta vem indexada pelo id.
+    """
+    return _por_ids(request, TbDisciplinas, DisciplinaCompletaSchema, ids)
+
 @router.get("/disciplina-por-id/{discplina_id}", response=list[DisciplinaCompletaSchema])
+@decorate_view(condicional(TbDisciplinas))
 def consulta_discplina(request, discplina_id: int):
     """
     Consulta uma disciplina específica por ID usando o ORM do Django.
@@ -32,7 +138,7 @@ def consulta_discplina(request, discplina_id: int):
         # .all().values() retorna um QuerySet de dicionários,
         qs = TbDisciplinas.objects.filter(id=discplina_id).all().values()
         
-        return list(qs)
+        return saida_confiavel(cache_disciplinas.obter(f"id:{discplina_id}", lambda: list(qs)))
         
     except Exception as e:
         return 400, {"mensagem": f"Erro ao consultar disciplina por id: {e}"}
@@ -41,26 +147,37 @@ def consulta_discplina(request, discplina_id: int):
             response=list[DisciplinaCompletaSchema], 
             summary= "Consulta de Disciplinas", 
             description="Consulta disciplinas por semestre.")
+@decorate_view(condicional(TbDisciplinas))
 def consulta_disciplinas_por_semestre(request, semestre: int):
     try:
         # Filtro seguro do ORM: .filter(semestre=semestre)
         # .all().values() para manter o padrão das suas outras APIs.
         qs = TbDisciplinas.objects.filter(semestre=semestre).all().values()
         
-        return list(qs)
+        return saida_confiavel(cache_disciplinas.obter(f"semestre:{semestre}", lambda: list(qs)))
         
     except Exception as e:
         return 400, {"mensagem": f"Erro ao consultar disciplinas por semestre: {e}"}
 
 # busca de disciplinas
 @router.get("/disciplinas", response=List[DisciplinaSchema])
+@decorate_view(condicional(TbDisciplinas))
 def listar_disciplinas(request):
     """
     Retorna uma lista de todas as disciplinas disponíveis 
     com seus IDs e nomes.
     """
     qs = TbDisciplinas.objects.all().values('id', 'disciplina')
-    return list(qs)
+    # O catálogo muda poucas vezes por semestre: a lista fica em cache
+    # e é invalidada pelas escritas em tb_disciplinas (ver signals.py).
+    return saida_confiavel(cache_disciplinas.obter("todas", lambda: list(qs)))
+
+@router.get("/estatisticas-cache-disciplinas", response=EstatisticasCacheSchema)
+def estatisticas_cache_disciplinas(request):
+    """
+    Acertos e faltas do cache do catálogo de disciplinas neste processo.
+    """
+    return cache_disciplinas.estatisticas()
 
 @router.post("/inserir-disciplina/")
 def inserir_disciplina(request, payload: DisciplinaCreateSchema):
@@ -79,6 +196,15 @@ def inserir_disciplina(request, payload: DisciplinaCreateSchema):
     
     except Exception as e:
         return 400, {"mensagem": f"Erro ao cadastrar disciplina: {e}"}
+
+@router.post("/inserir-disciplinas-lote/", response={200: RelatorioLoteSchema, 400: MensagemErro})
+def inserir_disciplinas_lote(request, itens: List[dict]):
+    """
+    Insere várias disciplinas de uma vez (bulk_create em uma transação).
+    Cada item é validado pelo 'DisciplinaCreateSchema'; os inválidos
+    aparecem com o erro no relatório e não impedem a gravação dos demais.
+    """
+    return _relatorio_lote(TbDisciplinas, DisciplinaCreateSchema, itens)
     
 @router.put("/atualizar-disciplina/{disciplina_id}")
 def atualizar_disciplina(request, disciplina_id: int, payload: DisciplinaUpdateSchema):
@@ -92,12 +218,21 @@ def atualizar_disciplina(request, disciplina_id: int, payload: DisciplinaUpdateS
 
     try:
         num_rows = TbDisciplinas.objects.filter(id=disciplina_id).update(**dados_para_atualizar)
+        registros_alterados.send(sender=TbDisciplinas, ids=[disciplina_id])
 
         return {"mensagem": "Disciplina atualizada com sucesso"}
     
     except Exception as e:
         return 400, {"mensagem": f"Erro ao atualizar disciplina: {e}"}    
     
+@router.patch("/atualizar-disciplinas-lote/", response={200: RelatorioAtualizacaoLoteSchema, 400: MensagemErro})
+def atualizar_disciplinas_lote(request, itens: List[dict]):
+    """
+    Atualiza várias disciplinas em uma requisição: [{"id": 1, "carga": 80}, ...].
+    Só os campos enviados em cada item são alterados.
+    """
+    return _relatorio_atualizacao_lote(TbDisciplinas, DisciplinaUpdateSchema, itens)
+
 @router.delete("/deletar-disciplina/{disciplina_id}") 
 def deletar_disciplina(request, disciplina_id: int):
     """
@@ -117,7 +252,16 @@ def deletar_disciplina(request, disciplina_id: int):
       
         return 400, {"mensagem": f"Erro ao deletar disciplina: {e}"}    
 ##################### ENDERECOS #################################
+@router.get("/enderecos-por-ids", response={200: EnderecosPorIdsSchema, 400: MensagemErro})
+@decorate_view(condicional(TbEnderecos))
+def consulta_enderecos_por_ids(request, ids: str):
+    """
+    Vários endereços de uma vez: ?ids=1,2,3. A resposta vem indexada pelo id.
+    """
+    return _por_ids(request, TbEnderecos, EnderecoCompletoSchema, ids)
+
 @router.get("/enderecos-por-id/{id}", response=list[EnderecoCompletoSchema])
+@decorate_view(condicional(TbEnderecos))
 def consulta_enderecos(request, id: int):
     """
     Consulta um endereço específico por ID usando o ORM do Django.
@@ -126,12 +270,13 @@ def consulta_enderecos(request, id: int):
 
         qs = TbEnderecos.objects.filter(id=id).all().values()
 
-        return list(qs)
+        return saida_confiavel(list(qs))
         
     except Exception as e:
         return 400, {"mensagem": f"Erro ao consultar endereço por id: {e}"}
     
 @router.get("/enderecos-por-estado/{estado}", response=list[EnderecoCompletoSchema])
+@decorate_view(condicional(TbEnderecos))
 def consulta_enderecos_por_estado(request, estado: str):
     """
     Consulta endereços por estado usando o ORM do Django.
@@ -140,11 +285,34 @@ def consulta_enderecos_por_estado(request, estado: str):
 
         qs = TbEnderecos.objects.filter(estado__iexact=estado).all().values()
         
-        return list(qs)
+        return saida_confiavel(list(qs))
         
     except Exception as e:
         return 400, {"mensagem": f"Erro ao consultar endereços por estado: {e}"}    
-    
+
+@router.get("/enderecos-por-cep/{prefixo}", response={200: list[EnderecoCompletoSchema], 400: MensagemErro})
+@decorate_view(condicional(TbEnderecos))
+def consulta_enderecos_por_cep(request, prefixo: str, limite: int = settings.BUSCA_LIMITE_PADRAO):
+    """
+    Autocomplete de CEP: endereços cujo CEP começa com 'prefixo' (com ou sem hífen),
+    em ordem de CEP. Responde do índice em memória, sem consultar o banco.
+    """
+    if not normalizar_cep(prefixo):
+        return 400, {"mensagem": "Informe ao menos um dígito do CEP."}
+    limite = max(1, min(limite, settings.BUSCA_LIMITE_MAXIMO))
+    return saida_confiavel(indice_cep.buscar(prefixo, limite))
+
+@router.get("/alunos-por-localidade", response=AlunosPorLocalidadeSchema,
+            description="Quantidade de alunos por região, estado e cidade do endereço.")
+@decorate_view(condicional(TbAlunos, TbEnderecos))
+def consultar_alunos_por_localidade(request, estado: Optional[str] = None):
+    """
+    Contagens de alunos por região, estado e cidade em uma resposta,
+    calculadas com um GROUP BY e mantidas em cache até um aluno ou endereço
+    mudar. 'estado' restringe as faixas a um estado.
+    """
+    return saida_confiavel(geografia.alunos_por_localidade(estado))
+
 @router.post("/inserir-endereco/")
 def inserir_endereco(request, payload: EnderecoCreateSchema):
     """
@@ -164,6 +332,14 @@ def inserir_endereco(request, payload: EnderecoCreateSchema):
     except Exception as e:
         return 400, {"mensagem": f"Erro ao cadastrar endereço: {e}"}    
 
+@router.post("/inserir-enderecos-lote/", response={200: RelatorioLoteSchema, 400: MensagemErro})
+def inserir_enderecos_lote(request, itens: List[dict]):
+    """
+    Insere vários endereços de uma vez (bulk_create em uma transação).
+    Itens inválidos ou com 'cep' já cadastrado são reportados por linha.
+    """
+    return _relatorio_lote(TbEnderecos, EnderecoCreateSchema, itens, campo_unico="cep")
+
 @router.put("/atualizar-enderecos/{endereco_id}")
 def atualizar_endereco(request, endereco_id: int, payload: EnderecoUpdateSchema):
     """
@@ -177,12 +353,22 @@ def atualizar_endereco(request, endereco_id: int, payload: EnderecoUpdateSchema)
     try:
  
         num_rows = TbEnderecos.objects.filter(id=endereco_id).update(**dados_para_atualizar)
+        # update() não dispara post_save: avisa o índice de CEPs.
+        registros_alterados.send(sender=TbEnderecos, ids=[endereco_id], campos=set(dados_para_atualizar))
 
         return {"mensagem": "Endereço atualizado com sucesso"}
     
     except Exception as e:
         return 400, {"mensagem": f"Erro ao atualizar endereço: {e}"}
     
+@router.patch("/atualizar-enderecos-lote/", response={200: RelatorioAtualizacaoLoteSchema, 400: MensagemErro})
+def atualizar_enderecos_lote(request, itens: List[dict]):
+    """
+    Atualiza vários endereços em uma requisição: [{"id": 1, "bairro": "Centro"}, ...].
+    Só os campos enviados em cada item são alterados.
+    """
+    return _relatorio_atualizacao_lote(TbEnderecos, EnderecoUpdateSchema, itens)
+
 @router.delete("deletar-endereco/{endereco_id}")
 def deletar_endereco(request, endereco_id: int):
     try:
@@ -194,23 +380,163 @@ def deletar_endereco(request, endereco_id: int):
     
 #################### ALUNOS ########################
 
-@router.get("/consultar-alunos")
-def consultar_alunos(request):
-    qs = TbAlunos.objects.all().values()
-    return list(qs)
+def _gerar_ndjson(blocos, campos):
+    """
+    Gera uma linha JSON por registro (NDJSON), bloco a bloco, sem montar a
+    lista em memória. 'blocos' vem de exportacao.blocos_de_linhas.
+    """
+    for bloco in blocos:
+        yield b"".join(dumps(dict(zip(campos, linha))) + b"\n" for linha in bloco)
+
+@router.get("/consultar-alunos", response=AlunosPaginaSchema)
+@decorate_view(condicional(TbAlunos))
+def consultar_alunos(request, cursor: Optional[int] = None,
+                     limite: int = settings.PAGINACAO_LIMITE_PADRAO,
+                     stream: bool = False):
+    """
+    Consulta os alunos paginando por cursor (keyset no id).
+    O 'cursor' é o 'proximo_cursor' devolvido pela página anterior.
+    Com stream=true devolve todos os alunos a partir do cursor em NDJSON.
+    """
+    # Ordenar por id e filtrar por id > cursor usa a chave primária,
+    # então o custo de cada página não cresce com o tamanho da tabela
+    # (ao contrário de OFFSET).
+    qs = TbAlunos.objects.order_by("id")
+    if cursor is not None:
+        qs = qs.filter(id__gt=cursor)
+    campos = list(AlunosSchema.model_fields)
+
+    if stream:
+        # Blocos de STREAMING_CHUNK_SIZE linhas por keyset, como na exportação:
+        # memória constante qualquer que seja o tamanho da tabela, também no
+        # MySQL (onde o .iterator() traria o resultado inteiro para o cliente).
+        blocos = exportacao.blocos_de_linhas(qs, caminhos=campos)
+        return StreamingHttpResponse(_gerar_ndjson(blocos, campos), content_type="application/x-ndjson")
+
+    limite = max(1, min(limite, settings.PAGINACAO_LIMITE_MAXIMO))
+    # Busca um item a mais só para saber se existe próxima página.
+    itens = list(qs.values(*campos)[:limite + 1])
+    proximo_cursor = None
+    if len(itens) > limite:
+        itens = itens[:limite]
+        proximo_cursor = itens[-1]["id"]
+    return saida_confiavel({"itens": itens, "proximo_cursor": proximo_cursor, "limite": limite})
 
 #consulta de alunos por id 
 @router.get("/aluno-por-id/{aluno_id}",response= list[AlunosSchema])
+@decorate_view(condicional(TbAlunos))
 def consultar_aluno_id(request,aluno_id:int):
-    qs = TbAlunos.objects.filter(id=aluno_id).all().values()
-    return list(qs)
+    # Só os campos do schema: a saída confiável não passa pelo filtro do pydantic.
+    qs = TbAlunos.objects.filter(id=aluno_id).values(*AlunosSchema.model_fields)
+    return saida_confiavel(list(qs))
+
+def _alunos_com_detalhes():
+    """
+    Alunos com o endereço (JOIN) e as notas com o nome da disciplina (uma
+    consulta extra para todos os alunos, com JOIN nas disciplinas): duas
+    consultas no total, qualquer que seja o número de alunos.
+    """
+    notas = TbNotas.objects.select_related("disciplina").order_by("disciplina_id", "id")
+    return TbAlunos.objects.select_related("endereco").prefetch_related(Prefetch("tbnotas_set", queryset=notas))
+
+def _detalhe_aluno(aluno):
+    # Monta o dicionário já no formato do AlunoDetalheSchema (usado direto
+    # pela saída confiável).
+    endereco = aluno.endereco
+    return {
+        "id": aluno.id,
+        "matricula": aluno.matricula,
+        "nome": aluno.nome,
+        "email": aluno.email,
+        "nome_mae": aluno.nome_mae,
+        "endereco": None if endereco is None else {
+            campo: getattr(endereco, campo) for campo in EnderecoCompletoSchema.model_fields
+        },
+        "notas": [
+            {
+                "id": nota.id,
+                "disciplina_id": nota.disciplina_id,
+                "disciplina": nota.disciplina.disciplina if nota.disciplina else None,
+                "nota": nota.nota,
+            }
+            for nota in aluno.tbnotas_set.all()
+        ],
+    }
+
+@router.get("/aluno-detalhe/{aluno_id}", response={200: AlunoDetalheSchema, 404: MensagemErro})
+@decorate_view(condicional(TbAlunos, TbEnderecos, TbNotas, TbDisciplinas))
+def consultar_aluno_detalhe(request, aluno_id: int):
+    """
+    Aluno com o endereço e as notas (com o nome da disciplina) em uma
+    resposta só.
+    """
+    aluno = _alunos_com_detalhes().filter(id=aluno_id).first()
+    if aluno is None:
+        return 404, {"mensagem": "Aluno não encontrado"}
+    return saida_confiavel(_detalhe_aluno(aluno))
+
+@router.get("/consultar-alunos-detalhe", response=AlunosDetalhePaginaSchema)
+@decorate_view(condicional(TbAlunos, TbEnderecos, TbNotas, TbDisciplinas))
+def consultar_alunos_detalhe(request, cursor: Optional[int] = None,
+                             limite: int = settings.PAGINACAO_LIMITE_PADRAO):
+    """
+    Como /consultar-alunos (paginação por cursor), mas cada aluno vem com o
+    endereço e as notas, como em /aluno-detalhe.
+    """
+    qs = _alunos_com_detalhes().order_by("id")
+    if cursor is not None:
+        qs = qs.filter(id__gt=cursor)
+    limite = max(1, min(limite, settings.PAGINACAO_LIMITE_MAXIMO))
+    alunos = list(qs[:limite + 1])
+    proximo_cursor = None
+    if len(alunos) > limite:
+        alunos = alunos[:limite]
+        proximo_cursor = alunos[-1].id
+    itens = [_detalhe_aluno(aluno) for aluno in alunos]
+    return saida_confiavel({"itens": itens, "proximo_cursor": proximo_cursor, "limite": limite})
+
+@router.get("/alunos-por-ids", response={200: AlunosPorIdsSchema, 400: MensagemErro})
+@decorate_view(condicional(TbAlunos))
+def consultar_alunos_por_ids(request, ids: str):
+    """
+    Vários alunos de uma vez: ?ids=1,2,3. A resposta vem indexada pelo id.
+    """
+    return _por_ids(request, TbAlunos, AlunosSchema, ids)
 
-# consulta de alunos por id 
-@router.get("/alunos-por-nome/{nome}", response=list[AlunosSchema])
-def consultar_alunos_por_nome(request, nome: str):
-    qs = TbAlunos.objects.filter(nome__icontains=nome).values()
-# Retorna a lista de alunos encontrados
-    return list(qs)
+# consulta de alunos por nome
+@router.get("/alunos-por-nome/{nome}", response={200: list[AlunosSchema], 400: MensagemErro})
+@decorate_view(condicional(TbAlunos))
+def consultar_alunos_por_nome(request, nome: str, limite: int = settings.BUSCA_LIMITE_PADRAO):
+    """
+    Busca aproximada de alunos por nome, sem diferenciar acentos e maiúsculas
+    ("joao" encontra "João"). Os resultados vêm do mais parecido para o menos
+    parecido, no máximo 'limite' alunos.
+    """
+    try:
+        # Em vez de 'nome__icontains' (LIKE '%x%', que varre a tabela toda),
+        # a busca consulta o índice de trigramas tb_alunos_busca.
+        return busca.buscar_alunos(nome, limite)
+    except Exception as e:
+        return 400, {"mensagem": f"Erro ao consultar aluno por nome: {e}"}
+
+# exportação de alunos com endereço
+@router.get("/exportar-alunos", response={400: MensagemErro},
+            description="Exporta os alunos com o endereço em CSV, NDJSON ou Parquet, em streaming.")
+@decorate_view(condicional(TbAlunos, TbEnderecos, TbNotas, TbDisciplinas))
+def exportar_alunos(request, formato: str = "csv", estado: Optional[str] = None, semestre: Optional[int] = None):
+    """
+    Arquivo com os alunos e o endereço já juntado, gerado à medida que é
+    enviado (memória constante). 'estado' filtra pelo estado do endereço e
+    'semestre' pelos alunos com nota em alguma disciplina daquele semestre.
+    """
+    try:
+        conteudo = exportacao.exportar(formato, estado=estado, semestre=semestre)
+    except exportacao.ErroExportacao as e:
+        return 400, {"mensagem": str(e)}
+    content_type, extensao = exportacao.FORMATOS[formato]
+    response = StreamingHttpResponse(conteudo, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="alunos.{extensao}"'
+    return response
 
 
 # Atualizar aluno
@@ -218,10 +544,28 @@ def consultar_alunos_por_nome(request, nome: str):
 @router.put("/atualizar-aluno/{aluno_id}", response={200: dict, 400: MensagemErro, 404: MensagemErro})
 def atualizar_aluno(request, aluno_id: int, dados: AlunoUpdateSchema):
     try:
-        qs = TbAlunos.objects.filter(id=aluno_id).update(**dados.dict())
+        # 'exclude_unset=True': só os campos enviados no JSON. Sem isso os campos
+        # omitidos iam como None e apagavam os dados do aluno.
+        dados_para_atualizar = dados.dict(exclude_unset=True)
+        if not dados_para_atualizar:
+            return 400, {"mensagem": "Nenhum campo para atualizar."}
+        qs = TbAlunos.objects.filter(id=aluno_id).update(**dados_para_atualizar)
+        if not qs:
+            return 404, {"mensagem": f"Aluno com ID {aluno_id} não encontrado."}
+        # .update() não dispara post_save: avisa quem mantém dados derivados (índice de busca).
+        registros_alterados.send(sender=TbAlunos, ids=[aluno_id], campos=set(dados_para_atualizar))
         return {"mensagem": "Aluno atualizado com sucesso"}
     except Exception as e:
         return 400, {"mensagem": f"Erro ao atualizar aluno: {e}"}
+
+@router.patch("/atualizar-alunos-lote/", response={200: RelatorioAtualizacaoLoteSchema, 400: MensagemErro})
+def atualizar_alunos_lote(request, itens: List[dict]):
+    """
+    Atualiza vários alunos em uma requisição: [{"id": 1, "email": "..."}, ...].
+    Só os campos enviados em cada item são alterados; itens com id ou
+    'endereco_id' inexistente são reportados por linha.
+    """
+    return _relatorio_atualizacao_lote(TbAlunos, AlunoUpdateSchema, itens)
     
 
 #delete 
@@ -238,23 +582,6 @@ def deletar_aluno(request, aluno_id: int):
     except Exception as e:
         return 400, {"mensagem": f"Erro ao deletar aluno: {e}"}     
 
-@router.get("/alunos-por-nome/{nome}", response=list[AlunosSchema])
-def consultar_alunos_por_nome(request, nome: str):
-    """
-    Consulta alunos por nome usando o ORM do Django.
-    """
-    try:
-        # 'nome__icontains' é a forma segura do Django de fazer
-        # uma busca parcial (como "LIKE" no SQL) que ignora
-        # maiúsculas/minúsculas (o 'i' é de 'insensitive').
-        # Isso é muito melhor do que uma busca exata (nome=nome).
-        qs = TbAlunos.objects.filter(nome__icontains=nome).all().values()
-        
-        return list(qs)
-        
-    except Exception as e:
-        return 400, {"mensagem": f"Erro ao consultar aluno por nome: {e}"}
-    
 # inserir alunos
 @router.post("/inserir-aluno/", response={200:dict, 400: MensagemErro})
 def inserir_aluno(request, payload: AlunoCreateSchema):
@@ -269,9 +596,261 @@ def inserir_aluno(request, payload: AlunoCreateSchema):
     except Exception as e:
         return 400, {"mensagem": f"Erro ao cadastrar: {e}"}
 
+@router.post("/inserir-alunos-lote/", response={200: RelatorioLoteSchema, 400: MensagemErro})
+def inserir_alunos_lote(request, itens: List[dict]):
+    """
+    Insere vários alunos de uma vez (bulk_create em uma transação).
+    Itens inválidos, com 'matricula' já cadastrada ou 'endereco_id'
+    inexistente são reportados por linha.
+    """
+    return _relatorio_lote(TbAlunos, AlunoCreateSchema, itens, campo_unico="matricula")
+
+@router.post("/importar-csv/{tipo}", response={200: ImportacaoCsvSchema, 400: MensagemErro})
+def importar_csv(request, tipo: str, arquivo: UploadedFile = File(...), delimitador: str = ","):
+    """
+    Importa uma planilha CSV de 'alunos' (chave: matricula; endereço pela
+    coluna 'cep') ou de 'enderecos' (chave: cep). Registros novos são
+    inseridos e os existentes atualizados, em lotes. As linhas recusadas
+    voltam em 'rejeitadas_csv', com o número da linha e o motivo.
+    """
+    texto = io.TextIOWrapper(arquivo.file, encoding="utf-8-sig", newline="")
+    rejeitadas = io.StringIO()
+    try:
+        resultado = importacao.importar_csv(texto, tipo, rejeitadas, delimitador)
+    except (importacao.ErroImportacao, UnicodeDecodeError, csv.Error) as e:
+        return 400, {"mensagem": f"Erro ao importar CSV: {e}"}
+    return {**resultado, "rejeitadas_csv": rejeitadas.getvalue()}
+
 
+##################### NOTAS #################################
+@router.get("/nota-por-id/{nota_id}", response=list[NotaSchema])
+@decorate_view(condicional(TbNotas))
+def consultar_nota_id(request, nota_id: int):
+    """
+    Consulta uma nota específica por ID.
+    """
+    qs = TbNotas.objects.filter(id=nota_id).values("id", "aluno_id", "disciplina_id", "nota")
+    return saida_confiavel(list(qs))
 
+@router.get("/notas-por-aluno/{aluno_id}", response=list[NotaSchema])
+@decorate_view(condicional(TbNotas))
+def consultar_notas_por_aluno(request, aluno_id: int):
+    """
+    Consulta todas as notas de um aluno.
+    """
+    qs = TbNotas.objects.filter(aluno_id=aluno_id).order_by("id").values("id", "aluno_id", "disciplina_id", "nota")
+    return saida_confiavel(list(qs))
 
+@router.get("/notas-por-disciplina/{disciplina_id}", response=list[NotaSchema])
+@decorate_view(condicional(TbNotas))
+def consultar_notas_por_disciplina(request, disciplina_id: int):
+    """
+    Consulta todas as notas lançadas em uma disciplina.
+    """
+    qs = TbNotas.objects.filter(disciplina_id=disciplina_id).order_by("id").values("id", "aluno_id", "disciplina_id", "nota")
+    return saida_confiavel(list(qs))
 
+@router.post("/inserir-nota/", response={200: dict, 400: MensagemErro})
+def inserir_nota(request, payload: NotaCreateSchema):
+    """
+    Lança uma nota de um aluno em uma disciplina.
+    O 'payload' é validado automaticamente pelo 'NotaCreateSchema'.
+    """
+    dados_para_criar = payload.dict()
+    try:
+        nova_nota = TbNotas.objects.create(**dados_para_criar)
+        return {"id_criado": nova_nota.id, "mensagem": "Nota cadastrada com sucesso"}
+    except Exception as e:
+        return 400, {"mensagem": f"Erro ao cadastrar nota: {e}"}
 
+@router.put("/atualizar-nota/{nota_id}", response={200: dict, 404: MensagemErro, 400: MensagemErro})
+def atualizar_nota(request, nota_id: int, payload: NotaUpdateSchema):
+    """
+    Atualiza uma nota existente. Só os campos enviados são alterados.
+    """
+    dados_para_atualizar = payload.dict(exclude_unset=True)
+    try:
+        # save() (e não QuerySet.update) para que os signals mantenham o
+        # resumo de tb_estatisticas_disciplina; o lock evita que duas
+        # alterações simultâneas tirem do resumo a mesma nota antiga.
+        with transaction.atomic():
+            nota = TbNotas.objects.select_for_update().get(id=nota_id)
+            for campo, valor in dados_para_atualizar.items():
+                setattr(nota, campo, valor)
+            nota.save(update_fields=list(dados_para_atualizar) or None)
+        return {"mensagem": "Nota atualizada com sucesso"}
+    except TbNotas.DoesNotExist:
+        return 404, {"mensagem": f"Nota com ID {nota_id} não encontrada."}
+    except Exception as e:
+        return 400, {"mensagem": f"Erro ao atualizar nota: {e}"}
 
+@router.delete("/deletar-nota/{nota_id}", response={200: MensagemErro, 404: MensagemErro, 400: MensagemErro})
+def deletar_nota(request, nota_id: int):
+    """
+    Deleta uma nota específica pelo ID.
+    """
+    try:
+        nota = TbNotas.objects.get(id=nota_id)
+        nota.delete()
+        return {"mensagem": f"Nota com ID {nota_id} deletada com sucesso"}
+    except TbNotas.DoesNotExist:
+        return 404, {"mensagem": f"Nota com ID {nota_id} não encontrada."}
+    except Exception as e:
+        return 400, {"mensagem": f"Erro ao deletar nota: {e}"}
+
+@router.get("/estatisticas-disciplina/{disciplina_id}",
+            response={200: EstatisticasDisciplinaSchema, 404: MensagemErro})
+@decorate_view(condicional(TbNotas, TbDisciplinas, TbEstatisticasDisciplina))
+def consultar_estatisticas_disciplina(request, disciplina_id: int):
+    """
+    Quantidade, média, desvio padrão, mínima, máxima e histograma das notas
+    da disciplina, lidos do resumo em tb_estatisticas_disciplina.
+    """
+    resumo = estatisticas.da_disciplina(disciplina_id)
+    if resumo is None:
+        if not TbDisciplinas.objects.filter(id=disciplina_id).exists():
+            return 404, {"mensagem": f"Disciplina com ID {disciplina_id} não encontrada."}
+        resumo = estatisticas.da_disciplina_vazia()
+    return {"disciplina_id": disciplina_id, **resumo}
+
+@router.get("/estatisticas-semestre/{semestre}", response=EstatisticasSemestreSchema)
+@decorate_view(condicional(TbNotas, TbDisciplinas, TbEstatisticasDisciplina))
+def consultar_estatisticas_semestre(request, semestre: int):
+    """
+    As mesmas estatísticas para todas as notas das disciplinas do semestre.
+    """
+    return {"semestre": semestre, **estatisticas.do_semestre(semestre)}
+
+@router.get("/ranking", response={200: list[RankingAlunoSchema], 400: MensagemErro},
+            description="Os n alunos de maior média no semestre e/ou na disciplina.")
+@decorate_view(condicional(TbNotas, TbDisciplinas, TbAlunos))
+def consultar_ranking(request, semestre: Optional[int] = None, disciplina_id: Optional[int] = None, n: int = 10):
+    """
+    Ranking dos alunos pela média das notas do escopo; empatados dividem a
+    posição. Calculado no banco com funções de janela e mantido em cache
+    até uma nota do escopo mudar.
+    """
+    if semestre is None and disciplina_id is None:
+        return 400, {"mensagem": "Informe 'semestre' e/ou 'disciplina_id'."}
+    n = max(1, min(n, settings.RANKING_N_MAXIMO))
+    return ranking.top_alunos(semestre=semestre, disciplina_id=disciplina_id, n=n)
+
+@router.get("/boletim", response={200: list[BoletimAlunoSchema], 400: MensagemErro},
+            summary="Boletim",
+            description="Boletim de um aluno (aluno_id) e/ou de todos os alunos de um semestre (semestre).")
+@decorate_view(condicional(TbNotas, TbAlunos, TbDisciplinas))
+def consultar_boletim(request, aluno_id: Optional[int] = None, semestre: Optional[int] = None):
+    """
+    Notas agregadas por disciplina (quantidade, média, mínima e máxima),
+    média simples e média ponderada pela carga horária de cada aluno.
+    Calculado no banco com uma única consulta agregada.
+    """
+    if aluno_id is None and semestre is None:
+        return 400, {"mensagem": "Informe 'aluno_id' e/ou 'semestre'."}
+    try:
+        return montar_boletim(aluno_id=aluno_id, semestre=semestre)
+    except Exception as e:
+        return 400, {"mensagem": f"Erro ao montar boletim: {e}"}
+
+
+##################### TAREFAS #################################
+def _enfileirar(tipo, entrada, parametros, total):
+    """
+    Enfileira a tarefa e responde 202 com ela, ou 503 (com Retry-After) se a fila estiver cheia.
+    """
+    try:
+        tarefa = tarefas.enfileirar(tipo, entrada, parametros, total)
+    except tarefas.FilaCheia as e:
+        response = JsonResponse({"mensagem": str(e)}, status=503)
+        response["Retry-After"] = str(settings.TAREFAS_RETRY_503)
+        return response
+    return 202, tarefa
+
+def _validar_quantidade(itens):
+    if not itens:
+        return "Informe ao menos um item."
+    if len(itens) > settings.TAREFAS_MAXIMO_ITENS:
+        return f"A tarefa aceita no máximo {settings.TAREFAS_MAXIMO_ITENS} itens."
+    return None
+
+def _ler_corpo(request, maximo):
+    """
+    Corpo da requisição lido direto do stream, ou None se passar de 'maximo'
+    bytes. O request.body do Django recusa (RequestDataTooBig) corpos acima de
+    DATA_UPLOAD_MAX_MEMORY_SIZE, 2,5 MB, pouco para TAREFAS_MAXIMO_ITENS itens.
+    """
+    try:
+        declarado = int(request.META.get("CONTENT_LENGTH") or 0)
+    except ValueError:
+        declarado = 0
+    if declarado > maximo:
+        return None
+    corpo = request.read(maximo + 1)
+    return None if len(corpo) > maximo else corpo
+
+@router.post("/tarefas/inserir-lote/{modelo}",
+             response={202: TarefaSchema, 400: MensagemErro, 413: MensagemErro, 503: MensagemErro},
+             openapi_extra={"requestBody": {"required": True, "content": {"application/json": {
+                 "schema": {"type": "array", "items": {"type": "object"}}}}}})
+def enfileirar_inserir_lote(request, modelo: str):
+    """
+    Inserção de um lote grande de 'alunos', 'enderecos' ou 'disciplinas' em
+    segundo plano, com as validações dos endpoints de lote. Responde na hora
+    com a tarefa; o relatório (só as linhas com erro) sai em GET /tarefas/{id}.
+    O corpo (lista JSON de itens) aceita até TAREFAS_CORPO_MAXIMO bytes.
+    """
+    if modelo not in tarefas.LOTES:
+        return 400, {"mensagem": f"Modelo '{modelo}' inválido. Use: {', '.join(tarefas.LOTES)}."}
+    corpo = _ler_corpo(request, settings.TAREFAS_CORPO_MAXIMO)
+    if corpo is None:
+        return 413, {"mensagem": f"O lote aceita no máximo {settings.TAREFAS_CORPO_MAXIMO} bytes."}
+    try:
+        itens = json.loads(corpo)
+    except ValueError as e:
+        return 400, {"mensagem": f"JSON inválido: {e}"}
+    if not isinstance(itens, list) or not all(isinstance(item, dict) for item in itens):
+        return 400, {"mensagem": "Envie uma lista de objetos."}
+    erro = _validar_quantidade(itens)
+    if erro:
+        return 400, {"mensagem": erro}
+    # O corpo já validado vai como veio, sem serializar de novo.
+    return _enfileirar("inserir_lote", corpo.decode(), {"modelo": modelo}, len(itens))
+
+@router.post("/tarefas/importar-csv/{tipo}", response={202: TarefaSchema, 400: MensagemErro, 503: MensagemErro})
+def enfileirar_importar_csv(request, tipo: str, arquivo: UploadedFile = File(...), delimitador: str = ","):
+    """
+    Mesma importação de /importar-csv/{tipo}, em segundo plano. As linhas
+    recusadas vêm em 'resultado.rejeitadas_csv' quando a tarefa termina.
+    O CSV vai para o disco (TAREFAS_DIRETORIO) em blocos, não para a memória.
+    """
+    if tipo not in importacao.TIPOS:
+        return 400, {"mensagem": f"Tipo '{tipo}' inválido. Use: {', '.join(importacao.TIPOS)}."}
+    try:
+        # 'total' é uma estimativa (linhas de dados do arquivo) só para o andamento.
+        caminho, total = tarefas.guardar_csv(arquivo)
+    except UnicodeDecodeError as e:
+        return 400, {"mensagem": f"Erro ao ler o CSV: {e}"}
+    return _enfileirar("importar_csv", "", {"tipo": tipo, "delimitador": delimitador, "arquivo": caminho}, total)
+
+@router.post("/tarefas/deletar-alunos", response={202: TarefaSchema, 400: MensagemErro, 503: MensagemErro})
+def enfileirar_deletar_alunos(request, ids: List[int] = Body(...)):
+    """
+    Remove em segundo plano os alunos dos 'ids', em blocos. Ids inexistentes
+    ou que não puderam ser removidos aparecem no relatório da tarefa.
+    """
+    erro = _validar_quantidade(ids)
+    if erro:
+        return 400, {"mensagem": erro}
+    ids = list(dict.fromkeys(ids))
+    return _enfileirar("deletar_alunos", dumps(ids).decode(), {}, len(ids))
+
+@router.get("/tarefas/{tarefa_id}", response={200: TarefaSchema, 404: MensagemErro})
+def consultar_tarefa(request, tarefa_id: int):
+    """
+    Estado, andamento (processados de total) e, ao terminar, resultado ou erro da tarefa.
+    """
+    # Sem a entrada (o lote ou o CSV), que pode ser grande e não é devolvida.
+    tarefa = TbTarefas.objects.defer("entrada").filter(id=tarefa_id).first()
+    if tarefa is None:
+        return 404, {"mensagem": f"Tarefa com ID {tarefa_id} não encontrada."}
+    return tarefa
@@ -0,0 +1,150 @@
+"""
+Versão assíncrona (async def) dos principais endpoints de cadastro_aluno.
+
+Servida pelo mesmo NinjaAPI em /api/v1/cadastro_aluno/async/. Rodando sob
+ASGI (uvicorn, ver core/asgi.py) cada requisição que espera o banco libera o
+event loop em vez de prender uma thread. Sob WSGI estes handlers também
+funcionam, mas sem ganho: o Django os executa com async_to_sync.
+"""
+from typing import List, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from ninja import Router
+from ninja.decorators import decorate_view
+
+from cadastro_aluno import exportacao
+from cadastro_aluno.cache import cache_disciplinas
+from cadastro_aluno.etag import condicional
+from cadastro_aluno.models import TbAlunos, TbDisciplinas, TbEnderecos
+from cadastro_aluno.schemas import (
+    AlunosSchema,
+    AlunosPaginaSchema,
+    AlunoCreateSchema,
+    AlunoUpdateSchema,
+    DisciplinaCompletaSchema,
+    DisciplinaCreateSchema,
+    DisciplinaSchema,
+    EnderecoCompletoSchema,
+    EnderecoCreateSchema,
+    MensagemErro)
+from cadastro_aluno.signals import registros_alterados
+from core.renderizacao import dumps
+
+router = Router()
+
+
+async def _gerar_ndjson(qs, campos):
+    # Os mesmos blocos por keyset do /consultar-alunos síncrono; cada bloco
+    # (uma consulta curta) é lido fora do event loop.
+    blocos = exportacao.blocos_de_linhas(qs, caminhos=campos)
+    proximo = sync_to_async(next)
+    while (bloco := await proximo(blocos, None)) is not None:
+        yield b"".join(dumps(dict(zip(campos, linha))) + b"\n" for linha in bloco)
+
+##################### Disciplinas #################################
+@router.get("/disciplinas", response=List[DisciplinaSchema])
+@decorate_view(condicional(TbDisciplinas))
+async def listar_disciplinas(request):
+    """
+    Versão assíncrona de /disciplinas (usa o mesmo cache do catálogo).
+    """
+    qs = TbDisciplinas.objects.all().values('id', 'disciplina')
+    # O cache do Django é síncrono; em caso de falta a consulta roda na
+    # mesma thread do sync_to_async.
+    return await sync_to_async(cache_disciplinas.obter)("todas", lambda: list(qs))
+
+@router.get("/disciplina-por-id/{discplina_id}", response=list[DisciplinaCompletaSchema])
+@decorate_view(condicional(TbDisciplinas))
+async def consulta_discplina(request, discplina_id: int):
+    qs = TbDisciplinas.objects.filter(id=discplina_id).values()
+    return await sync_to_async(cache_disciplinas.obter)(f"id:{discplina_id}", lambda: list(qs))
+
+@router.post("/inserir-disciplina/", response={200: dict, 400: MensagemErro})
+async def inserir_disciplina(request, payload: DisciplinaCreateSchema):
+    try:
+        nova_disciplina = await TbDisciplinas.objects.acreate(**payload.dict())
+        return {"id_criado": nova_disciplina.id, "mensagem": "Disciplina cadastrada com sucesso"}
+    except Exception as e:
+        return 400, {"mensagem": f"Erro ao cadastrar disciplina: {e}"}
+
+##################### ENDERECOS #################################
+@router.get("/enderecos-por-id/{id}", response=list[EnderecoCompletoSchema])
+@decorate_view(condicional(TbEnderecos))
+async def consulta_enderecos(request, id: int):
+    return [e async for e in TbEnderecos.objects.filter(id=id).values()]
+
+@router.post("/inserir-endereco/", response={200: dict, 400: MensagemErro})
+async def inserir_endereco(request, payload: EnderecoCreateSchema):
+    try:
+        novo_endereco = await TbEnderecos.objects.acreate(**payload.dict())
+        return {"id_criado": novo_endereco.id, "mensagem": "Endereço cadastrado com sucesso"}
+    except Exception as e:
+        return 400, {"mensagem": f"Erro ao cadastrar endereço: {e}"}
+
+#################### ALUNOS ########################
+@router.get("/consultar-alunos", response=AlunosPaginaSchema)
+@decorate_view(condicional(TbAlunos))
+async def consultar_alunos(request, cursor: Optional[int] = None,
+                           limite: int = settings.PAGINACAO_LIMITE_PADRAO,
+                           stream: bool = False):
+    """
+    Versão assíncrona de /consultar-alunos (paginação por cursor ou NDJSON).
+    """
+    qs = TbAlunos.objects.order_by("id")
+    if cursor is not None:
+        qs = qs.filter(id__gt=cursor)
+    campos = list(AlunosSchema.model_fields)
+
+    if stream:
+        return StreamingHttpResponse(_gerar_ndjson(qs, campos), content_type="application/x-ndjson")
+
+    limite = max(1, min(limite, settings.PAGINACAO_LIMITE_MAXIMO))
+    itens = [a async for a in qs.values(*campos)[:limite + 1]]
+    proximo_cursor = None
+    if len(itens) > limite:
+        itens = itens[:limite]
+        proximo_cursor = itens[-1]["id"]
+    return {"itens": itens, "proximo_cursor": proximo_cursor, "limite": limite}
+
+@router.get("/aluno-por-id/{aluno_id}", response=list[AlunosSchema])
+@decorate_view(condicional(TbAlunos))
+async def consultar_aluno_id(request, aluno_id: int):
+    try:
+        return [await TbAlunos.objects.aget(id=aluno_id)]
+    except TbAlunos.DoesNotExist:
+        return []
+
+@router.post("/inserir-aluno/", response={200: dict, 400: MensagemErro})
+async def inserir_aluno(request, payload: AlunoCreateSchema):
+    try:
+        # acreate -> asave: o post_save continua indexando o nome para a busca.
+        aluno_novo = await TbAlunos.objects.acreate(**payload.dict())
+        return {"id_criado": aluno_novo.id, "mensagem": "Aluno cadastrado com sucesso"}
+    except Exception as e:
+        return 400, {"mensagem": f"Erro ao cadastrar: {e}"}
+
+@router.put("/atualizar-aluno/{aluno_id}", response={200: dict, 400: MensagemErro, 404: MensagemErro})
+async def atualizar_aluno(request, aluno_id: int, dados: AlunoUpdateSchema):
+    try:
+        dados_para_atualizar = dados.dict(exclude_unset=True)
+        if not dados_para_atualizar:
+            return 400, {"mensagem": "Nenhum campo para atualizar."}
+        if not await TbAlunos.objects.filter(id=aluno_id).aupdate(**dados_para_atualizar):
+            return 404, {"mensagem": f"Aluno com ID {aluno_id} não encontrado."}
+        await registros_alterados.asend(sender=TbAlunos, ids=[aluno_id], campos=set(dados_para_atualizar))
+        return {"mensagem": "Aluno atualizado com sucesso"}
+    except Exception as e:
+        return 400, {"mensagem": f"Erro ao atualizar aluno: {e}"}
+
+@router.delete("/deletar-alunos/{aluno_id}", response={200: MensagemErro, 404: MensagemErro, 400: MensagemErro})
+async def deletar_aluno(request, aluno_id: int):
+    try:
+        aluno = await TbAlunos.objects.aget(id=aluno_id)
+        await aluno.adelete()
+        return {"mensagem": f"Aluno com ID {aluno_id} deletado com sucesso"}
+    except TbAlunos.DoesNotExist:
+        return 404, {"mensagem": f"Aluno com ID {aluno_id} não encontrado."}
+    except Exception as e:
+        return 400, {"mensagem": f"Erro ao deletar aluno: {e}"}
@@ -1,6 +1,24 @@
+import logging
+
 from django.apps import AppConfig
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
 
 
 class CadastroAlunoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'cadastro_aluno'
+
+    def ready(self):
+        # Registra os receivers que mantêm os dados derivados (índice de busca,
+        # caches) atualizados e os contadores dos caches no /api/v1/metrics.
+        from cadastro_aluno import checks, signals  # noqa: F401
+        from cadastro_aluno import cache
+        from core.metricas import registro
+
+        registro.adicionar_coletor(cache.linhas_metricas)
+        # Servidores (uvicorn/gunicorn) não rodam os system checks: fora do
+        # DEBUG o aviso do W001 também vai para o log.
+        if not settings.DEBUG and not cache.versoes_tabelas.compartilhado():
+            logger.warning(checks.MENSAGEM_VERSOES_LOCAIS)
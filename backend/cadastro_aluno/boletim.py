@@ -0,0 +1,65 @@
+from django.db.models import Avg, Count, Max, Min
+
+from cadastro_aluno.models import TbNotas
+
+
+def montar_boletim(aluno_id=None, semestre=None):
+    """
+    Monta o boletim de um aluno e/ou de um semestre inteiro.
+
+    Tudo sai de UMA consulta agregada (GROUP BY aluno, disciplina) com os
+    nomes trazidos por JOIN, então o número de consultas não depende da
+    quantidade de alunos ou disciplinas. As médias do aluno são calculadas
+    a partir dessas linhas já agregadas:
+      - media: média simples das médias por disciplina;
+      - media_ponderada: média das disciplinas ponderada pela carga horária.
+    """
+    qs = TbNotas.objects.filter(aluno__isnull=False, disciplina__isnull=False)
+    if aluno_id is not None:
+        qs = qs.filter(aluno_id=aluno_id)
+    if semestre is not None:
+        qs = qs.filter(disciplina__semestre=semestre)
+
+    linhas = (
+        qs.values(
+            "aluno_id", "aluno__nome",
+            "disciplina_id", "disciplina__disciplina", "disciplina__carga", "disciplina__semestre",
+        )
+        .annotate(quantidade=Count("nota"), media=Avg("nota"), minima=Min("nota"), maxima=Max("nota"))
+        .order_by("aluno__nome", "aluno_id", "disciplina__semestre", "disciplina__disciplina")
+    )
+
+    boletins = {}
+    for linha in linhas:
+        boletim = boletins.setdefault(linha["aluno_id"], {
+            "aluno_id": linha["aluno_id"],
+            "nome": linha["aluno__nome"],
+            "disciplinas": [],
+            "_medias": [],
+        })
+        boletim["disciplinas"].append({
+            "disciplina_id": linha["disciplina_id"],
+            "disciplina": linha["disciplina__disciplina"],
+            "carga": linha["disciplina__carga"],
+            "semestre": linha["disciplina__semestre"],
+            "quantidade": linha["quantidade"],
+            "media": _arredondar(linha["media"]),
+            "minima": _arredondar(linha["minima"]),
+            "maxima": _arredondar(linha["maxima"]),
+        })
+        # Disciplinas sem nota lançada (nota nula) não entram nas médias do aluno.
+        if linha["media"] is not None:
+            boletim["_medias"].append((float(linha["media"]), linha["disciplina__carga"]))
+
+    for boletim in boletins.values():
+        medias = boletim.pop("_medias")
+        soma_cargas = sum(carga for _, carga in medias)
+        boletim["media"] = _arredondar(sum(m for m, _ in medias) / len(medias)) if medias else None
+        boletim["media_ponderada"] = (
+            _arredondar(sum(m * carga for m, carga in medias) / soma_cargas) if soma_cargas else None
+        )
+    return list(boletins.values())
+
+
+def _arredondar(valor):
+    return None if valor is None else round(float(valor), 2)
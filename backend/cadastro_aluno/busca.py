@@ -0,0 +1,117 @@
+import re
+import unicodedata
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+
+from cadastro_aluno.models import TbAlunos, TbAlunosBusca
+
+
+def normalizar(texto):
+    """
+    Remove acentos, passa para minúsculas e troca pontuação por espaço.
+    Ex: "  João D'Ávila " -> "joao d avila"
+    """
+    texto = unicodedata.normalize("NFKD", texto or "")
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    texto = re.sub(r"[^0-9a-z]+", " ", texto.lower())
+    return texto.strip()
+
+
+def trigramas(texto):
+    """
+    Conjunto de trigramas de cada palavra do texto normalizado.
+    Cada palavra recebe dois espaços antes e um depois (como no pg_trgm),
+    então o começo das palavras pesa mais: "ana" -> {"  a", " an", "ana", "na "}.
+    """
+    termos = set()
+    for palavra in normalizar(texto).split():
+        palavra = f"  {palavra} "
+        termos.update(palavra[i:i + 3] for i in range(len(palavra) - 2))
+    return termos
+
+
+def indexar(alunos):
+    """
+    (Re)indexa os alunos informados como pares (id, nome).
+    """
+    alunos = list(alunos)
+    if not alunos:
+        return
+    ids = [aluno_id for aluno_id, _ in alunos]
+    novos = [
+        TbAlunosBusca(aluno_id=aluno_id, termo=termo)
+        for aluno_id, nome in alunos
+        for termo in trigramas(nome)
+    ]
+    with transaction.atomic():
+        TbAlunosBusca.objects.filter(aluno_id__in=ids).delete()
+        TbAlunosBusca.objects.bulk_create(novos, batch_size=settings.BULK_BATCH_SIZE)
+
+
+def reindexar_ids(ids):
+    """
+    Reindexa os alunos pelos ids, lendo o nome atual do banco.
+    Usado depois de escritas que não disparam post_save (.update(), bulk_create).
+    """
+    ids = [i for i in ids if i is not None]
+    for inicio in range(0, len(ids), settings.BULK_BATCH_SIZE):
+        bloco = ids[inicio:inicio + settings.BULK_BATCH_SIZE]
+        indexar(TbAlunos.objects.filter(id__in=bloco).values_list("id", "nome"))
+
+
+def reconstruir():
+    """
+    Apaga e reconstrói o índice inteiro a partir de tb_alunos.
+    """
+    TbAlunosBusca.objects.all().delete()
+    qs = TbAlunos.objects.order_by("id").values_list("id", "nome")
+    bloco = []
+    for par in qs.iterator(chunk_size=settings.BULK_BATCH_SIZE):
+        bloco.append(par)
+        if len(bloco) >= settings.BULK_BATCH_SIZE:
+            indexar(bloco)
+            bloco = []
+    indexar(bloco)
+
+
+def buscar_alunos(termo, limite):
+    """
+    Busca aproximada por nome, ignorando acentos e maiúsculas.
+
+    Os candidatos saem do índice de trigramas (só as linhas dos trigramas da
+    busca são lidas, não a tabela inteira) e são ordenados pela semelhança
+    com o termo. Devolve no máximo 'limite' alunos, do mais parecido ao menos.
+    """
+    termos = trigramas(termo)
+    if not termos:
+        return []
+    limite = max(1, min(limite, settings.BUSCA_LIMITE_MAXIMO))
+    minimo = max(1, int(len(termos) * settings.BUSCA_SIMILARIDADE_MINIMA))
+
+    candidatos = (
+        TbAlunosBusca.objects.filter(termo__in=termos)
+        .values("aluno_id")
+        .annotate(comuns=Count("id"))
+        .filter(comuns__gte=minimo)
+        .order_by("-comuns", "aluno_id")[:limite * settings.BUSCA_FATOR_CANDIDATOS]
+    )
+    comuns = {c["aluno_id"]: c["comuns"] for c in candidatos}
+    if not comuns:
+        return []
+
+    alunos = list(TbAlunos.objects.filter(id__in=comuns).values("id", "matricula", "nome", "email", "endereco_id", "nome_mae"))
+    busca_normalizada = normalizar(termo)
+
+    def pontuacao(aluno):
+        # Coeficiente de Dice entre os trigramas da busca e os do nome,
+        # com bônus quando o termo aparece inteiro dentro do nome.
+        total = len(termos) + len(trigramas(aluno["nome"]))
+        nota = 2 * comuns[aluno["id"]] / total
+        if busca_normalizada in normalizar(aluno["nome"]):
+            nota += 1
+        return nota
+
+    alunos.sort(key=lambda a: (-pontuacao(a), a["nome"], a["id"]))
+    return alunos[:limite]
@@ -0,0 +1,165 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+from core.replicas import ler_do_primario
+
+_AUSENTE = object()
+_instancias = []
+
+
+class CacheVersionado:
+    """
+    Cache read-through sobre o framework de cache do Django.
+
+    As chaves levam o número de "geração" do escopo; invalidar é só trocar a
+    geração, o que torna inacessíveis todas as entradas antigas de uma vez (elas
+    expiram pelo TTL ou são descartadas pelo limite de tamanho do backend).
+    O backend, o TTL e o tamanho máximo vêm do alias em settings.CACHES.
+    """
+
+    def __init__(self, nome, alias="default"):
+        self.nome = nome
+        self.alias = alias
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.faltas = 0
+        _instancias.append(self)
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _chave_geracao(self, escopo):
+        return f"{self.nome}:geracao:{escopo}"
+
+    def _geracao(self, escopo):
+        chave = self._chave_geracao(escopo)
+        geracao = self.cache.get(chave)
+        if geracao is None:
+            # Começa de um valor baseado no relógio (e não de 1): se a chave da
+            # geração for descartada pelo backend, a nova geração não coincide
+            # com uma antiga e nenhuma entrada velha volta a ser servida.
+            self.cache.add(chave, time.time_ns(), timeout=None)
+            geracao = self.cache.get(chave)
+        return geracao
+
+    def obter(self, chave, calcular, escopo=""):
+        """
+        Devolve o valor em cache para 'chave'; se não houver, chama calcular() e guarda o resultado.
+        """
+        chave_completa = f"{self.nome}:{escopo}:{self._geracao(escopo)}:{chave}"
+        valor = self.cache.get(chave_completa, _AUSENTE)
+        if valor is not _AUSENTE:
+            with self._lock:
+                self.acertos += 1
+            return valor
+        with self._lock:
+            self.faltas += 1
+        # Do primário: a geração já foi trocada no commit da escrita, e uma
+        # réplica atrasada guardaria os dados de antes dela na geração nova.
+        with ler_do_primario():
+            valor = calcular()
+        self.cache.set(chave_completa, valor)
+        return valor
+
+    def invalidar(self, escopo=""):
+        chave = self._chave_geracao(escopo)
+        try:
+            self.cache.incr(chave)
+        except ValueError:
+            # Geração ainda não criada (ou já descartada): nada a invalidar.
+            pass
+
+    def estatisticas(self):
+        with self._lock:
+            acertos, faltas = self.acertos, self.faltas
+        total = acertos + faltas
+        return {
+            "nome": self.nome,
+            "acertos": acertos,
+            "faltas": faltas,
+            "taxa_acerto": acertos / total if total else 0.0,
+        }
+
+
+class VersoesTabelas:
+    """
+    Um contador de versão por tabela, guardado no cache do Django e
+    incrementado a cada escrita (ver cadastro_aluno/signals.py). Serve para
+    montar ETags sem consultar o banco: se nenhuma tabela lida por uma rota
+    mudou de versão, a resposta também não mudou.
+
+    O alias (settings.VERSOES_TABELAS_CACHE) precisa apontar para um cache
+    compartilhado (Redis, Memcached) quando há mais de um processo; com
+    LocMemCache cada processo só vê as próprias escritas. Cada versão vive
+    VERSOES_TABELAS_TTL segundos, o que limita quanto tempo um processo pode
+    servir um ETag velho.
+    """
+
+    def __init__(self, alias=None):
+        self._alias = alias
+
+    @property
+    def alias(self):
+        return self._alias or settings.VERSOES_TABELAS_CACHE
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def compartilhado(self):
+        return not isinstance(self.cache, LocMemCache)
+
+    def _chave(self, tabela):
+        return f"versao_tabela:{tabela}"
+
+    def obter(self, *tabelas):
+        """
+        Versões atuais das tabelas, na ordem pedida. Uma ida ao cache (get_many).
+        """
+        chaves = [self._chave(t) for t in tabelas]
+        versoes = self.cache.get_many(chaves)
+        for chave in chaves:
+            if chave not in versoes:
+                # Mesmo motivo do CacheVersionado: começar do relógio evita
+                # repetir uma versão (e um ETag) antigo depois de um descarte.
+                self.cache.add(chave, time.time_ns(), timeout=settings.VERSOES_TABELAS_TTL)
+                versoes[chave] = self.cache.get(chave)
+        return [versoes[chave] for chave in chaves]
+
+    def incrementar(self, tabela):
+        try:
+            self.cache.incr(self._chave(tabela))
+        except ValueError:
+            # Versão ainda não criada: a primeira leitura cria uma nova.
+            pass
+
+
+def linhas_metricas():
+    """
+    Acertos e faltas de todos os caches no formato do Prometheus (para o /api/v1/metrics).
+    """
+    linhas = ["# TYPE cache_hits_total counter"]
+    linhas += [f'cache_hits_total{{cache="{c.nome}"}} {c.acertos}' for c in _instancias]
+    linhas.append("# TYPE cache_misses_total counter")
+    linhas += [f'cache_misses_total{{cache="{c.nome}"}} {c.faltas}' for c in _instancias]
+    return linhas
+
+
+# Catálogo de disciplinas: pequeno, muda poucas vezes por semestre e é lido o tempo todo.
+cache_disciplinas = CacheVersionado("disciplinas", alias="disciplinas")
+
+# Rankings de alunos por semestre/disciplina (cadastro_aluno/ranking.py), um
+# escopo de invalidação por disciplina e por semestre.
+cache_ranking = CacheVersionado("ranking", alias="ranking")
+
+# Contagem de alunos por região/estado/cidade (cadastro_aluno/geografia.py):
+# uma entrada só, invalidada por qualquer escrita em alunos ou endereços.
+cache_geografia = CacheVersionado("geografia", alias="geografia")
+
+# Versões por tabela usadas nos ETags das rotas GET (cadastro_aluno/etag.py).
+versoes_tabelas = VersoesTabelas()
@@ -0,0 +1,20 @@
+from django.core.checks import Tags, Warning, register
+
+from cadastro_aluno.cache import versoes_tabelas
+
+MENSAGEM_VERSOES_LOCAIS = (
+    "settings.VERSOES_TABELAS_CACHE aponta para um cache em memória: com mais de um "
+    "processo, uma escrita em um deles não muda os ETags dos outros, que respondem 304 "
+    "com dados velhos por até VERSOES_TABELAS_TTL segundos."
+)
+
+
+@register(Tags.caches)
+def versoes_compartilhadas(app_configs, **kwargs):
+    if versoes_tabelas.compartilhado():
+        return []
+    return [Warning(
+        MENSAGEM_VERSOES_LOCAIS,
+        hint="Use um cache compartilhado (Redis, Memcached) em CACHES[VERSOES_TABELAS_CACHE].",
+        id="cadastro_aluno.W001",
+    )]
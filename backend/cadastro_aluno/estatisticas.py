@@ -0,0 +1,193 @@
+"""
+Estatísticas das notas por disciplina e por semestre, sem varrer tb_notas.
+
+A tabela tb_estatisticas_disciplina guarda, por disciplina, a quantidade de
+notas, a soma, a soma dos quadrados, a mínima, a máxima e o histograma por
+faixa. Ela é atualizada a cada nota gravada ou removida (ver signals.py),
+com UPDATEs relativos (F()) que não perdem incrementos concorrentes. Só a
+remoção da mínima ou da máxima obriga a reler as notas da disciplina.
+
+Escritas que não passam por Model.save()/delete() (QuerySet.update,
+bulk_create) não atualizam o resumo: chame recalcular() com as disciplinas
+afetadas, ou rode o comando reconstruir_estatisticas.
+"""
+import math
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Q, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, Least
+
+from cadastro_aluno.models import TbEstatisticasDisciplina, TbNotas
+
+FAIXAS = 10
+CAMPOS_FAIXAS = [f"faixa_{i}" for i in range(FAIXAS)]
+CAMPOS = ["quantidade", "soma", "soma_quadrados", "minima", "maxima", *CAMPOS_FAIXAS]
+
+
+def faixa(nota):
+    """
+    Campo do histograma da nota: faixa_N para N <= nota < N + 1 (10 fica na 9).
+    """
+    return CAMPOS_FAIXAS[min(max(int(nota), 0), FAIXAS - 1)]
+
+
+##################### Manutenção incremental #################################
+def incluir(disciplina_id, nota):
+    if disciplina_id is None or nota is None:
+        return
+    nota = Decimal(nota)
+    atualizacao = {
+        "quantidade": F("quantidade") + 1,
+        "soma": F("soma") + nota,
+        "soma_quadrados": F("soma_quadrados") + nota * nota,
+        "minima": Least(Coalesce("minima", Value(nota)), Value(nota)),
+        "maxima": Greatest(Coalesce("maxima", Value(nota)), Value(nota)),
+        faixa(nota): F(faixa(nota)) + 1,
+    }
+    linhas = TbEstatisticasDisciplina.objects.filter(disciplina_id=disciplina_id)
+    with transaction.atomic():
+        if not linhas.update(**atualizacao):
+            # Primeira nota da disciplina. ignore_conflicts: se outra
+            # transação criou a linha ao mesmo tempo, o UPDATE abaixo soma nela.
+            TbEstatisticasDisciplina.objects.bulk_create(
+                [TbEstatisticasDisciplina(disciplina_id=disciplina_id)], ignore_conflicts=True
+            )
+            linhas.update(**atualizacao)
+
+
+def remover(disciplina_id, nota):
+    if disciplina_id is None or nota is None:
+        return
+    nota = Decimal(nota)
+    linhas = TbEstatisticasDisciplina.objects.filter(disciplina_id=disciplina_id)
+    with transaction.atomic():
+        linhas.update(
+            quantidade=F("quantidade") - 1,
+            soma=F("soma") - nota,
+            soma_quadrados=F("soma_quadrados") - nota * nota,
+            **{faixa(nota): F(faixa(nota)) - 1},
+        )
+        # A nota removida era a mínima ou a máxima: a nova só relendo as
+        # notas da disciplina (pelo índice de disciplina_id).
+        if linhas.filter(Q(minima=nota) | Q(maxima=nota)).exists():
+            linhas.update(**TbNotas.objects.filter(disciplina_id=disciplina_id, nota__isnull=False)
+                          .aggregate(minima=Min("nota"), maxima=Max("nota")))
+
+
+##################### Cálculo do zero #################################
+def _filtro_faixa(i):
+    # Mesmas faixas de faixa(): a primeira e a última são abertas nas pontas.
+    filtro = Q()
+    if i > 0:
+        filtro &= Q(nota__gte=i)
+    if i < FAIXAS - 1:
+        filtro &= Q(nota__lt=i + 1)
+    return filtro
+
+
+def calcular(disciplinas=None):
+    """
+    Estatísticas calculadas direto das notas, em um GROUP BY:
+    {disciplina_id: {campo: valor}}.
+    """
+    qs = TbNotas.objects.filter(disciplina__isnull=False, nota__isnull=False)
+    if disciplinas is not None:
+        qs = qs.filter(disciplina_id__in=disciplinas)
+    faixas = {campo: Count("id", filter=_filtro_faixa(i)) for i, campo in enumerate(CAMPOS_FAIXAS)}
+    linhas = qs.values("disciplina_id").order_by().annotate(
+        quantidade=Count("id"),
+        soma=Sum("nota"),
+        soma_quadrados=Sum(F("nota") * F("nota")),
+        minima=Min("nota"),
+        maxima=Max("nota"),
+        **faixas,
+    )
+    return {linha.pop("disciplina_id"): linha for linha in linhas}
+
+
+def recalcular(disciplinas):
+    """
+    Regrava do zero o resumo das 'disciplinas' (None = todas).
+    """
+    calculadas = calcular(disciplinas)
+    with transaction.atomic():
+        existentes = TbEstatisticasDisciplina.objects.all()
+        if disciplinas is not None:
+            existentes = existentes.filter(disciplina_id__in=disciplinas)
+        existentes.delete()
+        TbEstatisticasDisciplina.objects.bulk_create(
+            [TbEstatisticasDisciplina(disciplina_id=disciplina_id, **valores)
+             for disciplina_id, valores in calculadas.items()],
+            batch_size=500,
+        )
+    return len(calculadas)
+
+
+def divergencias():
+    """
+    Compara o resumo gravado com o calculado das notas; devolve uma lista
+    de (disciplina_id, campo, gravado, calculado).
+    """
+    calculadas = calcular()
+    gravadas = {
+        linha.pop("disciplina_id"): linha
+        for linha in TbEstatisticasDisciplina.objects.filter(quantidade__gt=0).values("disciplina_id", *CAMPOS)
+    }
+    diferencas = []
+    for disciplina_id in sorted(calculadas.keys() | gravadas.keys()):
+        calculada, gravada = calculadas.get(disciplina_id, {}), gravadas.get(disciplina_id, {})
+        for campo in CAMPOS:
+            esperado, atual = calculada.get(campo), gravada.get(campo)
+            if (esperado or 0) != (atual or 0) or (esperado is None) != (atual is None):
+                diferencas.append((disciplina_id, campo, atual, esperado))
+    return diferencas
+
+
+##################### Leitura #################################
+def _resumo(linha):
+    quantidade = linha["quantidade"] or 0
+    media = desvio = None
+    if quantidade:
+        media = float(linha["soma"]) / quantidade
+        desvio = math.sqrt(max(0.0, float(linha["soma_quadrados"]) / quantidade - media * media))
+    return {
+        "quantidade": quantidade,
+        "media": media,
+        "desvio_padrao": desvio,
+        "minima": linha["minima"] if quantidade else None,
+        "maxima": linha["maxima"] if quantidade else None,
+        "faixas": [
+            {"inicio": i, "fim": i + 1, "quantidade": linha[campo] or 0} for i, campo in enumerate(CAMPOS_FAIXAS)
+        ],
+    }
+
+
+def da_disciplina(disciplina_id):
+    """
+    Resumo de uma disciplina (uma linha lida pela chave primária), ou None
+    se ela ainda não tem notas.
+    """
+    linha = TbEstatisticasDisciplina.objects.filter(disciplina_id=disciplina_id).values(*CAMPOS).first()
+    return None if linha is None else _resumo(linha)
+
+
+def da_disciplina_vazia():
+    return _resumo({campo: None for campo in CAMPOS})
+
+
+def do_semestre(semestre):
+    """
+    Resumo das notas das disciplinas do semestre, somando as linhas do
+    resumo (uma por disciplina) em vez das notas.
+    """
+    linha = TbEstatisticasDisciplina.objects.filter(disciplina__semestre=semestre).aggregate(
+        disciplinas=Count("disciplina_id", filter=Q(quantidade__gt=0)),
+        quantidade=Sum("quantidade"),
+        soma=Sum("soma"),
+        soma_quadrados=Sum("soma_quadrados"),
+        minima=Min("minima"),
+        maxima=Max("maxima"),
+        **{campo: Sum(campo) for campo in CAMPOS_FAIXAS},
+    )
+    return {"disciplinas": linha["disciplinas"], **_resumo(linha)}
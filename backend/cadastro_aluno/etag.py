@@ -0,0 +1,92 @@
+"""
+GET condicional (ETag / If-None-Match) para as rotas de leitura.
+
+O ETag de uma resposta é derivado só das versões das tabelas que a rota lê
+(cadastro_aluno.cache.versoes_tabelas), e não do corpo. Assim, quando o
+cliente manda If-None-Match com o ETag atual, o 304 sai antes de qualquer
+consulta ao banco ou serialização.
+
+Um corpo lido de uma réplica (core/replicas.py) sai sem ETag: a réplica pode
+estar atrás da versão atual, e o cliente guardaria dados velhos sob um ETag
+que só deixa de valer na próxima escrita.
+
+Uso, em cima do handler e abaixo do @router.get:
+
+    @router.get("/disciplinas", ...)
+    @decorate_view(condicional(TbDisciplinas))
+    def listar_disciplinas(request): ...
+"""
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+
+from django.http import HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+
+from cadastro_aluno.cache import versoes_tabelas
+from core.replicas import observar_leituras
+
+
+def _etag(request, versoes):
+    # Inclui o caminho completo (com a query string) para que rotas e
+    # parâmetros diferentes não compartilhem o mesmo ETag.
+    base = f"{request.get_full_path()}|{'.'.join(map(str, versoes))}"
+    return f'W/"{hashlib.blake2b(base.encode(), digest_size=12).hexdigest()}"'
+
+
+def _nao_modificado(request, etag):
+    enviados = parse_etags(request.headers.get("If-None-Match", ""))
+    # Comparação fraca (RFC 9110): W/"x" e "x" valem o mesmo.
+    return "*" in enviados or etag.removeprefix("W/") in {e.removeprefix("W/") for e in enviados}
+
+
+def _com_etag(response, etag):
+    response["ETag"] = etag
+    # O navegador pode guardar, mas deve revalidar a cada uso.
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def _resposta(response, etag, replicas):
+    # Erros não levam ETag; um corpo lido de réplica também não (ver acima).
+    if response.status_code != 200 or replicas:
+        return response
+    return _com_etag(response, etag)
+
+
+def condicional(*modelos):
+    """
+    Decorator (via ninja.decorators.decorate_view) que responde 304 quando
+    nenhuma das tabelas de 'modelos' mudou desde o ETag enviado pelo cliente.
+    Serve para handlers síncronos e assíncronos.
+    """
+    tabelas = [m._meta.db_table for m in modelos]
+
+    def decorator(run):
+        if iscoroutinefunction(run):
+            @wraps(run)
+            async def wrapper_assincrono(request, *args, **kwargs):
+                # O cache do Django é síncrono (mesmo motivo de api_async.py).
+                etag = _etag(request, await sync_to_async(versoes_tabelas.obter)(*tabelas))
+                if _nao_modificado(request, etag):
+                    return _com_etag(HttpResponseNotModified(), etag)
+                with observar_leituras() as replicas:
+                    response = await run(request, *args, **kwargs)
+                return _resposta(response, etag, replicas)
+
+            return wrapper_assincrono
+
+        @wraps(run)
+        def wrapper(request, *args, **kwargs):
+            etag = _etag(request, versoes_tabelas.obter(*tabelas))
+            if _nao_modificado(request, etag):
+                return _com_etag(HttpResponseNotModified(), etag)
+            with observar_leituras() as replicas:
+                response = run(request, *args, **kwargs)
+            return _resposta(response, etag, replicas)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,178 @@
+"""
+Exportação de alunos com o endereço já juntado (CSV, NDJSON ou Parquet).
+
+Substitui o fluxo de carregar TbAlunos e TbEnderecos inteiros em dois
+DataFrames e juntar em memória: aqui o JOIN é feito pelo banco e as linhas
+são lidas em blocos de settings.STREAMING_CHUNK_SIZE e escritas à medida que
+chegam, então a memória usada não cresce com o tamanho da tabela.
+
+Usado pelo endpoint /exportar-alunos e pelo comando 'manage.py exportar_alunos'.
+"""
+import csv
+import io
+import json
+
+from django.conf import settings
+
+from cadastro_aluno.models import TbAlunos, TbNotas
+
+# (nome da coluna no arquivo, caminho no ORM). O endereço vem por JOIN (LEFT
+# OUTER, já que endereco é opcional) na mesma consulta dos alunos.
+COLUNAS = [
+    ("id", "id"),
+    ("matricula", "matricula"),
+    ("nome", "nome"),
+    ("email", "email"),
+    ("nome_mae", "nome_mae"),
+    ("endereco_id", "endereco_id"),
+    ("cep", "endereco__cep"),
+    ("endereco", "endereco__endereco"),
+    ("bairro", "endereco__bairro"),
+    ("cidade", "endereco__cidade"),
+    ("estado", "endereco__estado"),
+    ("regiao", "endereco__regiao"),
+]
+COLUNAS_INTEIRAS = {"id", "endereco_id"}
+
+# formato -> (content type, extensão)
+FORMATOS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+class ErroExportacao(Exception):
+    pass
+
+
+def consultar(estado=None, semestre=None):
+    """
+    Alunos com endereço, opcionalmente só os de um estado e/ou os que têm
+    nota em alguma disciplina do semestre informado.
+    """
+    qs = TbAlunos.objects.all()
+    if estado:
+        qs = qs.filter(endereco__estado__iexact=estado)
+    if semestre is not None:
+        # Subconsulta (e não JOIN com as notas) para não repetir o aluno
+        # uma vez por nota.
+        qs = qs.filter(id__in=TbNotas.objects.filter(disciplina__semestre=semestre).values("aluno_id"))
+    return qs
+
+
+def blocos_de_linhas(qs, tamanho=None, caminhos=None):
+    """
+    Percorre 'qs' em blocos por id (keyset). Cada bloco é uma consulta curta
+    com LIMIT: diferente do .iterator(), que no MySQL traz o resultado inteiro
+    para a memória do cliente, isso mantém a memória constante em qualquer banco.
+    'caminhos' são as colunas lidas (o id primeiro); por padrão as de COLUNAS.
+    """
+    tamanho = tamanho or settings.STREAMING_CHUNK_SIZE
+    caminhos = caminhos or [caminho for _, caminho in COLUNAS]
+    ultimo_id = None
+    while True:
+        bloco_qs = qs.order_by("id")
+        if ultimo_id is not None:
+            bloco_qs = bloco_qs.filter(id__gt=ultimo_id)
+        bloco = list(bloco_qs.values_list(*caminhos)[:tamanho])
+        if not bloco:
+            return
+        yield bloco
+        ultimo_id = bloco[-1][0]
+
+
+class _Eco:
+    """
+    "Arquivo" que só devolve o que recebe, para o csv.writer gerar texto sem buffer.
+    """
+
+    def write(self, valor):
+        return valor
+
+
+def _csv(blocos):
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow([nome for nome, _ in COLUNAS]).encode()
+    for bloco in blocos:
+        yield "".join(escritor.writerow(linha) for linha in bloco).encode()
+
+
+def _ndjson(blocos):
+    nomes = [nome for nome, _ in COLUNAS]
+    for bloco in blocos:
+        yield "".join(
+            json.dumps(dict(zip(nomes, linha)), ensure_ascii=False) + "\n" for linha in bloco
+        ).encode()
+
+
+class _SaidaIncremental(io.RawIOBase):
+    """
+    Destino do ParquetWriter que entrega os bytes em pedaços. Guarda a
+    posição total escrita porque o rodapé do Parquet registra os offsets
+    de cada row group a partir do tell().
+    """
+
+    def __init__(self):
+        self._pedacos = []
+        self._posicao = 0
+
+    def writable(self):
+        return True
+
+    def write(self, dados):
+        dados = bytes(dados)
+        self._pedacos.append(dados)
+        self._posicao += len(dados)
+        return len(dados)
+
+    def tell(self):
+        return self._posicao
+
+    def retirar(self):
+        dados = b"".join(self._pedacos)
+        self._pedacos = []
+        return dados
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ErroExportacao(
+            "Exportação em Parquet requer o pyarrow (pip install \"backend-django[parquet]\")."
+        ) from None
+    return pyarrow, pyarrow.parquet
+
+
+def _parquet(blocos):
+    pa, pq = _pyarrow()
+    esquema = pa.schema([(nome, pa.int64() if nome in COLUNAS_INTEIRAS else pa.string()) for nome, _ in COLUNAS])
+    saida = _SaidaIncremental()
+    with pq.ParquetWriter(saida, esquema) as escritor:
+        # Um row group por bloco lido do banco.
+        for bloco in blocos:
+            colunas = list(zip(*bloco))
+            escritor.write_table(pa.Table.from_arrays(
+                [pa.array(valores, type=campo.type) for valores, campo in zip(colunas, esquema)],
+                schema=esquema,
+            ))
+            yield saida.retirar()
+    yield saida.retirar()
+
+
+_ESCRITORES = {"csv": _csv, "ndjson": _ndjson, "parquet": _parquet}
+
+
+def exportar(formato, estado=None, semestre=None):
+    """
+    Gerador com os bytes do arquivo exportado, bloco a bloco.
+    Levanta ErroExportacao antes de ler o banco se o formato não puder ser gerado.
+    """
+    if formato not in _ESCRITORES:
+        raise ErroExportacao(f"Formato '{formato}' inválido. Use: {', '.join(FORMATOS)}.")
+    if formato == "parquet":
+        # Confere o pyarrow já aqui, para o erro sair antes de a resposta começar.
+        _pyarrow()
+    return _ESCRITORES[formato](blocos_de_linhas(consultar(estado, semestre)))
@@ -0,0 +1,74 @@
+"""
+Quantidade de alunos por região, estado e cidade do endereço.
+
+Um único GROUP BY (região, estado, cidade) sobre tb_alunos com LEFT JOIN em
+tb_enderecos devolve uma linha por cidade; os totais por estado e por
+região são somados a partir dessas linhas, sem outra consulta. O resultado
+completo fica em cache_geografia e é invalidado pelas escritas em alunos e
+endereços (ver signals.py).
+"""
+from django.db.models import Count
+
+from cadastro_aluno.cache import cache_geografia
+from cadastro_aluno.models import TbAlunos
+
+
+def _somar(totais, chave, quantidade):
+    totais[chave] = totais.get(chave, 0) + quantidade
+
+
+def calcular():
+    linhas = (
+        TbAlunos.objects.values("endereco__regiao", "endereco__estado", "endereco__cidade")
+        .order_by()
+        .annotate(quantidade=Count("id"))
+    )
+    regioes, estados, cidades = {}, {}, {}
+    total = sem_endereco = 0
+    for linha in linhas:
+        regiao, estado, cidade = linha["endereco__regiao"], linha["endereco__estado"], linha["endereco__cidade"]
+        quantidade = linha["quantidade"]
+        total += quantidade
+        if estado is None:
+            # estado e cidade são obrigatórios no endereço: só o LEFT JOIN
+            # dos alunos sem endereço chega aqui sem eles.
+            sem_endereco += quantidade
+            continue
+        _somar(regioes, regiao, quantidade)
+        _somar(estados, (estado, regiao), quantidade)
+        _somar(cidades, (cidade, estado), quantidade)
+    return {
+        "total": total,
+        "sem_endereco": sem_endereco,
+        "regioes": [{"regiao": r, "quantidade": n} for r, n in regioes.items()],
+        "estados": [{"estado": e, "regiao": r, "quantidade": n} for (e, r), n in estados.items()],
+        "cidades": [{"cidade": c, "estado": e, "quantidade": n} for (c, e), n in cidades.items()],
+    }
+
+
+def _ordenar(faixas, campo):
+    # Mais alunos primeiro; empates pelo nome (None por último).
+    return sorted(faixas, key=lambda f: (-f["quantidade"], f[campo] is None, f[campo] or ""))
+
+
+def alunos_por_localidade(estado=None):
+    """
+    Contagens por região, estado e cidade. Com 'estado' (sem diferenciar
+    maiúsculas) só as faixas desse estado e da região dele; o filtro é
+    aplicado sobre o resultado em cache, que é sempre o completo.
+    """
+    resumo = cache_geografia.obter("localidades", calcular)
+    regioes, estados, cidades = resumo["regioes"], resumo["estados"], resumo["cidades"]
+    if estado is not None:
+        estado = estado.casefold()
+        estados = [e for e in estados if e["estado"].casefold() == estado]
+        cidades = [c for c in cidades if c["estado"].casefold() == estado]
+        nomes_regioes = {e["regiao"] for e in estados}
+        regioes = [r for r in regioes if r["regiao"] in nomes_regioes]
+    return {
+        "total": resumo["total"],
+        "sem_endereco": resumo["sem_endereco"],
+        "regioes": _ordenar(regioes, "regiao"),
+        "estados": _ordenar(estados, "estado"),
+        "cidades": _ordenar(cidades, "cidade"),
+    }
@@ -0,0 +1,197 @@
+"""
+Importação de planilhas CSV de alunos e endereços com upsert em lote.
+
+O arquivo é lido como stream, em blocos de settings.BULK_BATCH_SIZE linhas.
+Para cada bloco:
+  1. cada linha é validada com o schema de criação dos endpoints unitários;
+  2. (alunos) o endereco_id é resolvido pelo 'cep' com UMA consulta por bloco;
+  3. as linhas válidas são gravadas com bulk_create(update_conflicts=True):
+     matrícula/CEP novos são inseridos e os já existentes são atualizados,
+     só nas colunas preenchidas (célula vazia mantém o valor gravado).
+
+Linhas rejeitadas não interrompem a importação; elas vão, com o número da
+linha e o motivo, para o CSV de rejeitadas.
+"""
+import csv
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+from pydantic import ValidationError
+
+from cadastro_aluno.lote import _mensagem_validacao
+from cadastro_aluno.models import TbAlunos, TbEnderecos
+from cadastro_aluno.schemas import AlunoCreateSchema, EnderecoCreateSchema
+from cadastro_aluno.signals import registros_alterados
+
+# tipo -> (modelo, schema, campo único usado no upsert)
+TIPOS = {
+    "alunos": (TbAlunos, AlunoCreateSchema, "matricula"),
+    "enderecos": (TbEnderecos, EnderecoCreateSchema, "cep"),
+}
+
+
+class ErroImportacao(Exception):
+    pass
+
+
+def _blocos(leitor, tamanho):
+    bloco = []
+    # Linha 1 é o cabeçalho: a primeira linha de dados é a 2, como na planilha.
+    for numero, linha in enumerate(leitor, start=2):
+        bloco.append((numero, linha))
+        if len(bloco) >= tamanho:
+            yield bloco
+            bloco = []
+    if bloco:
+        yield bloco
+
+
+def _com_progresso(blocos, progresso):
+    # Avisa depois que cada bloco foi processado (quando o próximo é pedido).
+    lidas = 0
+    for bloco in blocos:
+        yield bloco
+        lidas += len(bloco)
+        progresso(lidas)
+
+
+def _limpar(linha):
+    # Célula vazia na planilha = campo não informado.
+    return {campo: (valor.strip() or None) if isinstance(valor, str) else valor
+            for campo, valor in linha.items() if campo}
+
+
+def _resolver_enderecos(validos, rejeitar):
+    """
+    Troca o 'cep' das linhas de alunos pelo endereco_id, com uma consulta para o bloco todo.
+    """
+    ceps = {dados["cep"] for _, dados in validos if dados.get("cep")}
+    ids_por_cep = dict(TbEnderecos.objects.filter(cep__in=ceps).values_list("cep", "id")) if ceps else {}
+    resolvidos = []
+    for numero, dados in validos:
+        cep = dados.pop("cep", None)
+        if cep:
+            if cep not in ids_por_cep:
+                rejeitar(numero, f"cep '{cep}' não cadastrado")
+                continue
+            dados["endereco_id"] = ids_por_cep[cep]
+        resolvidos.append((numero, dados))
+    return resolvidos
+
+
+def _gravar(modelo, campo_unico, linhas, campos_atualizados):
+    """
+    Upsert do bloco. Devolve os ids gravados.
+    """
+    # Dentro de um mesmo INSERT a mesma chave não pode aparecer duas vezes:
+    # as linhas repetidas são juntadas como se o arquivo fosse aplicado
+    # linha a linha (a última célula preenchida de cada coluna vale).
+    por_chave = {}
+    for dados in linhas:
+        chave = dados[campo_unico]
+        if chave in por_chave:
+            por_chave[chave].update((campo, valor) for campo, valor in dados.items() if valor is not None)
+        else:
+            por_chave[chave] = dict(dados)
+    # O update_fields do bulk_create vale para todas as linhas do INSERT: as
+    # linhas são agrupadas pelas colunas preenchidas e cada grupo atualiza só
+    # as suas, para uma célula vazia não apagar o valor já gravado.
+    grupos = {}
+    for dados in por_chave.values():
+        preenchidos = tuple(c for c in campos_atualizados if dados.get(c) is not None)
+        grupos.setdefault(preenchidos, []).append(dados)
+    with transaction.atomic():
+        for preenchidos, grupo in grupos.items():
+            if preenchidos:
+                opcoes = {"update_conflicts": True, "update_fields": list(preenchidos)}
+                # MySQL não aceita indicar a chave do conflito (ON DUPLICATE KEY
+                # UPDATE vale para qualquer índice único); PostgreSQL e SQLite exigem.
+                if connection.features.supports_update_conflicts_with_target:
+                    opcoes["unique_fields"] = [campo_unico]
+            else:
+                # Só a chave preenchida: insere os novos, não há o que atualizar.
+                opcoes = {"ignore_conflicts": True}
+            modelo.objects.bulk_create([modelo(**dados) for dados in grupo], **opcoes)
+    # Os ids não voltam do upsert no MySQL: são lidos pela chave única.
+    return list(modelo.objects.filter(**{f"{campo_unico}__in": list(por_chave)}).values_list("id", flat=True))
+
+
+def importar_csv(arquivo, tipo, rejeitadas=None, delimitador=",", progresso=None):
+    """
+    Importa o CSV (arquivo de texto já aberto) de 'tipo' ("alunos" ou "enderecos").
+
+    'rejeitadas', se informado, recebe um CSV com as linhas recusadas
+    (número da linha, motivo e as colunas originais). 'progresso', se
+    informado, é chamado com o total de linhas lidas a cada bloco. Devolve
+    as contagens, a duração e a vazão em linhas por segundo.
+    """
+    if tipo not in TIPOS:
+        raise ErroImportacao(f"Tipo '{tipo}' inválido. Use: {', '.join(TIPOS)}.")
+    modelo, schema, campo_unico = TIPOS[tipo]
+
+    inicio = time.perf_counter()
+    leitor = csv.DictReader(arquivo, delimiter=delimitador)
+    cabecalho = [c.strip() for c in (leitor.fieldnames or []) if c]
+    if campo_unico not in cabecalho:
+        raise ErroImportacao(f"O CSV precisa de uma coluna '{campo_unico}'.")
+    leitor.fieldnames = cabecalho
+
+    # Só as colunas presentes no arquivo (e, em cada linha, as preenchidas)
+    # são atualizadas nos registros que já existem; uma planilha sem 'email'
+    # ou com o email em branco não apaga o email cadastrado.
+    campos_atualizados = [c for c in schema.model_fields if c in cabecalho and c != campo_unico]
+    if tipo == "alunos" and "cep" in cabecalho and "endereco_id" not in campos_atualizados:
+        campos_atualizados.append("endereco_id")
+
+    escritor = None
+    if rejeitadas is not None:
+        escritor = csv.writer(rejeitadas)
+        escritor.writerow(["linha", "erro", *cabecalho])
+
+    totais = {"lidas": 0, "gravadas": 0, "rejeitadas": 0}
+    blocos = _blocos(leitor, settings.BULK_BATCH_SIZE)
+    if progresso is not None:
+        blocos = _com_progresso(blocos, progresso)
+    for bloco in blocos:
+        originais = dict(bloco)
+
+        def rejeitar(numero, motivo):
+            totais["rejeitadas"] += 1
+            if escritor:
+                escritor.writerow([numero, motivo, *(originais[numero].get(c) for c in cabecalho)])
+
+        totais["lidas"] += len(bloco)
+        validos = []
+        for numero, linha in bloco:
+            dados = _limpar(linha)
+            try:
+                validado = schema.model_validate(dados).dict()
+            except ValidationError as e:
+                rejeitar(numero, _mensagem_validacao(e))
+                continue
+            if tipo == "alunos":
+                validado["cep"] = dados.get("cep")
+            validos.append((numero, validado))
+        if tipo == "alunos":
+            validos = _resolver_enderecos(validos, rejeitar)
+        if not validos:
+            continue
+
+        try:
+            ids = _gravar(modelo, campo_unico, [dados for _, dados in validos], campos_atualizados)
+        except Exception as e:
+            # Um erro do banco desfaz só este bloco; as linhas dele vão para as rejeitadas.
+            for numero, _ in validos:
+                rejeitar(numero, f"erro ao gravar o bloco: {e}")
+            continue
+        totais["gravadas"] += len(validos)
+        # bulk_create não dispara post_save (índice de busca, índice de CEPs...).
+        registros_alterados.send(sender=modelo, ids=ids)
+
+    segundos = time.perf_counter() - inicio
+    return {
+        **totais,
+        "segundos": round(segundos, 3),
+        "linhas_por_segundo": round(totais["lidas"] / segundos, 1) if segundos else 0.0,
+    }
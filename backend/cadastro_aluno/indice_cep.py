@@ -0,0 +1,176 @@
+"""
+Índice de CEPs em memória para o autocomplete de endereços.
+
+Guarda os CEPs (só os dígitos) em uma lista ordenada, com os ids na mesma
+posição de uma lista paralela; a busca por prefixo é uma busca binária
+(bisect) seguida da leitura dos vizinhos, O(log n + k), sem ir ao banco.
+
+O índice é carregado do banco no primeiro uso e atualizado linha a linha
+pelos signals de TbEnderecos (ver cadastro_aluno/signals.py). Como cada
+processo tem a sua cópia, ele também é recarregado por inteiro depois de
+settings.INDICE_CEP_TTL_SEGUNDOS, para pegar escritas feitas por outros
+processos (0 desliga a recarga). A recarga roda numa thread: o índice novo é
+montado sem o lock e trocado pelo antigo, que atende as buscas enquanto isso.
+"""
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+from cadastro_aluno.models import TbEnderecos
+
+CAMPOS = ("id", "cep", "endereco", "bairro", "cidade", "estado", "regiao")
+
+
+def normalizar_cep(cep):
+    """
+    Só os dígitos do CEP: "01310-100" e "01310100" viram a mesma chave.
+    """
+    return "".join(c for c in str(cep) if c.isdigit())
+
+
+class IndiceCep:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._carga = threading.Lock()  # uma leitura completa do banco por vez
+        self._chaves = []      # CEPs normalizados, em ordem
+        self._ids = []         # id do endereço na mesma posição de _chaves
+        self._registros = {}   # id -> dados do endereço devolvidos pela API
+        self._carregado_em = None
+        self._recarregando = False
+        self._alterados = None  # ids avisados durante uma leitura completa (None fora dela)
+
+    def _ler(self):
+        registros = {r["id"]: r for r in TbEnderecos.objects.values(*CAMPOS).iterator(chunk_size=5000)}
+        pares = sorted((normalizar_cep(r["cep"]), r["id"]) for r in registros.values())
+        return [chave for chave, _ in pares], [id_ for _, id_ in pares], registros
+
+    def _trocar(self):
+        # Chamado com self._carga. O banco é lido sem self._lock; escritas
+        # avisadas durante a leitura podem ter ficado de fora dela e são
+        # relidas depois da troca.
+        with self._lock:
+            self._alterados = set()
+        try:
+            chaves, ids, registros = self._ler()
+        except Exception:
+            with self._lock:
+                self._alterados = None
+            raise
+        with self._lock:
+            alterados, self._alterados = self._alterados, None
+            self._chaves, self._ids, self._registros = chaves, ids, registros
+            self._carregado_em = time.monotonic()
+        if alterados:
+            self.atualizar(alterados)
+
+    def recarregar(self):
+        """
+        Monta o índice de novo a partir do banco e troca o atual por ele. As
+        buscas continuam usando o atual durante a leitura.
+        """
+        try:
+            with self._carga:
+                self._trocar()
+        finally:
+            with self._lock:
+                self._recarregando = False
+
+    def _recarregar_em_thread(self):
+        # Como no pool de tarefas: a thread abre e fecha as próprias conexões.
+        close_old_connections()
+        try:
+            self.recarregar()
+        finally:
+            connections.close_all()
+
+    def _recarregar_em_segundo_plano(self):
+        threading.Thread(target=self._recarregar_em_thread, name="indice-cep", daemon=True).start()
+
+    def _garantir_carregado(self):
+        if self._carregado_em is None:
+            # Primeira carga: não há índice para responder, a busca espera.
+            with self._carga:
+                if self._carregado_em is None:
+                    self._trocar()
+            return
+        ttl = settings.INDICE_CEP_TTL_SEGUNDOS
+        with self._lock:
+            vencido = bool(ttl) and not self._recarregando and time.monotonic() - self._carregado_em > ttl
+            if vencido:
+                self._recarregando = True
+        if vencido:
+            self._recarregar_em_segundo_plano()
+
+    def buscar(self, prefixo, limite):
+        """
+        Até 'limite' endereços cujo CEP começa com 'prefixo', em ordem de CEP.
+        """
+        prefixo = normalizar_cep(prefixo)
+        self._garantir_carregado()
+        with self._lock:
+            resultado = []
+            posicao = bisect_left(self._chaves, prefixo)
+            while posicao < len(self._chaves) and len(resultado) < limite and self._chaves[posicao].startswith(prefixo):
+                resultado.append(self._registros[self._ids[posicao]])
+                posicao += 1
+            return resultado
+
+    def _remover(self, id_):
+        registro = self._registros.pop(id_, None)
+        if registro is None:
+            return
+        chave = normalizar_cep(registro["cep"])
+        posicao = bisect_left(self._chaves, chave)
+        # CEPs são únicos, mas a chave normalizada pode repetir ("01000000" e "01000-000").
+        while self._ids[posicao] != id_:
+            posicao += 1
+        del self._chaves[posicao]
+        del self._ids[posicao]
+
+    def _inserir(self, registro):
+        chave = normalizar_cep(registro["cep"])
+        posicao = bisect_left(self._chaves, chave)
+        self._chaves.insert(posicao, chave)
+        self._ids.insert(posicao, registro["id"])
+        self._registros[registro["id"]] = registro
+
+    def atualizar(self, ids):
+        """
+        Relê do banco os endereços informados (inseridos, alterados ou removidos).
+        Se o índice ainda não foi carregado, não há nada a fazer: a carga inicial já os verá.
+        """
+        ids = set(ids)
+        with self._lock:
+            if self._alterados is not None:
+                self._alterados |= ids
+            if self._carregado_em is None:
+                return
+            atuais = list(TbEnderecos.objects.filter(id__in=ids).values(*CAMPOS))
+            for id_ in ids:
+                self._remover(id_)
+            for registro in atuais:
+                self._inserir(registro)
+
+    def remover(self, ids):
+        with self._lock:
+            if self._alterados is not None:
+                self._alterados |= set(ids)
+            for id_ in ids:
+                self._remover(id_)
+
+    def descartar(self):
+        """
+        Esquece o conteúdo; a próxima busca recarrega tudo do banco.
+        """
+        with self._lock:
+            self._chaves, self._ids, self._registros = [], [], {}
+            self._carregado_em = None
+
+    def __len__(self):
+        return len(self._chaves)
+
+
+indice_cep = IndiceCep()
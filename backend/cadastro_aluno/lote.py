@@ -0,0 +1,187 @@
+from django.conf import settings
+from django.db import connection, models, transaction
+from pydantic import ValidationError
+
+from cadastro_aluno.signals import registros_alterados
+
+
+def _mensagem_validacao(erro):
+    """
+    Resume os erros do pydantic em uma única mensagem (ex: "email: value is not a valid email").
+    """
+    partes = []
+    for e in erro.errors():
+        campo = ".".join(str(p) for p in e["loc"]) or "item"
+        partes.append(f"{campo}: {e['msg']}")
+    return "; ".join(partes)
+
+
+def _em_blocos(valores, tamanho):
+    for inicio in range(0, len(valores), tamanho):
+        yield valores[inicio:inicio + tamanho]
+
+
+def _verificar_chaves_estrangeiras(modelo, validos, resultados):
+    """
+    Marca com erro os itens que apontam para um registro relacionado inexistente
+    (ex: endereco_id) e devolve só os que passaram. Uma consulta por relação.
+    """
+    for campo in modelo._meta.concrete_fields:
+        if not isinstance(campo, models.ForeignKey):
+            continue
+        ids = {d.get(campo.attname) for _, d in validos} - {None}
+        if not ids:
+            continue
+        encontrados = set(campo.related_model.objects.filter(pk__in=ids).values_list("pk", flat=True))
+        for i, dados in validos:
+            valor = dados.get(campo.attname)
+            if valor is not None and valor not in encontrados:
+                resultados[i]["erro"] = f"{campo.attname} {valor} não encontrado"
+        validos = [(i, d) for i, d in validos if resultados[i]["erro"] is None]
+    return validos
+
+
+def inserir_em_lote(modelo, schema, itens, campo_unico=None):
+    """
+    Valida cada item com o 'schema' e grava os válidos com bulk_create em uma transação.
+
+    Devolve uma lista com um resultado por item, na mesma ordem da entrada:
+    {"linha": i, "id_criado": id ou None, "erro": mensagem ou None}.
+    Um item inválido não derruba o lote: ele só recebe o erro no relatório.
+    """
+    resultados = [{"linha": i, "id_criado": None, "erro": None} for i in range(len(itens))]
+
+    # 1. Validação item a item com o schema de criação já usado nos endpoints unitários.
+    validos = []
+    for i, item in enumerate(itens):
+        try:
+            validos.append((i, schema.model_validate(item).dict()))
+        except ValidationError as e:
+            resultados[i]["erro"] = _mensagem_validacao(e)
+
+    # 2. Campo único (matricula/cep): repetido dentro do lote ou já existente no banco.
+    if campo_unico:
+        vistos = set()
+        sem_repeticao = []
+        for i, dados in validos:
+            valor = dados[campo_unico]
+            if valor in vistos:
+                resultados[i]["erro"] = f"{campo_unico} '{valor}' repetido no lote"
+                continue
+            vistos.add(valor)
+            sem_repeticao.append((i, dados))
+        validos = sem_repeticao
+
+        existentes = set()
+        for bloco in _em_blocos([d[campo_unico] for _, d in validos], settings.BULK_BATCH_SIZE):
+            existentes.update(
+                modelo.objects.filter(**{f"{campo_unico}__in": bloco}).values_list(campo_unico, flat=True)
+            )
+        for i, dados in validos:
+            if dados[campo_unico] in existentes:
+                resultados[i]["erro"] = f"{campo_unico} '{dados[campo_unico]}' já cadastrado"
+        validos = [(i, d) for i, d in validos if resultados[i]["erro"] is None]
+
+    # 3. Chaves estrangeiras (ex: endereco_id): uma consulta por relação.
+    validos = _verificar_chaves_estrangeiras(modelo, validos, resultados)
+
+    if not validos:
+        return resultados
+
+    # 4. Gravação em lotes de BULK_BATCH_SIZE dentro de uma única transação.
+    # O MySQL não devolve os ids gerados pelo bulk_create. Com campo único eles
+    # são recuperados depois, com uma consulta por bloco; sem ele (disciplinas)
+    # não há como achar cada linha, então vai um INSERT por item, que devolve
+    # o id, e o post_save de cada um faz o papel do registros_alterados.
+    linha_a_linha = not campo_unico and not connection.features.can_return_rows_from_bulk_insert
+    with transaction.atomic():
+        if linha_a_linha:
+            objetos = [modelo(**dados) for _, dados in validos]
+            for objeto in objetos:
+                objeto.save(force_insert=True)
+        else:
+            objetos = modelo.objects.bulk_create(
+                [modelo(**dados) for _, dados in validos],
+                batch_size=settings.BULK_BATCH_SIZE,
+            )
+
+    # Ids que o bulk_create não devolveu, achados pelo campo único.
+    if objetos[0].pk is None and campo_unico:
+        ids_por_valor = {}
+        for bloco in _em_blocos([getattr(o, campo_unico) for o in objetos], settings.BULK_BATCH_SIZE):
+            ids_por_valor.update(
+                modelo.objects.filter(**{f"{campo_unico}__in": bloco}).values_list(campo_unico, "id")
+            )
+        for objeto in objetos:
+            objeto.pk = ids_por_valor.get(getattr(objeto, campo_unico))
+
+    for (i, _), objeto in zip(validos, objetos):
+        resultados[i]["id_criado"] = objeto.pk
+
+    if not linha_a_linha:
+        # bulk_create não dispara post_save.
+        registros_alterados.send(sender=modelo, ids=[o.pk for o in objetos if o.pk is not None])
+    return resultados
+
+
+def atualizar_em_lote(modelo, schema, itens):
+    """
+    Aplica atualizações parciais [{"id": 1, <campos>}, ...] com bulk_update em uma transação.
+
+    Cada item é validado com o schema de atualização considerando só os campos
+    enviados (exclude_unset). Os itens são agrupados pelo conjunto de campos
+    alterados e cada grupo vira um bulk_update (um UPDATE ... CASE por bloco
+    de BULK_BATCH_SIZE). Devolve um resultado por item, na ordem da entrada:
+    {"linha": i, "id": id, "erro": mensagem ou None}, mais a lista dos ids
+    encontrados e atualizados.
+    """
+    resultados = [{"linha": i, "id": None, "erro": None} for i in range(len(itens))]
+
+    # 1. Validação: 'id' obrigatório e ao menos um campo conhecido.
+    validos = []
+    for i, item in enumerate(itens):
+        if not isinstance(item, dict) or type(item.get("id")) is not int:
+            resultados[i]["erro"] = "id: informe o id (inteiro) do registro"
+            continue
+        resultados[i]["id"] = item["id"]
+        try:
+            dados = schema.model_validate(item).dict(exclude_unset=True)
+        except ValidationError as e:
+            resultados[i]["erro"] = _mensagem_validacao(e)
+            continue
+        if not dados:
+            resultados[i]["erro"] = "nenhum campo para atualizar"
+            continue
+        validos.append((i, dados))
+
+    # 2. Ids inexistentes.
+    existentes = set()
+    for bloco in _em_blocos(list({resultados[i]["id"] for i, _ in validos}), settings.BULK_BATCH_SIZE):
+        existentes.update(modelo.objects.filter(pk__in=bloco).values_list("pk", flat=True))
+    for i, _ in validos:
+        if resultados[i]["id"] not in existentes:
+            resultados[i]["erro"] = f"id {resultados[i]['id']} não encontrado"
+    validos = [(i, d) for i, d in validos if resultados[i]["erro"] is None]
+
+    # 3. Chaves estrangeiras informadas (ex: endereco_id).
+    validos = _verificar_chaves_estrangeiras(modelo, validos, resultados)
+
+    # 4. O mesmo id várias vezes: os campos se somam e o último valor de cada campo vale.
+    por_id = {}
+    for i, dados in validos:
+        por_id.setdefault(resultados[i]["id"], {}).update(dados)
+
+    grupos = {}
+    for id_, dados in por_id.items():
+        grupos.setdefault(frozenset(dados), []).append(modelo(pk=id_, **dados))
+
+    with transaction.atomic():
+        for campos, objetos in grupos.items():
+            modelo.objects.bulk_update(objetos, sorted(campos), batch_size=settings.BULK_BATCH_SIZE)
+
+    atualizados = list(por_id)
+    if atualizados:
+        # bulk_update não dispara post_save.
+        campos_alterados = set().union(*grupos)
+        registros_alterados.send(sender=modelo, ids=atualizados, campos=campos_alterados)
+    return resultados, atualizados
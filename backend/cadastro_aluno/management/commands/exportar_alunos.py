@@ -0,0 +1,37 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cadastro_aluno import exportacao
+
+
+class Command(BaseCommand):
+    help = "Exporta os alunos com o endereço (CSV, NDJSON ou Parquet) sem carregar a tabela inteira na memória."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--formato", choices=list(exportacao.FORMATOS), default="csv")
+        parser.add_argument("--saida", help="arquivo de destino (padrão: saída padrão; obrigatório para parquet)")
+        parser.add_argument("--estado", help="só alunos com endereço neste estado")
+        parser.add_argument("--semestre", type=int, help="só alunos com nota em disciplinas deste semestre")
+
+    def handle(self, *args, **options):
+        if options["formato"] == "parquet" and not options["saida"]:
+            raise CommandError("Informe --saida para exportar em parquet.")
+        try:
+            conteudo = exportacao.exportar(options["formato"], estado=options["estado"], semestre=options["semestre"])
+        except exportacao.ErroExportacao as e:
+            raise CommandError(str(e))
+
+        total = 0
+        destino = open(options["saida"], "wb") if options["saida"] else sys.stdout.buffer
+        try:
+            for pedaco in conteudo:
+                destino.write(pedaco)
+                total += len(pedaco)
+        finally:
+            if options["saida"]:
+                destino.close()
+            else:
+                destino.flush()
+        if options["saida"]:
+            self.stdout.write(self.style.SUCCESS(f"{total} bytes gravados em {options['saida']}."))
@@ -0,0 +1,41 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cadastro_aluno import importacao
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa um CSV de alunos (chave: matricula, endereço pela coluna 'cep') ou de "
+        "endereços (chave: cep), inserindo os novos e atualizando os existentes em lote."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("tipo", choices=list(importacao.TIPOS))
+        parser.add_argument("arquivo", type=Path)
+        parser.add_argument("--rejeitadas", type=Path,
+                            help="CSV com as linhas recusadas (padrão: <arquivo>.rejeitadas.csv)")
+        parser.add_argument("--delimitador", default=",", help="separador das colunas (ex: ';')")
+        parser.add_argument("--encoding", default="utf-8-sig")
+
+    def handle(self, *args, **options):
+        arquivo = options["arquivo"]
+        caminho_rejeitadas = options["rejeitadas"] or arquivo.with_suffix(".rejeitadas.csv")
+        try:
+            with open(arquivo, encoding=options["encoding"], newline="") as entrada, \
+                    open(caminho_rejeitadas, "w", encoding="utf-8", newline="") as rejeitadas:
+                resultado = importacao.importar_csv(entrada, options["tipo"], rejeitadas, options["delimitador"])
+        except (importacao.ErroImportacao, OSError, UnicodeDecodeError) as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(
+            f"{resultado['lidas']} linhas lidas, {resultado['gravadas']} gravadas, "
+            f"{resultado['rejeitadas']} rejeitadas em {resultado['segundos']}s "
+            f"({resultado['linhas_por_segundo']} linhas/s)."
+        )
+        if resultado["rejeitadas"]:
+            self.stdout.write(self.style.WARNING(f"Linhas rejeitadas em {caminho_rejeitadas}"))
+        else:
+            caminho_rejeitadas.unlink()
+            self.stdout.write(self.style.SUCCESS("Nenhuma linha rejeitada."))
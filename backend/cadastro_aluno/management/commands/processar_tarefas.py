@@ -0,0 +1,64 @@
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from cadastro_aluno import tarefas
+
+
+class Command(BaseCommand):
+    help = (
+        "Executa as tarefas em segundo plano de tb_tarefas (lotes grandes, importação de CSV, "
+        "remoção em massa), com um pool de threads. Roda até ser interrompido (Ctrl+C), ou "
+        "até a fila esvaziar com --uma-vez."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--trabalhadores", type=int, default=settings.TAREFAS_TRABALHADORES,
+                            help="tarefas executadas ao mesmo tempo")
+        parser.add_argument("--uma-vez", action="store_true", help="sai quando não houver mais tarefas pendentes")
+
+    def handle(self, *args, **options):
+        parar = threading.Event()
+        executadas = []
+
+        def laco():
+            try:
+                while not parar.is_set():
+                    close_old_connections()
+                    if tarefas.processar():
+                        executadas.append(1)
+                        continue
+                    if options["uma_vez"]:
+                        break
+                    tarefas.recuperar_interrompidas()
+                    parar.wait(settings.TAREFAS_INTERVALO_CONSULTA)
+            finally:
+                connections.close_all()
+
+        interrompidas = tarefas.recuperar_interrompidas()
+        if interrompidas:
+            self.stdout.write(self.style.WARNING(f"{interrompidas} tarefas interrompidas marcadas com erro."))
+
+        trabalhadores = max(1, options["trabalhadores"])
+        if trabalhadores == 1:
+            # Na própria thread: mais simples de depurar (e de testar).
+            try:
+                laco()
+            except KeyboardInterrupt:
+                pass
+        else:
+            threads = [threading.Thread(target=laco, name=f"tarefas-{i}", daemon=True) for i in range(trabalhadores)]
+            for thread in threads:
+                thread.start()
+            try:
+                for thread in threads:
+                    while thread.is_alive():
+                        thread.join(0.5)
+            except KeyboardInterrupt:
+                # Termina as tarefas em andamento e não pega novas.
+                parar.set()
+                for thread in threads:
+                    thread.join()
+        self.stdout.write(f"{len(executadas)} tarefas executadas.")
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from cadastro_aluno import estatisticas
+from cadastro_aluno.cache import versoes_tabelas
+from cadastro_aluno.models import TbEstatisticasDisciplina
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula do zero, a partir de tb_notas, o resumo de tb_estatisticas_disciplina "
+        "e confere o resultado. Com --verificar só compara, sem gravar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--verificar", action="store_true",
+                            help="só compara o resumo gravado com as notas (sai com erro se divergir)")
+
+    def handle(self, *args, **options):
+        if not options["verificar"]:
+            total = estatisticas.recalcular(None)
+            # Os servidores no ar só veem a mudança pela versão da tabela no
+            # cache compartilhado: um signal enviado aqui fica neste processo.
+            versoes_tabelas.incrementar(TbEstatisticasDisciplina._meta.db_table)
+            self.stdout.write(f"Resumo recalculado para {total} disciplinas.")
+            if not versoes_tabelas.compartilhado():
+                self.stderr.write(self.style.WARNING(
+                    f"O cache de versões ('{versoes_tabelas.alias}') é local a este processo: os servidores "
+                    "no ar podem responder 304 com as estatísticas antigas por até VERSOES_TABELAS_TTL "
+                    "segundos. Aponte VERSOES_TABELAS_CACHE para um cache compartilhado (ex: Redis)."
+                ))
+
+        diferencas = estatisticas.divergencias()
+        for disciplina_id, campo, gravado, calculado in diferencas[:50]:
+            self.stdout.write(f"disciplina {disciplina_id}: {campo} = {gravado}, esperado {calculado}")
+        if diferencas:
+            raise CommandError(f"{len(diferencas)} divergências entre o resumo e as notas.")
+        self.stdout.write(self.style.SUCCESS("Resumo das estatísticas confere com as notas."))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from cadastro_aluno import busca
+from cadastro_aluno.models import TbAlunosBusca
+
+
+class Command(BaseCommand):
+    help = "Reconstrói do zero o índice de trigramas usado na busca de alunos por nome."
+
+    def handle(self, *args, **options):
+        busca.reconstruir()
+        total = TbAlunosBusca.objects.count()
+        self.stdout.write(self.style.SUCCESS(f"Índice de busca reconstruído ({total} trigramas)."))
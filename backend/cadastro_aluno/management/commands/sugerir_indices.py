@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from cadastro_aluno import planos
+from cadastro_aluno.api import router
+
+
+class Command(BaseCommand):
+    help = (
+        "Executa cada endpoint GET de cadastro_aluno, roda EXPLAIN nas consultas que ele "
+        "emite e lista as varreduras completas de tabela com o índice sugerido."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rotas", nargs="*", help="só estas rotas (nomes dos handlers)")
+        parser.add_argument("--database", default="default", help="alias do banco analisado")
+        parser.add_argument("--sql", action="store_true", help="mostra também o SQL de cada consulta")
+
+    def handle(self, *args, **options):
+        using = options["database"]
+        valores = planos.valores_exemplo()
+        rotas = [r for r in planos.rotas_get(router) if not options["rotas"] or r[0] in options["rotas"]]
+        if not rotas:
+            raise CommandError("Nenhuma rota GET encontrada com esses nomes.")
+
+        total_varreduras = 0
+        for nome, caminho, parametros in rotas:
+            consultas = planos.analisar(planos.capturar(caminho, parametros, valores, using), using)
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{nome}  GET {caminho}  ({len(consultas)} consultas)"))
+            for consulta in consultas:
+                if options["sql"]:
+                    self.stdout.write(f"  {consulta.sql}")
+                if consulta.erro:
+                    self.stdout.write(self.style.WARNING(f"  EXPLAIN falhou: {consulta.erro}"))
+                    continue
+                for passo in consulta.passos:
+                    if passo.varredura_completa:
+                        total_varreduras += 1
+                        self.stdout.write(self.style.WARNING(f"  VARREDURA {passo.tabela}: {passo.detalhe}"))
+                        self.stdout.write(f"    sugestão: {planos.sugerir(consulta.sql, passo, using)}")
+                    elif passo.tabela:
+                        self.stdout.write(f"  ok {passo.tabela}: {passo.detalhe}")
+
+        mensagem = f"{len(rotas)} rotas analisadas, {total_varreduras} varreduras completas."
+        self.stdout.write(self.style.SUCCESS(mensagem) if not total_varreduras else self.style.WARNING(mensagem))
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:52
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def trigramas(texto):
+    # Cópia das regras de cadastro_aluno.busca no momento desta migração: a
+    # migração não pode depender do código atual da aplicação, que muda.
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    termos = set()
+    for palavra in re.sub(r'[^0-9a-z]+', ' ', texto.lower()).split():
+        palavra = f'  {palavra} '
+        termos.update(palavra[i:i + 3] for i in range(len(palavra) - 2))
+    return termos
+
+
+def indexar_alunos_existentes(apps, schema_editor):
+    # Popula o índice com os alunos que já estavam cadastrados antes desta
+    # migração, no banco que está sendo migrado.
+    banco = schema_editor.connection.alias
+    TbAlunos = apps.get_model('cadastro_aluno', 'TbAlunos')
+    TbAlunosBusca = apps.get_model('cadastro_aluno', 'TbAlunosBusca')
+    bloco = []
+    for aluno_id, nome in TbAlunos.objects.using(banco).values_list('id', 'nome').iterator(chunk_size=2000):
+        bloco.extend(TbAlunosBusca(aluno_id=aluno_id, termo=termo) for termo in trigramas(nome))
+        if len(bloco) >= 5000:
+            TbAlunosBusca.objects.using(banco).bulk_create(bloco)
+            bloco = []
+    TbAlunosBusca.objects.using(banco).bulk_create(bloco)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cadastro_aluno', '0006_delete_tbcarro'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TbAlunosBusca',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('termo', models.CharField(max_length=3)),
+                ('aluno', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='termos_busca', to='cadastro_aluno.tbalunos')),
+            ],
+            options={
+                'db_table': 'tb_alunos_busca',
+                'managed': True,
+                'indexes': [models.Index(fields=['termo', 'aluno'], name='tb_alunos_busca_termo_idx')],
+            },
+        ),
+        migrations.RunPython(indexar_alunos_existentes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cadastro_aluno', '0007_tbalunosbusca'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='tbalunos',
+            index=models.Index(fields=['nome'], name='tb_alunos_nome_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tbdisciplinas',
+            index=models.Index(fields=['semestre'], name='tb_disciplinas_semestre_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tbenderecos',
+            index=models.Index(fields=['estado'], name='tb_enderecos_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tbnotas',
+            index=models.Index(fields=['aluno', 'disciplina', 'nota'], name='tb_notas_aluno_disc_nota_idx'),
+        ),
+    ]
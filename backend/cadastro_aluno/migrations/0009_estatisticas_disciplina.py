@@ -0,0 +1,71 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Max, Min, Q, Sum
+
+
+def calcular_estatisticas(apps, schema_editor):
+    # Preenche o resumo com as notas já existentes, no banco que está sendo
+    # migrado. Mesmo cálculo de cadastro_aluno.estatisticas.calcular() no
+    # momento desta migração (faixa_N: N <= nota < N + 1, a primeira e a
+    # última abertas nas pontas), copiado para não depender do código atual.
+    banco = schema_editor.connection.alias
+    TbNotas = apps.get_model('cadastro_aluno', 'TbNotas')
+    TbEstatisticasDisciplina = apps.get_model('cadastro_aluno', 'TbEstatisticasDisciplina')
+    faixas = {}
+    for i in range(10):
+        filtro = Q()
+        if i > 0:
+            filtro &= Q(nota__gte=i)
+        if i < 9:
+            filtro &= Q(nota__lt=i + 1)
+        faixas[f'faixa_{i}'] = Count('id', filter=filtro)
+    linhas = TbNotas.objects.using(banco).filter(disciplina__isnull=False, nota__isnull=False).values(
+        'disciplina_id').order_by().annotate(
+        quantidade=Count('id'),
+        soma=Sum('nota'),
+        soma_quadrados=Sum(F('nota') * F('nota')),
+        minima=Min('nota'),
+        maxima=Max('nota'),
+        **faixas,
+    )
+    TbEstatisticasDisciplina.objects.using(banco).bulk_create(
+        [TbEstatisticasDisciplina(**linha) for linha in linhas], batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cadastro_aluno', '0008_indices_consultas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TbEstatisticasDisciplina',
+            fields=[
+                ('disciplina', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='estatisticas', serialize=False, to='cadastro_aluno.tbdisciplinas')),
+                ('quantidade', models.IntegerField(default=0)),
+                ('soma', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('soma_quadrados', models.DecimalField(decimal_places=4, default=0, max_digits=18)),
+                ('minima', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('maxima', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('faixa_0', models.IntegerField(default=0)),
+                ('faixa_1', models.IntegerField(default=0)),
+                ('faixa_2', models.IntegerField(default=0)),
+                ('faixa_3', models.IntegerField(default=0)),
+                ('faixa_4', models.IntegerField(default=0)),
+                ('faixa_5', models.IntegerField(default=0)),
+                ('faixa_6', models.IntegerField(default=0)),
+                ('faixa_7', models.IntegerField(default=0)),
+                ('faixa_8', models.IntegerField(default=0)),
+                ('faixa_9', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'tb_estatisticas_disciplina',
+                'managed': True,
+            },
+        ),
+        migrations.RunPython(calcular_estatisticas, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cadastro_aluno', '0009_estatisticas_disciplina'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TbTarefas',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(max_length=50)),
+                ('estado', models.CharField(choices=[('pendente', 'Pendente'), ('executando', 'Executando'), ('concluida', 'Concluída'), ('erro', 'Erro')], default='pendente', max_length=20)),
+                ('parametros', models.JSONField(default=dict)),
+                ('entrada', models.TextField(blank=True, default='')),
+                ('processados', models.IntegerField(default=0)),
+                ('total', models.IntegerField(blank=True, null=True)),
+                ('resultado', models.JSONField(blank=True, null=True)),
+                ('erro', models.TextField(blank=True, null=True)),
+                ('trabalhador', models.CharField(blank=True, max_length=100, null=True)),
+                ('criada_em', models.DateTimeField(auto_now_add=True)),
+                ('iniciada_em', models.DateTimeField(blank=True, null=True)),
+                ('atualizada_em', models.DateTimeField(blank=True, null=True)),
+                ('concluida_em', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'tb_tarefas',
+                'managed': True,
+                'indexes': [models.Index(fields=['estado', 'id'], name='tb_tarefas_estado_idx')],
+            },
+        ),
+    ]
@@ -10,6 +10,10 @@ class TbAlunos(models.Model):
     class Meta:
         managed = True
         db_table = 'tb_alunos'
+        indexes = [
+            # Ordenação do boletim e buscas exatas/por prefixo de nome.
+            models.Index(fields=['nome'], name='tb_alunos_nome_idx'),
+        ]
 
 
 class TbDisciplinas(models.Model):
@@ -20,6 +24,9 @@ class TbDisciplinas(models.Model):
     class Meta:
         managed = True
         db_table = 'tb_disciplinas'
+        indexes = [
+            models.Index(fields=['semestre'], name='tb_disciplinas_semestre_idx'),
+        ]
 
 
 class TbEnderecos(models.Model):
@@ -33,6 +40,9 @@ class TbEnderecos(models.Model):
     class Meta:
         managed = True
         db_table = 'tb_enderecos'
+        indexes = [
+            models.Index(fields=['estado'], name='tb_enderecos_estado_idx'),
+        ]
 
 
 class TbNotas(models.Model):
@@ -43,6 +53,93 @@ class TbNotas(models.Model):
     class Meta:
         managed = True
         db_table = 'tb_notas'
+        indexes = [
+            # Cobre o boletim e as notas por aluno: (aluno, disciplina) filtra e
+            # agrupa, e a nota vem do próprio índice, sem ler a tabela.
+            models.Index(fields=['aluno', 'disciplina', 'nota'], name='tb_notas_aluno_disc_nota_idx'),
+        ]
 
 
+class TbAlunosBusca(models.Model):
+    """
+    Índice de trigramas do nome dos alunos, usado pela busca por nome.
+    Cada linha liga um trigrama (do nome normalizado, sem acentos e em
+    minúsculas) a um aluno. É mantido por cadastro_aluno/signals.py.
+    """
+    aluno = models.ForeignKey(TbAlunos, models.CASCADE, related_name='termos_busca')
+    termo = models.CharField(max_length=3)
 
+    class Meta:
+        managed = True
+        db_table = 'tb_alunos_busca'
+        indexes = [
+            models.Index(fields=['termo', 'aluno'], name='tb_alunos_busca_termo_idx'),
+        ]
+
+
+class TbEstatisticasDisciplina(models.Model):
+    """
+    Resumo das notas de cada disciplina (quantidade, somas, mínima, máxima e
+    histograma por faixa de 1 ponto), mantido a cada nota gravada ou
+    removida por cadastro_aluno/estatisticas.py. A soma dos quadrados dá o
+    desvio padrão sem reler as notas.
+    """
+    disciplina = models.OneToOneField(TbDisciplinas, models.CASCADE, primary_key=True,
+                                      related_name='estatisticas')
+    quantidade = models.IntegerField(default=0)
+    soma = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    soma_quadrados = models.DecimalField(max_digits=18, decimal_places=4, default=0)
+    minima = models.DecimalField(max_digits=5, decimal_places=2, blank=True, null=True)
+    maxima = models.DecimalField(max_digits=5, decimal_places=2, blank=True, null=True)
+    # Faixa N: notas de N (inclusive) a N + 1; a faixa 9 inclui o 10.
+    faixa_0 = models.IntegerField(default=0)
+    faixa_1 = models.IntegerField(default=0)
+    faixa_2 = models.IntegerField(default=0)
+    faixa_3 = models.IntegerField(default=0)
+    faixa_4 = models.IntegerField(default=0)
+    faixa_5 = models.IntegerField(default=0)
+    faixa_6 = models.IntegerField(default=0)
+    faixa_7 = models.IntegerField(default=0)
+    faixa_8 = models.IntegerField(default=0)
+    faixa_9 = models.IntegerField(default=0)
+
+    class Meta:
+        managed = True
+        db_table = 'tb_estatisticas_disciplina'
+
+
+class TbTarefas(models.Model):
+    """
+    Fila de tarefas de escrita demoradas (lotes grandes, importação de CSV,
+    remoção em massa), executadas fora da requisição por
+    cadastro_aluno/tarefas.py. A própria tabela é a fila: não há broker.
+    """
+    PENDENTE = 'pendente'
+    EXECUTANDO = 'executando'
+    CONCLUIDA = 'concluida'
+    ERRO = 'erro'
+    ESTADOS = [(PENDENTE, 'Pendente'), (EXECUTANDO, 'Executando'), (CONCLUIDA, 'Concluída'), (ERRO, 'Erro')]
+
+    tipo = models.CharField(max_length=50)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default=PENDENTE)
+    parametros = models.JSONField(default=dict)
+    # Os itens do lote ou o texto do CSV: no banco, para que um trabalhador
+    # em outra máquina também consiga executar a tarefa.
+    entrada = models.TextField(blank=True, default='')
+    processados = models.IntegerField(default=0)
+    total = models.IntegerField(blank=True, null=True)
+    resultado = models.JSONField(blank=True, null=True)
+    erro = models.TextField(blank=True, null=True)
+    trabalhador = models.CharField(max_length=100, blank=True, null=True)
+    criada_em = models.DateTimeField(auto_now_add=True)
+    iniciada_em = models.DateTimeField(blank=True, null=True)
+    atualizada_em = models.DateTimeField(blank=True, null=True)
+    concluida_em = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        managed = True
+        db_table = 'tb_tarefas'
+        indexes = [
+            # Próxima pendente (estado + id) e contagem da fila.
+            models.Index(fields=['estado', 'id'], name='tb_tarefas_estado_idx'),
+        ]
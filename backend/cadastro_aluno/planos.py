@@ -0,0 +1,202 @@
+"""
+Captura das consultas de cada endpoint GET e análise dos planos (EXPLAIN).
+
+Usado pelo comando 'manage.py sugerir_indices' e pelos testes que garantem
+que as rotas principais usam os índices da migração 0008. Suporta MySQL
+(EXPLAIN) e SQLite (EXPLAIN QUERY PLAN).
+"""
+import inspect
+import re
+from dataclasses import dataclass, field
+
+from django.apps import apps
+from django.core.cache import caches
+from django.db import connections
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+
+from cadastro_aluno.models import TbAlunos, TbDisciplinas, TbEnderecos, TbNotas
+
+PREFIXO = "/api/v1/cadastro_aluno"
+
+# "tabela"."coluna" (SQLite) ou `tabela`.`coluna` (MySQL)
+_COLUNA = re.compile(r'[`"](\w+)[`"]\.[`"](\w+)[`"]')
+# SCAN tb_x | SEARCH tb_x USING [COVERING] INDEX idx (...) | ... USING INTEGER PRIMARY KEY
+_PASSO_SQLITE = re.compile(
+    r"^(?P<op>SCAN|SEARCH) (?:TABLE )?(?P<tabela>\w+)(?: AS \w+)?"
+    r"(?: USING (?:COVERING )?(?:INDEX (?P<indice>\w+)|(?P<pk>INTEGER PRIMARY KEY|PRIMARY KEY)))?"
+)
+
+
+@dataclass
+class PassoPlano:
+    tabela: str
+    indice: str | None
+    varredura_completa: bool
+    detalhe: str
+
+
+@dataclass
+class ConsultaAnalisada:
+    sql: str
+    passos: list = field(default_factory=list)
+    erro: str | None = None
+
+    @property
+    def varreduras(self):
+        return [p for p in self.passos if p.varredura_completa]
+
+
+def explicar(sql, using="default"):
+    """
+    Roda o EXPLAIN do banco sobre 'sql' e devolve a lista de PassoPlano.
+    """
+    conexao = connections[using]
+    with conexao.cursor() as cursor:
+        if conexao.vendor == "sqlite":
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            return [_passo_sqlite(linha[-1]) for linha in cursor.fetchall()]
+        if conexao.vendor == "mysql":
+            cursor.execute(f"EXPLAIN {sql}")
+            colunas = [c[0] for c in cursor.description]
+            passos = []
+            for linha in cursor.fetchall():
+                dados = dict(zip(colunas, linha))
+                passos.append(PassoPlano(
+                    tabela=dados["table"],
+                    indice=dados["key"],
+                    # type=ALL é a leitura da tabela inteira; 'index' percorre
+                    # um índice inteiro, mas sem ler as linhas.
+                    varredura_completa=dados["type"] == "ALL",
+                    detalhe=f"type={dados['type']} key={dados['key']} rows={dados['rows']} {dados.get('Extra') or ''}".strip(),
+                ))
+            return passos
+    raise NotImplementedError(f"EXPLAIN não suportado para o banco '{conexao.vendor}'.")
+
+
+def _passo_sqlite(detalhe):
+    m = _PASSO_SQLITE.match(detalhe)
+    if not m:
+        # Passos auxiliares: "USE TEMP B-TREE FOR ORDER BY", "CORRELATED SCALAR SUBQUERY"...
+        return PassoPlano(tabela="", indice=None, varredura_completa=False, detalhe=detalhe)
+    indice = m["indice"] or ("PRIMARY" if m["pk"] else None)
+    return PassoPlano(
+        tabela=m["tabela"],
+        indice=indice,
+        varredura_completa=m["op"] == "SCAN" and indice is None,
+        detalhe=detalhe,
+    )
+
+
+def analisar(consultas, using="default"):
+    """
+    Explica cada SELECT capturado; falhas no EXPLAIN ficam registradas em 'erro'.
+    """
+    analisadas = []
+    for consulta in consultas:
+        sql = consulta["sql"]
+        if not sql.lstrip().upper().startswith("SELECT"):
+            continue
+        try:
+            analisadas.append(ConsultaAnalisada(sql, explicar(sql, using)))
+        except Exception as e:
+            analisadas.append(ConsultaAnalisada(sql, erro=str(e)))
+    return analisadas
+
+
+##################### Captura por rota #################################
+def valores_exemplo():
+    """
+    Valores reais do banco para preencher os parâmetros das rotas (ids, semestre, estado...).
+    """
+    aluno = TbAlunos.objects.order_by("id").values("id", "nome").first() or {"id": 1, "nome": "a"}
+    disciplina = TbDisciplinas.objects.order_by("id").values("id", "semestre").first() or {"id": 1, "semestre": 1}
+    endereco = TbEnderecos.objects.order_by("id").values("id", "estado").first() or {"id": 1, "estado": "SP"}
+    nota_id = TbNotas.objects.order_by("id").values_list("id", flat=True).first() or 1
+    return {
+        "aluno_id": aluno["id"],
+        "nome": aluno["nome"].split()[0] if aluno["nome"].strip() else "a",
+        "discplina_id": disciplina["id"],
+        "disciplina_id": disciplina["id"],
+        "semestre": disciplina["semestre"],
+        "id": endereco["id"],
+        "endereco_id": endereco["id"],
+        "estado": endereco["estado"],
+        "nota_id": nota_id,
+    }
+
+
+def rotas_get(router):
+    """
+    (nome do handler, caminho, parâmetros aceitos) de cada GET do router.
+    """
+    for caminho, path_view in router.path_operations.items():
+        for operacao in path_view.operations:
+            if "GET" in operacao.methods:
+                parametros = [p for p in inspect.signature(operacao.view_func).parameters if p != "request"]
+                yield operacao.view_func.__name__, caminho, parametros
+
+
+def capturar(caminho, parametros, valores, using="default"):
+    """
+    Executa a rota GET (sem passar pelos middlewares) e devolve as consultas SQL emitidas.
+    Os caches são limpos antes para que a consulta ao banco aconteça de fato.
+    """
+    no_caminho = set(re.findall(r"{(\w+)}", caminho))
+    url = PREFIXO + caminho.format(**{p: valores[p] for p in no_caminho})
+    query = {p: valores[p] for p in parametros if p not in no_caminho and p in valores}
+    request = RequestFactory().get(url, query)
+    for cache in caches.all():
+        cache.clear()
+    match = resolve(request.path_info)
+    with CaptureQueriesContext(connections[using]) as contexto:
+        response = match.func(request, *match.args, **match.kwargs)
+        if response.streaming:
+            b"".join(response.streaming_content)
+    return contexto.captured_queries
+
+
+##################### Sugestões #################################
+def colunas_filtradas(sql, tabela):
+    """
+    Colunas de 'tabela' usadas no WHERE / ORDER BY da consulta, na ordem em que aparecem.
+    """
+    partes = re.split(r"\b(?:WHERE|ORDER BY)\b", sql, maxsplit=1)
+    if len(partes) < 2:
+        return []
+    trecho = re.split(r"\bLIMIT\b", partes[1])[0]
+    colunas = []
+    for tab, coluna in _COLUNA.findall(trecho):
+        if tab == tabela and coluna not in colunas:
+            colunas.append(coluna)
+    return colunas
+
+
+def colunas_indexadas(tabela, using="default"):
+    """
+    Primeira coluna de cada índice (ou chave) existente em 'tabela'.
+    """
+    conexao = connections[using]
+    with conexao.cursor() as cursor:
+        restricoes = conexao.introspection.get_constraints(cursor, tabela)
+    return {r["columns"][0] for r in restricoes.values() if (r["index"] or r["unique"] or r["primary_key"]) and r["columns"]}
+
+
+def sugerir(sql, passo, using="default"):
+    """
+    Texto com a sugestão para uma varredura completa de 'passo.tabela'.
+    """
+    colunas = colunas_filtradas(sql, passo.tabela)
+    if not colunas:
+        return "leitura da tabela inteira, sem filtro (esperado em listagens completas)"
+    faltando = [c for c in colunas if c not in colunas_indexadas(passo.tabela, using)]
+    if not faltando:
+        return (f"já existe índice em {colunas}, mas o plano não o usa "
+                "(função ou LIKE sobre a coluna, colação diferente, ou tabela pequena demais)")
+    modelo = next((m for m in apps.get_models() if m._meta.db_table == passo.tabela), None)
+    if modelo is None:
+        return f"CREATE INDEX ON {passo.tabela} ({', '.join(faltando)})"
+    campos = {f.column: f.name for f in modelo._meta.concrete_fields}
+    nomes = [campos.get(c, c) for c in faltando]
+    return f"{modelo.__name__}.Meta.indexes: models.Index(fields={nomes!r})"
@@ -0,0 +1,104 @@
+import heapq
+
+from django.db import connection
+from django.db.models import Avg, Count, F, Window
+from django.db.models.functions import Rank, RowNumber
+
+from cadastro_aluno.cache import cache_disciplinas, cache_ranking, versoes_tabelas
+from cadastro_aluno.models import TbAlunos, TbDisciplinas, TbNotas
+
+
+def escopo(semestre=None, disciplina_id=None):
+    """
+    Escopo de invalidação de um ranking: o da disciplina, quando há, senão
+    o do semestre.
+    """
+    return f"disciplina:{disciplina_id}" if disciplina_id is not None else f"semestre:{semestre}"
+
+
+def semestre_da_disciplina(disciplina_id):
+    # Mesmo valor em cache da rota /disciplina-por-id: não consulta o banco
+    # a cada nota gravada.
+    linhas = cache_disciplinas.obter(
+        f"id:{disciplina_id}", lambda: list(TbDisciplinas.objects.filter(id=disciplina_id).values())
+    )
+    return linhas[0]["semestre"] if linhas else None
+
+
+def invalidar(disciplinas):
+    """
+    Invalida os rankings das disciplinas e dos semestres delas.
+    """
+    for disciplina_id in set(disciplinas) - {None}:
+        cache_ranking.invalidar(escopo(disciplina_id=disciplina_id))
+        semestre = semestre_da_disciplina(disciplina_id)
+        if semestre is not None:
+            cache_ranking.invalidar(escopo(semestre=semestre))
+
+
+def _medias(semestre, disciplina_id):
+    qs = TbNotas.objects.filter(aluno__isnull=False, nota__isnull=False)
+    if semestre is not None:
+        qs = qs.filter(disciplina__semestre=semestre)
+    if disciplina_id is not None:
+        qs = qs.filter(disciplina_id=disciplina_id)
+    return qs.values("aluno_id").annotate(media=Avg("nota"), quantidade=Count("nota"))
+
+
+def _com_janela(medias, n):
+    # RANK() dá a mesma posição aos empatados; ROW_NUMBER() (com o aluno_id
+    # desempatando) corta em exatamente n linhas. O filtro na janela vira
+    # uma subconsulta, então só n linhas saem do banco.
+    return list(
+        medias.annotate(
+            posicao=Window(Rank(), order_by=F("media").desc()),
+            linha=Window(RowNumber(), order_by=[F("media").desc(), F("aluno_id").asc()]),
+        )
+        .filter(linha__lte=n)
+        .order_by("linha")
+        .values("aluno_id", "media", "quantidade", "posicao")
+    )
+
+
+def _com_heap(medias, n):
+    # Sem funções de janela: as médias (uma linha por aluno) passam por um
+    # heap limitado a n, sem ordenar nem guardar todas na memória.
+    melhores = heapq.nsmallest(n, medias.order_by().iterator(), key=lambda l: (-l["media"], l["aluno_id"]))
+    for i, linha in enumerate(melhores):
+        anterior = melhores[i - 1] if i else None
+        linha["posicao"] = anterior["posicao"] if anterior and anterior["media"] == linha["media"] else i + 1
+    return melhores
+
+
+def calcular(semestre=None, disciplina_id=None, n=10):
+    medias = _medias(semestre, disciplina_id)
+    linhas = _com_janela(medias, n) if connection.features.supports_over_clause else _com_heap(medias, n)
+    return [
+        {
+            "posicao": linha["posicao"],
+            "aluno_id": linha["aluno_id"],
+            "media": round(float(linha["media"]), 2),
+            "quantidade": linha["quantidade"],
+        }
+        for linha in linhas
+    ]
+
+
+def top_alunos(semestre=None, disciplina_id=None, n=10):
+    """
+    Os n alunos de maior média nas notas do semestre e/ou da disciplina.
+
+    O ranking fica em cache por (semestre, disciplina, n) e é invalidado
+    pelas notas gravadas no escopo (ver signals.py). Mudanças em
+    tb_disciplinas (ex: disciplina trocada de semestre) mudam a chave. Os
+    nomes são lidos a cada chamada (n linhas pela chave primária), para não
+    ficarem velhos no cache.
+    """
+    versao_disciplinas, = versoes_tabelas.obter(TbDisciplinas._meta.db_table)
+    linhas = cache_ranking.obter(
+        f"{semestre}:{disciplina_id}:{n}:{versao_disciplinas}",
+        lambda: calcular(semestre, disciplina_id, n),
+        escopo=escopo(semestre, disciplina_id),
+    )
+    nomes = dict(TbAlunos.objects.filter(id__in=[l["aluno_id"] for l in linhas]).values_list("id", "nome"))
+    return [{**linha, "nome": nomes.get(linha["aluno_id"])} for linha in linhas]
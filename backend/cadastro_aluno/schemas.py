@@ -1,12 +1,23 @@
-from typing import Optional, List
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, Optional, List
 from ninja import Schema
 from pydantic import EmailStr
 ######### ALUNOS ################
 class AlunosSchema(Schema):
     id: int #adcionado
+    matricula: Optional[str] = None
     nome: Optional[str] = None
     email: Optional[str] = None
+    endereco_id: Optional[int] = None
     nome_mae: Optional[str] = None 
+class AlunosPaginaSchema(Schema):
+    itens: List[AlunosSchema]
+    proximo_cursor: Optional[int] = None
+    limite: int
+class AlunosPorIdsSchema(Schema):
+    itens: Dict[int, AlunosSchema]
+    nao_encontrados: List[int]
 class AlunoCreateSchema(Schema):
     matricula: str
     nome: str
@@ -22,12 +33,57 @@ class AlunoUpdateSchema(Schema):
 ######### ERROR ################
 class MensagemErro(Schema):
     mensagem: str
+######### CACHE ################
+class EstatisticasCacheSchema(Schema):
+    nome: str
+    acertos: int
+    faltas: int
+    taxa_acerto: float
+######### LOTES ################
+class ResultadoLinhaSchema(Schema):
+    linha: int
+    id_criado: Optional[int] = None
+    erro: Optional[str] = None
+class RelatorioLoteSchema(Schema):
+    criados: int
+    com_erro: int
+    resultados: List[ResultadoLinhaSchema]
+class ResultadoAtualizacaoSchema(Schema):
+    linha: int
+    id: Optional[int] = None
+    erro: Optional[str] = None
+class RelatorioAtualizacaoLoteSchema(Schema):
+    atualizados: List[int]
+    com_erro: int
+    resultados: List[ResultadoAtualizacaoSchema]
+class ImportacaoCsvSchema(Schema):
+    lidas: int
+    gravadas: int
+    rejeitadas: int
+    segundos: float
+    linhas_por_segundo: float
+    rejeitadas_csv: str
+######### TAREFAS ################
+class TarefaSchema(Schema):
+    id: int
+    tipo: str
+    estado: str
+    processados: int
+    total: Optional[int] = None
+    resultado: Optional[Dict[str, Any]] = None
+    erro: Optional[str] = None
+    criada_em: datetime
+    iniciada_em: Optional[datetime] = None
+    concluida_em: Optional[datetime] = None
 ######### DISCIPLINAS ################
 class DisciplinaCompletaSchema(Schema):
     id: int
     disciplina: str
     carga: int
     semestre: int
+class DisciplinasPorIdsSchema(Schema):
+    itens: Dict[int, DisciplinaCompletaSchema]
+    nao_encontrados: List[int]
 class DisciplinaCreateSchema(Schema):
     disciplina: str
     carga: int
@@ -56,6 +112,26 @@ class EnderecoCompletoSchema(Schema):
     cidade: str
     estado: str
     regiao: Optional[str] = None
+class EnderecosPorIdsSchema(Schema):
+    itens: Dict[int, EnderecoCompletoSchema]
+    nao_encontrados: List[int]
+class QuantidadeRegiaoSchema(Schema):
+    regiao: Optional[str] = None
+    quantidade: int
+class QuantidadeEstadoSchema(Schema):
+    estado: str
+    regiao: Optional[str] = None
+    quantidade: int
+class QuantidadeCidadeSchema(Schema):
+    cidade: str
+    estado: str
+    quantidade: int
+class AlunosPorLocalidadeSchema(Schema):
+    total: int
+    sem_endereco: int
+    regioes: List[QuantidadeRegiaoSchema]
+    estados: List[QuantidadeEstadoSchema]
+    cidades: List[QuantidadeCidadeSchema]
 class EnderecoCreateSchema(Schema):
     cep: str
     endereco: str
@@ -75,4 +151,73 @@ class EnderecoCreateSchema(Schema):
     endereco: str 
     bairro: Optional[str] = None
     cidade: str
-    estado: str
\ No newline at end of file
+    estado: str
+######### NOTAS ################
+class NotaSchema(Schema):
+    id: int
+    aluno_id: Optional[int] = None
+    disciplina_id: Optional[int] = None
+    nota: Optional[float] = None
+class NotaDisciplinaSchema(Schema):
+    id: int
+    disciplina_id: Optional[int] = None
+    disciplina: Optional[str] = None
+    nota: Optional[float] = None
+class AlunoDetalheSchema(Schema):
+    id: int
+    matricula: str
+    nome: str
+    email: Optional[str] = None
+    nome_mae: Optional[str] = None
+    endereco: Optional[EnderecoCompletoSchema] = None
+    notas: List[NotaDisciplinaSchema]
+class AlunosDetalhePaginaSchema(Schema):
+    itens: List[AlunoDetalheSchema]
+    proximo_cursor: Optional[int] = None
+    limite: int
+class NotaCreateSchema(Schema):
+    aluno_id: int
+    disciplina_id: int
+    nota: Decimal
+class NotaUpdateSchema(Schema):
+    aluno_id: Optional[int] = None
+    disciplina_id: Optional[int] = None
+    nota: Optional[Decimal] = None
+class FaixaNotasSchema(Schema):
+    inicio: int
+    fim: int
+    quantidade: int
+class EstatisticasNotasSchema(Schema):
+    quantidade: int
+    media: Optional[float] = None
+    desvio_padrao: Optional[float] = None
+    minima: Optional[float] = None
+    maxima: Optional[float] = None
+    faixas: List[FaixaNotasSchema]
+class EstatisticasDisciplinaSchema(EstatisticasNotasSchema):
+    disciplina_id: int
+class EstatisticasSemestreSchema(EstatisticasNotasSchema):
+    semestre: int
+    disciplinas: int
+class RankingAlunoSchema(Schema):
+    posicao: int
+    aluno_id: int
+    nome: Optional[str] = None
+    media: float
+    quantidade: int
+######### BOLETIM ################
+class BoletimDisciplinaSchema(Schema):
+    disciplina_id: int
+    disciplina: str
+    carga: int
+    semestre: int
+    quantidade: int
+    media: Optional[float] = None
+    minima: Optional[float] = None
+    maxima: Optional[float] = None
+class BoletimAlunoSchema(Schema):
+    aluno_id: int
+    nome: str
+    media: Optional[float] = None
+    media_ponderada: Optional[float] = None
+    disciplinas: List[BoletimDisciplinaSchema]
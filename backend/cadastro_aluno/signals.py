@@ -0,0 +1,179 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+
+from cadastro_aluno import busca, estatisticas, ranking
+from cadastro_aluno.cache import cache_disciplinas, cache_geografia, versoes_tabelas
+from cadastro_aluno.indice_cep import indice_cep
+from cadastro_aluno.models import TbAlunos, TbDisciplinas, TbEnderecos, TbEstatisticasDisciplina, TbNotas
+
+# Disparado pelos handlers que escrevem sem passar por Model.save()/delete()
+# (QuerySet.update(), bulk_create...), caminhos em que o Django não dispara
+# post_save/post_delete. Argumentos: sender=<modelo>, ids=<lista de ids> e,
+# opcionalmente, campos=<campos alterados> (None = qualquer campo, como o
+# update_fields do post_save).
+registros_alterados = Signal()
+
+
+##################### Índice de busca por nome #################################
+@receiver(post_save, sender=TbAlunos)
+def indexar_aluno_salvo(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or "nome" in update_fields:
+        busca.indexar([(instance.pk, instance.nome)])
+
+
+@receiver(registros_alterados, sender=TbAlunos)
+def reindexar_alunos_alterados(sender, ids, campos=None, **kwargs):
+    if campos is None or "nome" in campos:
+        busca.reindexar_ids(ids)
+
+# A remoção é feita pelo próprio banco/ORM: TbAlunosBusca.aluno é on_delete=CASCADE.
+
+
+##################### Cache do catálogo de disciplinas #################################
+@receiver(post_save, sender=TbDisciplinas)
+@receiver(post_delete, sender=TbDisciplinas)
+@receiver(registros_alterados, sender=TbDisciplinas)
+def invalidar_cache_disciplinas(sender, **kwargs):
+    # Só depois do commit: invalidar antes deixaria outra requisição
+    # recolocar no cache os dados antigos enquanto a transação está aberta.
+    transaction.on_commit(cache_disciplinas.invalidar)
+
+
+##################### Índice de CEPs em memória #################################
+@receiver(post_save, sender=TbEnderecos)
+@receiver(post_delete, sender=TbEnderecos)
+def atualizar_indice_cep(sender, instance, **kwargs):
+    # Relê o endereço do banco (ou percebe que sumiu) depois do commit, para
+    # não expor no índice uma escrita que ainda pode sofrer rollback. O pk é
+    # guardado agora: depois do delete() a instância fica com pk None.
+    pk = instance.pk
+    transaction.on_commit(lambda: indice_cep.atualizar([pk]))
+
+
+@receiver(registros_alterados, sender=TbEnderecos)
+def atualizar_indice_cep_em_lote(sender, ids, **kwargs):
+    transaction.on_commit(lambda: indice_cep.atualizar(ids))
+
+
+##################### Estatísticas das notas #################################
+@receiver(pre_save, sender=TbNotas)
+def guardar_nota_anterior(sender, instance, raw=False, **kwargs):
+    # Numa alteração, o resumo precisa tirar a nota antiga (e a disciplina
+    # antiga) antes de somar a nova.
+    instance._nota_anterior = None
+    if instance.pk is not None and not raw:
+        instance._nota_anterior = (
+            TbNotas.objects.filter(pk=instance.pk).values_list("disciplina_id", "nota").first()
+        )
+
+
+@receiver(post_save, sender=TbNotas)
+def atualizar_estatisticas_nota_salva(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    anterior = getattr(instance, "_nota_anterior", None)
+    if anterior == (instance.disciplina_id, instance.nota):
+        return
+    if anterior is not None:
+        estatisticas.remover(*anterior)
+    estatisticas.incluir(instance.disciplina_id, instance.nota)
+
+
+@receiver(post_delete, sender=TbNotas)
+def atualizar_estatisticas_nota_removida(sender, instance, **kwargs):
+    estatisticas.remover(instance.disciplina_id, instance.nota)
+
+
+##################### Rankings #################################
+@receiver(post_save, sender=TbNotas)
+@receiver(post_delete, sender=TbNotas)
+def invalidar_rankings_nota(sender, instance, **kwargs):
+    anterior = getattr(instance, "_nota_anterior", None)
+    disciplinas = [instance.disciplina_id, anterior[0] if anterior else None]
+    transaction.on_commit(lambda: ranking.invalidar(disciplinas))
+
+
+@receiver(registros_alterados, sender=TbNotas)
+def invalidar_rankings_notas_alteradas(sender, ids, **kwargs):
+    disciplinas = list(TbNotas.objects.filter(id__in=ids).values_list("disciplina_id", flat=True).distinct())
+    transaction.on_commit(lambda: ranking.invalidar(disciplinas))
+
+
+##################### Contagem por localidade #################################
+CAMPOS_LOCALIDADE = {TbAlunos: {"endereco", "endereco_id"}, TbEnderecos: {"cidade", "estado", "regiao"}}
+
+
+@receiver(post_save, sender=TbAlunos)
+@receiver(post_save, sender=TbEnderecos)
+def invalidar_localidades_salvo(sender, created=False, update_fields=None, **kwargs):
+    # Um endereço novo ainda não tem alunos; alterações que não tocam nos
+    # campos agrupados (nome, e-mail, CEP...) não mudam as contagens.
+    if sender is TbEnderecos and created:
+        return
+    if created or update_fields is None or CAMPOS_LOCALIDADE[sender] & set(update_fields):
+        transaction.on_commit(cache_geografia.invalidar)
+
+
+@receiver(post_delete, sender=TbAlunos)
+@receiver(post_delete, sender=TbEnderecos)
+def invalidar_localidades_removido(sender, **kwargs):
+    transaction.on_commit(cache_geografia.invalidar)
+
+
+@receiver(registros_alterados, sender=TbAlunos)
+@receiver(registros_alterados, sender=TbEnderecos)
+def invalidar_localidades_alterados(sender, ids, campos=None, **kwargs):
+    if campos is None or CAMPOS_LOCALIDADE[sender] & set(campos):
+        transaction.on_commit(cache_geografia.invalidar)
+
+
+##################### Versões das tabelas (ETags) #################################
+# Só os modelos lidos pelas rotas com ETag. TbAlunosBusca e
+# TbEstatisticasDisciplina ficam de fora: são derivados de alunos e notas (a
+# versão deles já muda junto) e um receiver sem sender faria o Django
+# desistir do DELETE rápido (sem carregar os registros) em todos os modelos.
+# A exceção é o recálculo completo das estatísticas, que avisa explicitamente.
+class _IncrementarVersoes:
+    """
+    Callback de on_commit com as tabelas escritas na transação: cada uma tem
+    a versão incrementada uma vez só, por mais registros que a transação grave.
+    """
+
+    def __init__(self):
+        self.tabelas = set()
+
+    def __call__(self):
+        for tabela in self.tabelas:
+            versoes_tabelas.incrementar(tabela)
+
+
+@receiver(post_save, sender=TbAlunos)
+@receiver(post_save, sender=TbDisciplinas)
+@receiver(post_save, sender=TbEnderecos)
+@receiver(post_save, sender=TbNotas)
+@receiver(post_delete, sender=TbAlunos)
+@receiver(post_delete, sender=TbDisciplinas)
+@receiver(post_delete, sender=TbEnderecos)
+@receiver(post_delete, sender=TbNotas)
+@receiver(registros_alterados, sender=TbAlunos)
+@receiver(registros_alterados, sender=TbDisciplinas)
+@receiver(registros_alterados, sender=TbEnderecos)
+@receiver(registros_alterados, sender=TbNotas)
+@receiver(registros_alterados, sender=TbEstatisticasDisciplina)
+def incrementar_versao_tabela(sender, **kwargs):
+    # Depois do commit, pelo mesmo motivo da invalidação do cache de
+    # disciplinas. Fora de transação o on_commit executa na hora.
+    conexao = transaction.get_connection()
+    if conexao.in_atomic_block:
+        # Reaproveita o callback já registrado no mesmo nível de atomic
+        # (mesmos savepoints): um savepoint desfeito descarta o callback
+        # inteiro, então ele não pode receber tabelas de outro nível.
+        nivel = set(conexao.savepoint_ids)
+        for savepoints, pendente, _ in conexao.run_on_commit:
+            if isinstance(pendente, _IncrementarVersoes) and savepoints == nivel:
+                pendente.tabelas.add(sender._meta.db_table)
+                return
+    pendente = _IncrementarVersoes()
+    pendente.tabelas.add(sender._meta.db_table)
+    transaction.on_commit(pendente)
@@ -0,0 +1,315 @@
+"""
+Tarefas de escrita demoradas (lotes grandes, importação de CSV, remoção em
+massa) executadas fora da requisição, sem broker externo.
+
+A requisição só grava a tarefa em tb_tarefas (estado 'pendente') e devolve o
+id; o cliente acompanha o andamento em GET /tarefas/{id}. Quem executa:
+  - com settings.TAREFAS_EXECUTAR_NO_PROCESSO, um pool de threads do próprio
+    servidor, acionado depois do commit da tarefa;
+  - o comando `manage.py processar_tarefas`, que consulta a fila.
+Os dois podem conviver: cada tarefa é reservada com um UPDATE condicional
+(estado pendente -> executando), que só um deles consegue fazer.
+
+A fila é limitada: com TAREFAS_FILA_MAXIMA tarefas pendentes ou em execução,
+enfileirar() levanta FilaCheia (a API responde 503 com Retry-After). Tarefas
+em execução sem progresso há TAREFAS_TEMPO_SEM_PROGRESSO segundos não contam
+(o processo que as executava morreu), e com o pool do servidor a primeira
+tarefa enfileirada em cada processo retoma as pendentes deixadas por um
+processo anterior.
+"""
+import codecs
+import io
+import json
+import os
+import socket
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from cadastro_aluno import importacao
+from cadastro_aluno.lote import inserir_em_lote
+from cadastro_aluno.models import TbAlunos, TbDisciplinas, TbEnderecos, TbTarefas
+from cadastro_aluno.schemas import AlunoCreateSchema, DisciplinaCreateSchema, EnderecoCreateSchema
+from core.metricas import _rotulos, registro
+
+# modelo do lote -> (modelo, schema, campo único), como nos endpoints de lote
+LOTES = {
+    "alunos": (TbAlunos, AlunoCreateSchema, "matricula"),
+    "enderecos": (TbEnderecos, EnderecoCreateSchema, "cep"),
+    "disciplinas": (TbDisciplinas, DisciplinaCreateSchema, None),
+}
+EM_ANDAMENTO = [TbTarefas.PENDENTE, TbTarefas.EXECUTANDO]
+TRABALHADOR = f"{socket.gethostname()}:{os.getpid()}"
+
+
+class FilaCheia(Exception):
+    pass
+
+
+# Contadores deste processo para o /api/v1/metrics: tarefas em execução,
+# concluídas, com erro e recusadas por fila cheia.
+_contadores = {}
+_lock = threading.Lock()
+
+
+def _contar(chave, valor=1):
+    with _lock:
+        _contadores[chave] = _contadores.get(chave, 0) + valor
+
+
+##################### Execução de cada tipo #################################
+def _blocos(valores):
+    for inicio in range(0, len(valores), settings.BULK_BATCH_SIZE):
+        yield inicio, valores[inicio:inicio + settings.BULK_BATCH_SIZE]
+
+
+def _inserir_lote(tarefa, progresso):
+    # Um bulk_create (e uma transação) por bloco: o progresso aparece a cada
+    # bloco e um erro do banco não desfaz o que já foi gravado.
+    modelo, schema, campo_unico = LOTES[tarefa.parametros["modelo"]]
+    criados, erros = 0, []
+    for inicio, bloco in _blocos(json.loads(tarefa.entrada)):
+        for resultado in inserir_em_lote(modelo, schema, bloco, campo_unico):
+            if resultado["erro"] is None:
+                criados += 1
+            else:
+                erros.append({**resultado, "linha": resultado["linha"] + inicio})
+        progresso(inicio + len(bloco))
+    # Só as linhas com erro: o relatório de um lote grande caberia mal na tarefa.
+    return {"criados": criados, "com_erro": len(erros), "resultados": erros}
+
+
+def _importar_csv(tarefa, progresso):
+    rejeitadas = io.StringIO()
+    caminho = tarefa.parametros.get("arquivo")
+    # Tarefas enfileiradas antes do CSV ir para o disco trazem o texto na entrada.
+    entrada = open(caminho, encoding="utf-8-sig", newline="") if caminho else io.StringIO(tarefa.entrada, newline="")
+    with entrada:
+        resultado = importacao.importar_csv(entrada, tarefa.parametros["tipo"], rejeitadas,
+                                            tarefa.parametros.get("delimitador", ","), progresso)
+    return {**resultado, "rejeitadas_csv": rejeitadas.getvalue()}
+
+
+def _remover(ids):
+    with transaction.atomic():
+        existentes = set(TbAlunos.objects.filter(id__in=ids).values_list("id", flat=True))
+        TbAlunos.objects.filter(id__in=existentes).delete()
+    return existentes
+
+
+def _deletar_alunos(tarefa, progresso):
+    removidos, erros = 0, []
+    for inicio, bloco in _blocos(json.loads(tarefa.entrada)):
+        com_erro = set()
+        try:
+            existentes = _remover(bloco)
+        except Exception:
+            # Um aluno preso (ex: com notas) derruba o bloco: refaz um a um
+            # para remover os outros e reportar só ele.
+            existentes = set()
+            for aluno_id in bloco:
+                try:
+                    existentes |= _remover([aluno_id])
+                except Exception as e:
+                    com_erro.add(aluno_id)
+                    erros.append({"id": aluno_id, "erro": f"erro ao remover: {e}"})
+        removidos += len(existentes)
+        erros.extend({"id": i, "erro": "aluno não encontrado"} for i in bloco if i not in existentes | com_erro)
+        progresso(inicio + len(bloco))
+    return {"removidos": removidos, "com_erro": len(erros), "resultados": erros}
+
+
+EXECUTORES = {
+    "inserir_lote": _inserir_lote,
+    "importar_csv": _importar_csv,
+    "deletar_alunos": _deletar_alunos,
+}
+
+
+##################### Fila #################################
+def _sem_progresso_desde():
+    return timezone.now() - timedelta(seconds=settings.TAREFAS_TEMPO_SEM_PROGRESSO)
+
+
+def guardar_csv(arquivo):
+    """
+    Copia o CSV enviado para TAREFAS_DIRETORIO em blocos, sem juntar o
+    arquivo na memória, e devolve (caminho, linhas de dados estimadas) para
+    o parâmetro 'arquivo' da tarefa. Levanta UnicodeDecodeError (sem deixar
+    o arquivo no disco) se o conteúdo não for UTF-8.
+    """
+    os.makedirs(settings.TAREFAS_DIRETORIO, exist_ok=True)
+    caminho = os.path.join(settings.TAREFAS_DIRETORIO, f"{uuid.uuid4().hex}.csv")
+    decodificador = codecs.getincrementaldecoder("utf-8-sig")()
+    linhas = 0
+    try:
+        with open(caminho, "wb") as destino:
+            for bloco in arquivo.chunks():
+                decodificador.decode(bloco)
+                linhas += bloco.count(b"\n")
+                destino.write(bloco)
+            decodificador.decode(b"", final=True)
+    except Exception:
+        os.remove(caminho)
+        raise
+    return caminho, max(0, linhas - 1)
+
+
+def _remover_arquivo(parametros):
+    caminho = (parametros or {}).get("arquivo")
+    if caminho:
+        try:
+            os.remove(caminho)
+        except FileNotFoundError:
+            pass
+
+
+def enfileirar(tipo, entrada, parametros=None, total=None):
+    """
+    Grava uma tarefa pendente e devolve a instância. Levanta FilaCheia se
+    a fila já tem TAREFAS_FILA_MAXIMA tarefas pendentes ou em execução (e
+    então apaga o parâmetro 'arquivo', que nenhuma tarefa vai ler).
+    """
+    if settings.TAREFAS_EXECUTAR_NO_PROCESSO:
+        _retomar_pendentes()
+    # Contagem e INSERT não são atômicos entre processos: requisições
+    # simultâneas podem passar alguns itens do limite, nunca muitos.
+    na_fila = TbTarefas.objects.filter(
+        Q(estado=TbTarefas.PENDENTE) | Q(estado=TbTarefas.EXECUTANDO, atualizada_em__gte=_sem_progresso_desde())
+    )
+    if na_fila.count() >= settings.TAREFAS_FILA_MAXIMA:
+        _contar("recusadas")
+        _remover_arquivo(parametros)
+        raise FilaCheia("Fila de tarefas cheia; tente novamente mais tarde.")
+    tarefa = TbTarefas.objects.create(tipo=tipo, entrada=entrada, parametros=parametros or {}, total=total)
+    if settings.TAREFAS_EXECUTAR_NO_PROCESSO:
+        transaction.on_commit(lambda: _pool().submit(_executar_em_thread, tarefa.id))
+    return tarefa
+
+
+def reservar(tarefa_id=None):
+    """
+    Passa para 'executando' a tarefa 'tarefa_id' (ou a pendente mais antiga)
+    e a devolve; None se outro trabalhador chegou antes ou não há pendentes.
+    """
+    pendentes = TbTarefas.objects.filter(estado=TbTarefas.PENDENTE)
+    candidatas = [tarefa_id] if tarefa_id is not None else pendentes.order_by("id").values_list("id", flat=True)[:10]
+    for candidata in candidatas:
+        agora = timezone.now()
+        if pendentes.filter(id=candidata).update(estado=TbTarefas.EXECUTANDO, trabalhador=TRABALHADOR,
+                                                 iniciada_em=agora, atualizada_em=agora):
+            return TbTarefas.objects.get(id=candidata)
+    return None
+
+
+def _finalizar(tarefa, estado, **campos):
+    # A entrada (lote ou CSV) não serve mais depois de executada.
+    TbTarefas.objects.filter(id=tarefa.id).update(estado=estado, entrada="", concluida_em=timezone.now(),
+                                                  atualizada_em=timezone.now(), **campos)
+    _remover_arquivo(tarefa.parametros)
+
+
+def executar(tarefa):
+    def progresso(processados):
+        TbTarefas.objects.filter(id=tarefa.id).update(processados=processados, atualizada_em=timezone.now())
+
+    _contar("em_execucao")
+    try:
+        resultado = EXECUTORES[tarefa.tipo](tarefa, progresso)
+    except Exception as e:
+        _finalizar(tarefa, TbTarefas.ERRO, erro=f"{type(e).__name__}: {e}")
+        _contar(TbTarefas.ERRO)
+    else:
+        # O total do CSV é uma estimativa (linhas do texto); no fim vale o que foi lido.
+        processados = TbTarefas.objects.values_list("processados", flat=True).get(id=tarefa.id)
+        _finalizar(tarefa, TbTarefas.CONCLUIDA, resultado=resultado, processados=processados, total=processados)
+        _contar(TbTarefas.CONCLUIDA)
+    finally:
+        _contar("em_execucao", -1)
+
+
+def processar(tarefa_id=None):
+    """
+    Reserva e executa uma tarefa; devolve False se não havia o que executar.
+    """
+    tarefa = reservar(tarefa_id)
+    if tarefa is None:
+        return False
+    executar(tarefa)
+    return True
+
+
+def recuperar_interrompidas():
+    """
+    Marca com erro as tarefas em execução sem progresso há mais de
+    TAREFAS_TEMPO_SEM_PROGRESSO segundos (processo que morreu no meio). Não
+    são reexecutadas: parte do lote pode já ter sido gravada.
+    """
+    interrompidas = TbTarefas.objects.filter(estado=TbTarefas.EXECUTANDO, atualizada_em__lt=_sem_progresso_desde())
+    total = 0
+    # Uma a uma para só apagar o CSV das que foram de fato marcadas.
+    for tarefa in interrompidas.only("id", "parametros"):
+        if interrompidas.filter(id=tarefa.id).update(
+            estado=TbTarefas.ERRO, erro="Tarefa interrompida (sem progresso).", concluida_em=timezone.now(),
+        ):
+            _remover_arquivo(tarefa.parametros)
+            total += 1
+    return total
+
+
+##################### Pool de threads do servidor #################################
+_executor = None
+_retomadas = False
+
+
+def _pool():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.TAREFAS_TRABALHADORES,
+                                           thread_name_prefix="tarefas")
+        return _executor
+
+
+def _retomar_pendentes():
+    # Uma vez por processo: as pendentes de um servidor reiniciado antes de
+    # executá-las não têm mais quem as acione (o on_commit ficou no processo
+    # antigo). Uma pendente que outro processo já esteja executando é
+    # recusada pelo reservar().
+    global _retomadas
+    with _lock:
+        if _retomadas:
+            return
+        _retomadas = True
+    recuperar_interrompidas()
+    for tarefa_id in TbTarefas.objects.filter(estado=TbTarefas.PENDENTE).order_by("id").values_list("id", flat=True):
+        _pool().submit(_executar_em_thread, tarefa_id)
+
+
+def _executar_em_thread(tarefa_id):
+    # Threads do pool não passam pelos sinais de request_started/finished:
+    # as conexões são abertas e fechadas (devolvidas ao pool) aqui.
+    close_old_connections()
+    try:
+        processar(tarefa_id)
+    finally:
+        connections.close_all()
+
+
+def linhas_metricas():
+    with _lock:
+        contadores = dict(_contadores)
+    linhas = ["# TYPE tarefas_em_execucao gauge", f"tarefas_em_execucao {contadores.get('em_execucao', 0)}",
+              "# TYPE tarefas_total counter"]
+    linhas.extend(f"tarefas_total{{{_rotulos(resultado=r)}}} {contadores.get(r, 0)}"
+                  for r in (TbTarefas.CONCLUIDA, TbTarefas.ERRO, "recusadas"))
+    return linhas
+
+
+registro.adicionar_coletor(linhas_metricas)
@@ -1,3 +1,1539 @@
-from django.test import TestCase
+import csv
+import importlib.util
+import json
+import pstats
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, connections, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models.deletion import Collector
+from django.db.utils import ConnectionHandler
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from cadastro_aluno import busca, checks, estatisticas, exportacao, geografia, importacao, planos, ranking, tarefas
+from cadastro_aluno.boletim import montar_boletim
+from cadastro_aluno.cache import cache_disciplinas, versoes_tabelas
+from cadastro_aluno.indice_cep import indice_cep
+from cadastro_aluno.models import TbAlunos, TbAlunosBusca, TbDisciplinas, TbEnderecos, TbEstatisticasDisciplina, TbNotas, TbTarefas
+from cadastro_aluno.schemas import AlunosSchema
+from cadastro_aluno.signals import registros_alterados
+from core import admissao, perfilador
+from core.db import pool as pool_conexoes
+from core.metricas import registro as registro_metricas
+
+
+class PlanosConsultaTests(TestCase):
+    """
+    As rotas principais devem usar os índices da migração 0008, e não varrer a tabela.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        enderecos = TbEnderecos.objects.bulk_create(
+            TbEnderecos(cep=f"{i:05d}-000", endereco="Rua", cidade="Cidade", estado=estado)
+            for i, estado in enumerate(["SP", "RJ", "MG", "BA"] * 5)
+        )
+        disciplinas = TbDisciplinas.objects.bulk_create(
+            TbDisciplinas(disciplina=f"Disciplina {i}", carga=60, semestre=i % 8 + 1) for i in range(16)
+        )
+        alunos = [
+            TbAlunos.objects.create(matricula=str(i), nome=f"Aluno {i}", endereco=enderecos[i % len(enderecos)])
+            for i in range(20)
+        ]
+        TbNotas.objects.bulk_create(
+            TbNotas(aluno=aluno, disciplina=disciplina, nota=7)
+            for aluno in alunos for disciplina in disciplinas[:4]
+        )
+        cls.aluno = alunos[0]
+
+    def plano(self, caminho, **valores):
+        consultas = planos.analisar(planos.capturar(caminho, list(valores), valores))
+        self.assertTrue(consultas)
+        return [passo for consulta in consultas for passo in consulta.passos]
+
+    def indices(self, passos, tabela):
+        return {p.indice for p in passos if p.tabela == tabela}
+
+    def assertSemVarredura(self, passos):
+        self.assertEqual([p.detalhe for p in passos if p.varredura_completa], [])
+
+    def test_disciplinas_por_semestre_usa_indice_de_semestre(self):
+        passos = self.plano("/disciplina-por-semestre/{semestre}", semestre=1)
+        self.assertSemVarredura(passos)
+        self.assertIn("tb_disciplinas_semestre_idx", self.indices(passos, "tb_disciplinas"))
+
+    def test_boletim_do_aluno_usa_indice_de_cobertura_das_notas(self):
+        passos = self.plano("/boletim", aluno_id=self.aluno.id)
+        self.assertSemVarredura(passos)
+        self.assertIn("tb_notas_aluno_disc_nota_idx", self.indices(passos, "tb_notas"))
+
+    def test_boletim_do_semestre_usa_indice_de_semestre(self):
+        passos = self.plano("/boletim", semestre=1)
+        self.assertSemVarredura(passos)
+        self.assertIn("tb_disciplinas_semestre_idx", self.indices(passos, "tb_disciplinas"))
+
+    def test_notas_por_aluno_nao_varre_a_tabela(self):
+        self.assertSemVarredura(self.plano("/notas-por-aluno/{aluno_id}", aluno_id=self.aluno.id))
+
+    def test_busca_exata_por_nome_usa_indice(self):
+        with CaptureQueriesContext(connection) as contexto:
+            list(TbAlunos.objects.filter(nome="Aluno 1").values("id"))
+        passos = planos.analisar(contexto.captured_queries)[0].passos
+        self.assertIn("tb_alunos_nome_idx", self.indices(passos, "tb_alunos"))
+
+    @skipUnless(connection.vendor == "mysql", "no SQLite o LIKE do iexact não usa índice")
+    def test_enderecos_por_estado_usa_indice_de_estado(self):
+        passos = self.plano("/enderecos-por-estado/{estado}", estado="SP")
+        self.assertSemVarredura(passos)
+        self.assertIn("tb_enderecos_estado_idx", self.indices(passos, "tb_enderecos"))
+
+    def test_comando_sugerir_indices(self):
+        saida = StringIO()
+        call_command("sugerir_indices", "--rotas", "consulta_disciplinas_por_semestre", "listar_disciplinas", stdout=saida)
+        texto = saida.getvalue()
+        self.assertIn("2 rotas analisadas, 1 varreduras completas.", texto)
+        self.assertIn("sem filtro", texto)
+
+
+class MigracoesTests(SimpleTestCase):
+    """
+    Os bancos de teste vêm dos models (TEST MIGRATE False), então as
+    migrações rodam aqui num SQLite à parte, como em produção: tabelas
+    legadas do 0001 já existentes, dados cadastrados e as migrações novas
+    (e os seus preenchimentos) aplicadas por cima.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        # Um alias a mais no handler global, só para esta classe (o runner
+        # não cria banco de teste para ele): os preenchimentos das migrações
+        # resolvem o .using(alias) por ele. Os outros bancos ficam
+        # bloqueados, então uma escrita fora deste (sem o .using()) falharia.
+        pasta = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(pasta.cleanup)
+        connections.settings["migracoes"] = ConnectionHandler({"default": {
+            "ENGINE": "django.db.backends.sqlite3", "NAME": str(Path(pasta.name) / "migracoes.sqlite3"),
+        }}).settings["default"]
+        cls.addClassCleanup(connections.settings.pop, "migracoes")
+        cls.addClassCleanup(connections.__delitem__, "migracoes")
+        cls.addClassCleanup(lambda: connections["migracoes"].close())
+        cls.databases = {"migracoes"}
+        super().setUpClass()
+        cls.banco = connections["migracoes"]
+
+    def migrar(self, migracao):
+        executor = MigrationExecutor(self.banco)
+        executor.migrate([("cadastro_aluno", migracao)])
+        apps = executor.loader.project_state(("cadastro_aluno", migracao)).apps
+        return lambda nome: apps.get_model("cadastro_aluno", nome).objects.using("migracoes")
+
+    def test_migracoes_sobre_as_tabelas_legadas(self):
+        executor = MigrationExecutor(self.banco)
+        legado = executor.loader.project_state(("cadastro_aluno", "0001_initial")).apps
+        with self.banco.schema_editor() as editor:
+            for modelo in legado.get_app_config("cadastro_aluno").get_models():
+                editor.create_model(modelo)
+        executor.recorder.record_applied("cadastro_aluno", "0001_initial")
+
+        modelo = self.migrar("0006_delete_tbcarro")
+        disciplina = modelo("TbDisciplinas").create(disciplina="Cálculo", carga=60, semestre=1)
+        aluno = modelo("TbAlunos").create(matricula="1", nome="João D'Ávila")
+        modelo("TbNotas").bulk_create([modelo("TbNotas").model(aluno=aluno, disciplina=disciplina, nota=nota)
+                                       for nota in (Decimal("7"), Decimal("9.5"))])
+
+        ultima = MigrationExecutor(self.banco).loader.graph.leaf_nodes("cadastro_aluno")[0][1]
+        modelo = self.migrar(ultima)
+        # 0007: índice de busca dos alunos que já existiam.
+        self.assertEqual(set(modelo("TbAlunosBusca").filter(aluno_id=aluno.id).values_list("termo", flat=True)),
+                         busca.trigramas("João D'Ávila"))
+        # 0009: resumo das notas que já existiam.
+        resumo = modelo("TbEstatisticasDisciplina").get(disciplina_id=disciplina.id)
+        self.assertEqual((resumo.quantidade, resumo.soma, resumo.minima, resumo.maxima, resumo.faixa_7, resumo.faixa_9),
+                         (2, Decimal("16.5"), Decimal("7"), Decimal("9.5"), 1, 1))
+        self.assertFalse(modelo("TbTarefas").exists())
+
+
+class PoolConexoesTests(SimpleTestCase):
+    # O teste do backend abre o seu próprio banco (alias 'default' de um
+    # ConnectionHandler separado), fora do banco de teste.
+    databases = {"default"}
+
+    def criar_pool(self, **opcoes):
+        return pool_conexoes.Pool(lambda: sqlite3.connect(":memory:", check_same_thread=False), **opcoes)
+
+    def test_reutiliza_a_conexao_devolvida(self):
+        pool = self.criar_pool()
+        primeira = pool.obter()
+        pool.devolver(primeira)
+        self.assertIs(pool.obter(), primeira)
+        estatisticas = pool.estatisticas()
+        self.assertEqual((estatisticas["criadas"], estatisticas["retiradas"], estatisticas["em_uso"]), (1, 2, 1))
+
+    def test_pool_cheio_espera_e_esgota(self):
+        pool = self.criar_pool(tamanho_maximo=1, tempo_espera=0.05)
+        pool.obter()
+        with self.assertRaises(pool_conexoes.PoolEsgotado):
+            pool.obter()
+        estatisticas = pool.estatisticas()
+        self.assertEqual((estatisticas["abertas"], estatisticas["esperas"], estatisticas["esgotamentos"]), (1, 1, 1))
+        self.assertGreater(estatisticas["tempo_espera"], 0)
+
+    def test_conexao_devolvida_acorda_quem_espera(self):
+        pool = self.criar_pool(tamanho_maximo=1, tempo_espera=5)
+        conexao = pool.obter()
+        threading.Timer(0.05, pool.devolver, [conexao]).start()
+        self.assertIs(pool.obter(), conexao)
+
+    def test_recicla_conexao_antiga_e_descarta_a_que_falha_no_teste(self):
+        validar = mock.Mock(side_effect=sqlite3.OperationalError)
+        pool = self.criar_pool(idade_maxima=60, verificar_apos=0, validar=validar)
+        antiga = pool.obter()
+        pool.devolver(antiga)
+        with mock.patch("core.db.pool.time.monotonic", return_value=pool_conexoes.time.monotonic() + 120):
+            self.assertIsNot(pool.obter(), antiga)
+        self.assertEqual(pool.estatisticas()["recicladas"], 1)
+        validar.assert_not_called()
+
+        quebrada = pool.obter()
+        pool.devolver(quebrada)
+        self.assertIsNot(pool.obter(), quebrada)
+        self.assertEqual(pool.estatisticas()["descartadas"], 1)
+
+    def test_backend_devolve_ao_pool_no_close(self):
+        with tempfile.TemporaryDirectory() as pasta:
+            conexoes = ConnectionHandler({"default": {
+                "ENGINE": "core.db.sqlite_pool", "NAME": str(Path(pasta) / "pool.sqlite3"),
+                "POOL": {"TAMANHO_MAXIMO": 2},
+            }})
+            banco = conexoes["default"]
+            banco.ensure_connection()
+            bruta = banco.connection
+            banco.close()
+            with banco.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            self.assertIs(banco.connection, bruta)
+
+            # Fechada dentro de um atomic, a conexão não volta ao pool. (O
+            # atomic resolve o alias no handler global, daí o patch.)
+            with mock.patch.object(transaction, "get_connection", return_value=banco), transaction.atomic():
+                banco.close()
+            self.assertEqual(banco.pool.estatisticas()["descartadas"], 1)
+            banco.ensure_connection()
+            self.assertIsNot(banco.connection, bruta)
+            banco.close()
+
+            linhas = pool_conexoes.linhas_metricas()
+            self.assertIn(f'db_pool_connections_idle{{pool="default:{banco.settings_dict["NAME"]}"}} 1', linhas)
+            banco.pool.fechar_livres()
+
+    def test_backend_so_desfaz_transacao_aberta_e_guarda_o_pool(self):
+        banco = ConnectionHandler({"default": {"ENGINE": "core.db.sqlite_pool", "NAME": ":memory:"}})["default"]
+        with mock.patch.object(pool_conexoes.Pool, "devolver") as devolver:
+            for autocommit, desfeita in ((True, False), (False, True)):
+                banco.connection, banco.autocommit = mock.Mock(), autocommit
+                banco._close()
+                self.assertEqual(banco.connection.rollback.called, desfeita)
+                devolver.assert_called_with(banco.connection, descartar=False)
+        banco.connection = None
+        with mock.patch.object(banco, "get_connection_params") as params:
+            self.assertIs(banco.pool, banco.pool)
+        params.assert_not_called()
+
+        # Validação padrão (DB-API): SELECT 1, que falha numa conexão fechada.
+        conexao = sqlite3.connect(":memory:")
+        banco._validar_conexao(conexao)
+        conexao.close()
+        with self.assertRaises(sqlite3.ProgrammingError):
+            banco._validar_conexao(conexao)
+
+
+@override_settings(DATABASE_REPLICAS=["replica"])
+class ReplicasLeituraTests(TestCase):
+    """
+    Primário e réplica são dois SQLite separados, sem replicação: o que a
+    rota devolve mostra de qual banco ela leu.
+    """
+
+    databases = {"default", "replica"}
+    base = "/api/v1/cadastro_aluno/"
+
+    def setUp(self):
+        cache.clear()
+        TbAlunos.objects.using("replica").bulk_create([TbAlunos(id=1000, matricula="r1", nome="Na réplica")])
+
+    def nomes(self, client, aluno_id=1000):
+        response = client.get(f"{self.base}aluno-por-id/{aluno_id}")
+        self.assertEqual(response.status_code, 200)
+        return [aluno["nome"] for aluno in response.json()]
+
+    def test_leitura_vai_para_a_replica_e_escrita_para_o_primario(self):
+        self.assertEqual(self.nomes(Client()), ["Na réplica"])
+        self.assertFalse(TbAlunos.objects.using("default").exists())
+
+    def test_cliente_le_o_que_escreveu(self):
+        escritor = Client(HTTP_X_CLIENTE_ID="escritor")
+        response = escritor.post(f"{self.base}inserir-aluno/", {"matricula": "p1", "nome": "No primário"},
+                                 content_type="application/json")
+        aluno_id = response.json()["id_criado"]
+        self.assertEqual(TbAlunos.objects.using("default").get(id=aluno_id).nome, "No primário")
+
+        self.assertEqual(self.nomes(escritor, aluno_id), ["No primário"])
+        # Outro cliente continua na réplica, que ainda não recebeu a escrita.
+        outro = Client(HTTP_X_CLIENTE_ID="outro")
+        self.assertEqual(self.nomes(outro, aluno_id), [])
+
+    def test_cache_e_preenchido_pelo_primario(self):
+        TbDisciplinas.objects.using("replica").create(disciplina="Só na réplica", carga=60, semestre=1)
+        TbDisciplinas.objects.using("default").create(disciplina="No primário", carga=60, semestre=1)
+        nomes = [d["disciplina"] for d in self.client.get(f"{self.base}disciplinas").json()]
+        self.assertEqual(nomes, ["No primário"])
+
+    def test_corpo_da_replica_atrasada_sai_sem_etag(self):
+        TbAlunos.objects.using("default").create(id=1000, matricula="r1", nome="Já alterado")
+        caminho = f"{self.base}aluno-por-id/1000"
+        leitor = Client(HTTP_X_CLIENTE_ID="leitor")
+        response = leitor.get(caminho)
+        self.assertEqual([a["nome"] for a in response.json()], ["Na réplica"])
+        self.assertNotIn("ETag", response)
+
+        # Lido do primário (sem réplicas ou cliente fixado), o ETag vale, e
+        # continua valendo para quem ainda cairia na réplica.
+        with self.settings(DATABASE_REPLICAS=[]):
+            response = leitor.get(caminho)
+        self.assertEqual([a["nome"] for a in response.json()], ["Já alterado"])
+        self.assertEqual(leitor.get(caminho, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+
+    def test_sem_replicas_tudo_vai_para_o_primario(self):
+        with self.settings(DATABASE_REPLICAS=[]):
+            self.assertEqual(self.nomes(Client()), [])
+
+
+class DetalheAlunoTests(TestCase):
+    base = "/api/v1/cadastro_aluno/"
+
+    @classmethod
+    def setUpTestData(cls):
+        endereco = TbEnderecos.objects.create(cep="01001-000", endereco="Praça da Sé", cidade="São Paulo", estado="SP")
+        disciplinas = TbDisciplinas.objects.bulk_create(
+            TbDisciplinas(disciplina=f"Disciplina {i}", carga=60, semestre=1) for i in range(3)
+        )
+        alunos = TbAlunos.objects.bulk_create(
+            TbAlunos(matricula=str(i), nome=f"Aluno {i}", endereco=endereco if i % 2 else None) for i in range(12)
+        )
+        TbNotas.objects.bulk_create(
+            TbNotas(aluno=aluno, disciplina=disciplina, nota="7.50") for aluno in alunos for disciplina in disciplinas
+        )
+        cls.aluno = alunos[1]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_detalhe_traz_endereco_e_notas(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(f"{self.base}aluno-detalhe/{self.aluno.id}")
+        dados = response.json()
+        self.assertEqual((dados["matricula"], dados["endereco"]["cep"]), ("1", "01001-000"))
+        self.assertEqual([(n["disciplina"], n["nota"]) for n in dados["notas"]],
+                         [(f"Disciplina {i}", 7.5) for i in range(3)])
+        self.assertEqual(self.client.get(f"{self.base}aluno-detalhe/0").status_code, 404)
+
+    def test_listagem_com_numero_fixo_de_consultas(self):
+        for limite in (1, 10):
+            with self.assertNumQueries(2):
+                response = self.client.get(f"{self.base}consultar-alunos-detalhe?limite={limite}")
+            self.assertEqual(len(response.json()["itens"]), limite)
+
+    def test_saida_confiavel_igual_a_validada(self):
+        caminho = f"{self.base}consultar-alunos-detalhe?limite=3"
+        validada = self.client.get(caminho).json()
+        with self.settings(API_SAIDA_CONFIAVEL=True):
+            self.assertEqual(self.client.get(caminho).json(), validada)
+        self.assertEqual(validada["itens"][0]["endereco"], None)
+
+
+class SaidaConfiavelTests(TestCase):
+    base = "/api/v1/cadastro_aluno/"
+
+    @classmethod
+    def setUpTestData(cls):
+        sp, rj = TbEnderecos.objects.bulk_create([
+            TbEnderecos(cep="01001-000", endereco="Praça da Sé", bairro="Sé", cidade="São Paulo", estado="SP",
+                        regiao="Sudeste"),
+            TbEnderecos(cep="20040-000", endereco="Rua \"Um\"", cidade="Rio de Janeiro", estado="RJ"),
+        ])
+        disciplinas = TbDisciplinas.objects.bulk_create([
+            TbDisciplinas(disciplina="Cálculo", carga=60, semestre=1),
+            TbDisciplinas(disciplina="Física", carga=80, semestre=1),
+        ])
+        alunos = TbAlunos.objects.bulk_create([
+            TbAlunos(matricula="1", nome="João", email="joao@x.com", endereco=sp, nome_mae="Maria"),
+            TbAlunos(matricula="2", nome="Zoë", endereco=rj),
+            TbAlunos(matricula="3", nome="Ana"),
+        ])
+        TbNotas.objects.bulk_create([
+            TbNotas(aluno=alunos[0], disciplina=disciplinas[0], nota=Decimal("7.50")),
+            TbNotas(aluno=alunos[0], disciplina=disciplinas[1], nota=Decimal("10.00")),
+            TbNotas(aluno=alunos[1], disciplina=disciplinas[0], nota=None),
+        ])
+        a, d, e, n = alunos[0].id, disciplinas[0].id, sp.id, alunos[0].tbnotas_set.first().id
+        cls.caminhos = [
+            "disciplinas", f"disciplina-por-id/{d}", "disciplina-por-semestre/1", f"disciplinas-por-ids?ids={d},0",
+            f"enderecos-por-id/{e}", "enderecos-por-estado/sp", "enderecos-por-cep/0", f"enderecos-por-ids?ids={e},0",
+            "alunos-por-localidade", "consultar-alunos?limite=2", f"aluno-por-id/{a}", f"alunos-por-ids?ids=0,{a}",
+            f"aluno-detalhe/{a}", "consultar-alunos-detalhe", f"nota-por-id/{n}", f"notas-por-aluno/{a}",
+            f"notas-por-disciplina/{d}",
+        ]
+
+    def obter(self, caminho):
+        # Sem os caches: cada requisição monta a resposta do zero.
+        cache.clear()
+        indice_cep.descartar()
+        response = self.client.get(f"{self.base}{caminho}")
+        self.assertEqual(response.status_code, 200, caminho)
+        return response
+
+    def test_corpo_identico_ao_validado_pelo_schema(self):
+        self.addCleanup(indice_cep.descartar)
+        for caminho in self.caminhos:
+            with self.subTest(caminho=caminho):
+                validada = self.obter(caminho)
+                with self.settings(API_SAIDA_CONFIAVEL=True):
+                    confiavel = self.obter(caminho)
+                self.assertEqual(confiavel.content, validada.content)
+                self.assertEqual(confiavel["Content-Type"], validada["Content-Type"])
+
+
+def _classes_admissao(**mudancas):
+    classes = {classe: {"TAXA": 1000, "RAJADA": 1000, "CONCORRENCIA": 100, "ESPERA": 0}
+               for classe in ("leitura", "varredura", "escrita")}
+    for classe, limites in mudancas.items():
+        classes[classe].update(limites)
+    return classes
+
+
+@override_settings(ADMISSAO_ATIVA=True)
+class AdmissaoTests(TestCase):
+    base = "/api/v1/cadastro_aluno/"
+
+    def setUp(self):
+        cache.clear()
+        estado = mock.patch.object(admissao, "estado", admissao._Estado())
+        estado.start()
+        self.addCleanup(estado.stop)
+
+    @override_settings(ADMISSAO_CLASSES=_classes_admissao(leitura={"TAXA": 0.01, "RAJADA": 2}))
+    def test_cliente_sem_fichas_recebe_429(self):
+        caminho = f"{self.base}disciplinas"
+        for _ in range(2):
+            self.assertEqual(self.client.get(caminho).status_code, 200)
+        response = self.client.get(caminho)
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response["Retry-After"]), 50)
+        # Os baldes são por cliente (IP) e por classe; o X-Cliente-Id não muda o cliente.
+        self.assertEqual(self.client.get(caminho, HTTP_X_CLIENTE_ID="outro").status_code, 429)
+        self.assertEqual(self.client.get(caminho, REMOTE_ADDR="10.0.0.2").status_code, 200)
+        self.assertEqual(self.client.get(f"{self.base}consultar-alunos").status_code, 200)
+
+    @override_settings(ADMISSAO_CLASSES=_classes_admissao(leitura={"TAXA": 0.01, "RAJADA": 1}),
+                       ADMISSAO_CABECALHO_CLIENTE="X-Forwarded-For")
+    def test_cliente_pelo_cabecalho_do_proxy(self):
+        caminho = f"{self.base}disciplinas"
+        self.assertEqual(self.client.get(caminho, HTTP_X_FORWARDED_FOR="10.0.0.1, 10.0.0.9").status_code, 200)
+        # O começo da lista vem do cliente; só o último endereço conta.
+        self.assertEqual(self.client.get(caminho, HTTP_X_FORWARDED_FOR="10.0.0.5, 10.0.0.9").status_code, 429)
+        self.assertEqual(self.client.get(caminho, HTTP_X_FORWARDED_FOR="10.0.0.5").status_code, 200)
+
+    @override_settings(ADMISSAO_CLASSES=_classes_admissao(varredura={"CONCORRENCIA": 1}))
+    def test_classe_cheia_recebe_503_ate_o_streaming_terminar(self):
+        exportacao = self.client.get(f"{self.base}exportar-alunos?formato=csv")
+        self.assertEqual(exportacao.status_code, 200)
+        ocupado = self.client.get(f"{self.base}consultar-alunos")
+        self.assertEqual((ocupado.status_code, ocupado["Retry-After"]), (503, "1"))
+        # Leituras baratas não disputam a vaga das varreduras.
+        self.assertEqual(self.client.get(f"{self.base}disciplinas").status_code, 200)
+
+        b"".join(exportacao.streaming_content)
+        self.assertEqual(self.client.get(f"{self.base}consultar-alunos").status_code, 200)
+        self.assertIn('admissao_rejeitadas_total{classe="varredura",status="503"} 1', admissao.linhas_metricas())
+
+    @override_settings(ADMISSAO_CLASSES=_classes_admissao(leitura={"CONCORRENCIA": 1, "ESPERA": 5}))
+    def test_sob_asgi_nao_espera_vaga(self):
+        async def view(request):
+            return None
+
+        middleware = admissao.AdmissaoMiddleware(view)
+        admissao.estado.semaforo("leitura", 1).acquire()
+        request = RequestFactory().get(f"{self.base}disciplinas")
+        request.resolver_match = mock.Mock(url_name="listar_disciplinas")
+        inicio = time.monotonic()
+        self.assertEqual(middleware.process_view(request, view, (), {}).status_code, 503)
+        self.assertLess(time.monotonic() - inicio, 1)
+
+    @override_settings(ADMISSAO_CLASSES=_classes_admissao(escrita={"TAXA": 0.01, "RAJADA": 1}),
+                       ADMISSAO_CACHE="default")
+    def test_limite_no_cache_compartilhado(self):
+        caminho = f"{self.base}inserir-disciplina/"
+        dados = {"disciplina": "Nova", "carga": 60, "semestre": 1}
+        self.assertEqual(self.client.post(caminho, dados, content_type="application/json").status_code, 200)
+        self.assertEqual(self.client.post(caminho, dados, content_type="application/json").status_code, 429)
+
+
+class ConsultarAlunosTests(TestCase):
+    base = "/api/v1/cadastro_aluno/"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alunos = TbAlunos.objects.bulk_create(TbAlunos(matricula=f"P{i}", nome=f"Aluno {i}") for i in range(7))
+        cls.ids = [aluno.id for aluno in cls.alunos]
+
+    def pagina(self, consulta):
+        response = self.client.get(f"{self.base}consultar-alunos?{consulta}")
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_paginas_por_cursor_ate_a_ultima(self):
+        vistos, cursor = [], None
+        for tamanho in (3, 3, 1):
+            pagina = self.pagina("limite=3" + (f"&cursor={cursor}" if cursor else ""))
+            self.assertEqual((len(pagina["itens"]), pagina["limite"]), (tamanho, 3))
+            vistos += [item["id"] for item in pagina["itens"]]
+            cursor = pagina["proximo_cursor"]
+        self.assertIsNone(cursor)
+        self.assertEqual(vistos, self.ids)
+        self.assertEqual(self.pagina("limite=6")["proximo_cursor"], self.ids[5])
+        self.assertEqual(self.pagina("limite=7")["proximo_cursor"], None)
+        self.assertEqual(self.pagina(f"cursor={self.ids[-1]}"), {"itens": [], "proximo_cursor": None, "limite": settings.PAGINACAO_LIMITE_PADRAO})
+
+    def test_limite_fica_entre_1_e_o_maximo(self):
+        self.assertEqual(self.pagina("limite=0")["limite"], 1)
+        self.assertEqual(self.pagina("limite=-5")["itens"][0]["id"], self.ids[0])
+        with self.settings(PAGINACAO_LIMITE_MAXIMO=4):
+            pagina = self.pagina("limite=1000")
+        self.assertEqual((pagina["limite"], len(pagina["itens"]), pagina["proximo_cursor"]), (4, 4, self.ids[3]))
+
+    def test_stream_em_blocos_por_keyset(self):
+        esperado = list(TbAlunos.objects.order_by("id").filter(id__gt=self.ids[0]).values(*AlunosSchema.model_fields))
+        with self.settings(STREAMING_CHUNK_SIZE=2), CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(f"{self.base}consultar-alunos?stream=true&cursor={self.ids[0]}")
+            corpo = b"".join(response.streaming_content)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertEqual([json.loads(linha) for linha in corpo.splitlines()], esperado)
+        # 6 alunos em blocos de 2 com LIMIT: 3 blocos e a consulta vazia do fim.
+        selects = [c["sql"] for c in consultas if "tb_alunos" in c["sql"] and c["sql"].startswith("SELECT")]
+        self.assertEqual(len(selects), 4)
+        self.assertTrue(all("LIMIT 2" in sql for sql in selects))
+
+    async def test_stream_assincrono_igual_ao_sincrono(self):
+        with self.settings(STREAMING_CHUNK_SIZE=2):
+            sincrono = await sync_to_async(self.client.get)(f"{self.base}consultar-alunos?stream=true")
+            sincrono = b"".join(await sync_to_async(list)(sincrono.streaming_content))
+            response = await self.async_client.get(f"{self.base}async/consultar-alunos?stream=true")
+            assincrono = b"".join([parte async for parte in response.streaming_content])
+        self.assertEqual(assincrono, sincrono)
+        self.assertEqual(len(assincrono.splitlines()), 7)
+
+
+class BuscaAlunosTests(TestCase):
+    base = "/api/v1/cadastro_aluno/"
+
+    def buscar(self, nome):
+        response = self.client.get(f"{self.base}alunos-por-nome/{nome}")
+        self.assertEqual(response.status_code, 200)
+        return [aluno["nome"] for aluno in response.json()]
+
+    def termos(self, aluno_id):
+        return set(TbAlunosBusca.objects.filter(aluno_id=aluno_id).values_list("termo", flat=True))
+
+    def test_sem_diferenciar_acentos_e_maiusculas(self):
+        for nome in ("João D'Ávila", "Joana Silva", "Márcia Souza"):
+            TbAlunos.objects.create(matricula=nome, nome=nome)
+        self.assertEqual(self.buscar("joao davila")[0], "João D'Ávila")
+        self.assertEqual(self.buscar("JOÃO")[0], "João D'Ávila")
+        self.assertEqual(self.buscar("marcia"), ["Márcia Souza"])
+        self.assertEqual(self.buscar("..."), [])
+
+    def test_indice_acompanha_as_escritas(self):
+        aluno = TbAlunos.objects.create(matricula="1", nome="Ana")
+        self.assertEqual(self.termos(aluno.id), {"  a", " an", "ana", "na "})
+        aluno.nome = "Bia"
+        aluno.save()
+        self.assertEqual(self.buscar("bia"), ["Bia"])
+        self.assertEqual(self.buscar("ana"), [])
+
+        # .update() do endpoint unitário e bulk_update do lote: registros_alterados.
+        self.client.put(f"{self.base}atualizar-aluno/{aluno.id}", {"nome": "Caio"}, content_type="application/json")
+        self.assertEqual(self.buscar("caio"), ["Caio"])
+        self.client.patch(f"{self.base}atualizar-alunos-lote/", [{"id": aluno.id, "nome": "Davi"}],
+                          content_type="application/json")
+        self.assertEqual((self.buscar("davi"), self.buscar("caio")), (["Davi"], []))
+        # Sem o nome entre os campos alterados, o índice não é refeito.
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.put(f"{self.base}atualizar-aluno/{aluno.id}", {"email": "davi@x.com"},
+                            content_type="application/json")
+        self.assertFalse(any("tb_alunos_busca" in c["sql"] for c in consultas))
+
+        relatorio = self.client.post(f"{self.base}inserir-alunos-lote/", [{"matricula": "2", "nome": "Eva"}],
+                                     content_type="application/json").json()
+        self.assertEqual(self.buscar("eva"), ["Eva"])
+
+        aluno_id = aluno.id
+        aluno.delete()
+        self.assertEqual(self.termos(aluno_id), set())
+        TbAlunos.objects.filter(id=relatorio["resultados"][0]["id_criado"]).delete()
+        self.assertFalse(TbAlunosBusca.objects.exists())
+
+
+class InserirEmLoteTests(TestCase):
+    base = "/api/v1/cadastro_aluno/"
+
+    def inserir(self, caminho, itens):
+        avisados = []
+
+        def receber(sender, ids, **kwargs):
+            avisados.extend(ids)
+
+        registros_alterados.connect(receber)
+        try:
+            response = self.client.post(f"{self.base}{caminho}", itens, content_type="application/json")
+        finally:
+            registros_alterados.disconnect(receber)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), avisados
+
+    def conferir(self, relatorio, modelo, erros):
+        self.assertEqual([r["linha"] for r in relatorio["resultados"]], list(range(len(relatorio["resultados"]))))
+        self.assertEqual({r["linha"] for r in relatorio["resultados"] if r["erro"]}, erros)
+        self.assertEqual((relatorio["com_erro"], relatorio["criados"]),
+                         (len(erros), len(relatorio["resultados"]) - len(erros)))
+        criados = [r["id_criado"] for r in relatorio["resultados"] if r["erro"] is None]
+        self.assertNotIn(None, criados)
+        self.assertTrue(all(r["id_criado"] is None for r in relatorio["resultados"] if r["erro"]))
+        self.assertEqual(set(modelo.objects.filter(id__in=criados).values_list("id", flat=True)), set(criados))
+        return criados
+
+    def test_relatorio_por_linha(self):
+        TbAlunos.objects.create(matricula="E1", nome="Existente")
+        itens = [{"matricula": "L1", "nome": "Um"}, {"nome": "sem matrícula"}, {"matricula": "E1", "nome": "Já existe"},
+                 {"matricula": "L2", "nome": "Dois", "endereco_id": 0}, {"matricula": "L1", "nome": "Repetido"},
+                 {"matricula": "L3", "nome": "Três"}]
+        relatorio, avisados = self.inserir("inserir-alunos-lote/", itens)
+        criados = self.conferir(relatorio, TbAlunos, {1, 2, 3, 4})
+        self.assertEqual(list(TbAlunos.objects.filter(id__in=criados).values_list("matricula", flat=True).order_by("id")),
+                         ["L1", "L3"])
+        self.assertEqual(avisados, criados)
+        self.assertIn("endereco_id 0", relatorio["resultados"][3]["erro"])
+
+    def test_ids_sem_retorno_do_bulk_insert(self):
+        # Como no MySQL: o bulk_create não devolve os ids gerados.
+        with mock.patch.object(connection.features, "can_return_rows_from_bulk_insert", False):
+            disciplinas, avisados = self.inserir("inserir-disciplinas-lote/", [
+                {"disciplina": "Cálculo", "carga": 60, "semestre": 1}, {"disciplina": "Sem carga"},
+                {"disciplina": "Física", "carga": 80, "semestre": 2}])
+            alunos, avisados_alunos = self.inserir("inserir-alunos-lote/", [
+                {"matricula": "M1", "nome": "Um"}, {"matricula": "M2", "nome": "Dois"}])
+        criadas = self.conferir(disciplinas, TbDisciplinas, {1})
+        self.assertEqual(list(TbDisciplinas.objects.filter(id__in=criadas).values_list("disciplina", flat=True)),
+                         ["Cálculo", "Física"])
+        # As disciplinas avisam pelo post_save de cada INSERT; ninguém recebe id None.
+        self.assertEqual(avisados, [])
+        self.assertEqual(avisados_alunos, self.conferir(alunos, TbAlunos, set()))
+
+
+class AtualizarEmLoteTests(TestCase):
+    caminho = "/api/v1/cadastro_aluno/atualizar-alunos-lote/"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.a, cls.b, cls.c, cls.d = TbAlunos.objects.bulk_create(
+            TbAlunos(matricula=f"A{i}", nome=f"Aluno {i}") for i in range(4))
+
+    def atualizar(self, itens):
+        avisos = []
+
+        def receber(sender, ids, campos=None, **kwargs):
+            avisos.append((sorted(ids), campos))
+
+        registros_alterados.connect(receber)
+        try:
+            with CaptureQueriesContext(connection) as consultas:
+                response = self.client.patch(self.caminho, itens, content_type="application/json")
+        finally:
+            registros_alterados.disconnect(receber)
+        updates = [c["sql"] for c in consultas if c["sql"].startswith("UPDATE")]
+        return response, updates, avisos
+
+    def test_um_update_por_conjunto_de_campos(self):
+        response, updates, avisos = self.atualizar([
+            {"id": self.a.id, "email": "a@x.com"},
+            {"id": self.b.id, "email": "b@x.com"},
+            {"id": self.c.id, "nome": "C", "nome_mae": "Mãe"},
+            {"id": 999999, "nome": "Ninguém"},
+            {"id": self.a.id, "nome": "A"},
+        ])
+        self.assertEqual(response.status_code, 200)
+        relatorio = response.json()
+        self.assertEqual(relatorio["atualizados"], [self.a.id, self.b.id, self.c.id])
+        self.assertEqual(relatorio["com_erro"], 1)
+        self.assertEqual([r["linha"] for r in relatorio["resultados"] if r["erro"]], [3])
+        self.assertIn("999999", relatorio["resultados"][3]["erro"])
+        # {email}, {nome, nome_mae} e {email, nome} (os dois itens do aluno 'a' somados).
+        self.assertEqual(len(updates), 3)
+        self.assertEqual(
+            list(TbAlunos.objects.order_by("id").values_list("nome", "email", "nome_mae")),
+            [("A", "a@x.com", None), ("Aluno 1", "b@x.com", None), ("C", None, "Mãe"), ("Aluno 3", None, None)])
+        self.assertEqual(avisos, [([self.a.id, self.b.id, self.c.id], {"email", "nome", "nome_mae"})])
+
+    def test_erro_do_banco_desfaz_o_lote(self):
+        response, _, avisos = self.atualizar([
+            {"id": self.a.id, "nome": "Novo nome"},
+            {"id": self.b.id, "matricula": "A2"},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Erro ao atualizar o lote", response.json()["mensagem"])
+        self.assertEqual(TbAlunos.objects.get(id=self.a.id).nome, "Aluno 0")
+        self.assertEqual(avisos, [])
+
+
+class IndiceCepTests(TestCase):
+    def setUp(self):
+        indice_cep.descartar()
+        self.addCleanup(indice_cep.descartar)
+
+    def ceps(self, prefixo="0"):
+        return [e["cep"] for e in indice_cep.buscar(prefixo, 10)]
+
+    def test_escritas_pelos_signals(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            endereco = TbEnderecos.objects.create(cep="01001-000", endereco="Praça da Sé", cidade="São Paulo")
+        response = self.client.get("/api/v1/cadastro_aluno/enderecos-por-cep/01001")
+        self.assertEqual([e["id"] for e in response.json()], [endereco.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            endereco.cep = "02002-000"
+            endereco.save()
+        self.assertEqual(self.ceps(), ["02002-000"])
+        # O on_commit do delete roda com a instância já sem pk.
+        with self.captureOnCommitCallbacks(execute=True):
+            endereco.delete()
+        self.assertEqual(self.ceps(), [])
+        self.assertEqual(len(indice_cep), 0)
+
+    def test_recarga_vencida_em_segundo_plano_sem_o_lock(self):
+        TbEnderecos.objects.create(cep="01000-000", endereco="Rua A")
+        self.assertEqual(self.ceps(), ["01000-000"])
+        # Gravados por "outro processo": sem signal neste.
+        _, alterado = TbEnderecos.objects.bulk_create([TbEnderecos(cep="03000-000", endereco="Rua B"),
+                                                       TbEnderecos(cep="04000-000", endereco="Rua C")])
+        with self.settings(INDICE_CEP_TTL_SEGUNDOS=1e-6), \
+                mock.patch.object(indice_cep, "_recarregar_em_segundo_plano") as disparar:
+            # A busca responde com o índice antigo e dispara uma recarga só.
+            self.assertEqual(self.ceps(), ["01000-000"])
+            self.assertEqual(self.ceps(), ["01000-000"])
+        disparar.assert_called_once_with()
+
+        ler = indice_cep._ler
+
+        def ler_com_escrita_no_meio():
+            self.assertFalse(indice_cep._lock.locked())
+            lido = ler()
+            # Alterado depois da leitura: o aviso chega durante a recarga.
+            TbEnderecos.objects.filter(id=alterado.id).update(cep="05000-000")
+            indice_cep.atualizar([alterado.id])
+            return lido
+
+        with mock.patch.object(indice_cep, "_ler", ler_com_escrita_no_meio):
+            indice_cep.recarregar()
+        self.assertEqual(self.ceps(), ["01000-000", "03000-000", "05000-000"])
+        self.assertFalse(indice_cep._recarregando)
+
+
+class CacheDisciplinasTests(TestCase):
+    base = "/api/v1/cadastro_aluno/"
+
+    def setUp(self):
+        cache_disciplinas.cache.clear()
+        self.disciplina = TbDisciplinas.objects.create(disciplina="Cálculo", carga=60, semestre=1)
+
+    def nomes(self, rota="disciplinas"):
+        return sorted(d["disciplina"] for d in self.client.get(f"{self.base}{rota}").json())
+
+    def escrever(self, metodo, caminho, dados=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = getattr(self.client, metodo)(f"{self.base}{caminho}", dados, content_type="application/json")
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_leitura_repetida_sai_do_cache(self):
+        self.assertEqual(self.nomes(), ["Cálculo"])
+        self.assertEqual(self.nomes("disciplina-por-semestre/1"), ["Cálculo"])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.nomes(), ["Cálculo"])
+            self.assertEqual(self.nomes("disciplina-por-semestre/1"), ["Cálculo"])
+            self.assertEqual(self.nomes("async/disciplinas"), ["Cálculo"])
+
+    def test_cada_escrita_invalida(self):
+        id_ = self.disciplina.id
+        self.assertEqual(self.nomes(), ["Cálculo"])
+        self.assertEqual(self.nomes(f"disciplina-por-id/{id_}"), ["Cálculo"])
+
+        self.escrever("post", "inserir-disciplina/", {"disciplina": "Física", "carga": 60, "semestre": 1})
+        self.assertEqual(self.nomes(), ["Cálculo", "Física"])
+
+        self.escrever("put", f"atualizar-disciplina/{id_}", {"disciplina": "Cálculo I"})
+        self.assertEqual(self.nomes(f"disciplina-por-id/{id_}"), ["Cálculo I"])
+
+        self.escrever("post", "inserir-disciplinas-lote/", [{"disciplina": "Química", "carga": 60, "semestre": 2}])
+        self.assertEqual(self.nomes(), ["Cálculo I", "Física", "Química"])
+
+        self.escrever("patch", "atualizar-disciplinas-lote/", [{"id": id_, "disciplina": "Cálculo II"}])
+        self.assertEqual(self.nomes(f"disciplina-por-id/{id_}"), ["Cálculo II"])
+
+        self.escrever("post", "async/inserir-disciplina/", {"disciplina": "Biologia", "carga": 60, "semestre": 1})
+        self.assertEqual(self.nomes("async/disciplinas"), ["Biologia", "Cálculo II", "Física", "Química"])
+
+        self.escrever("delete", f"deletar-disciplina/{id_}")
+        self.assertEqual(self.nomes(), ["Biologia", "Física", "Química"])
+        self.assertEqual(self.nomes(f"async/disciplina-por-id/{id_}"), [])
+
+    def test_escrita_desfeita_nao_invalida(self):
+        self.assertEqual(self.nomes(), ["Cálculo"])
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with transaction.atomic():
+                TbDisciplinas.objects.create(disciplina="Desfeita", carga=60, semestre=1)
+                transaction.set_rollback(True)
+        self.assertEqual(callbacks, [])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.nomes(), ["Cálculo"])
+
+
+class MetricasTests(TestCase):
+    base = "/api/v1/cadastro_aluno/"
+    rota = "api/v1/cadastro_aluno/aluno-por-id/<aluno_id>"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.aluno = TbAlunos.objects.create(matricula="1", nome="Ana")
+
+    def setUp(self):
+        # Só as medições deste teste; o registro é do processo inteiro.
+        isolado = mock.patch.object(registro_metricas, "_rotas", {})
+        isolado.start()
+        self.addCleanup(isolado.stop)
+
+    def test_server_timing_com_tempo_e_consultas(self):
+        for base in (self.base, f"{self.base}async/"):
+            with CaptureQueriesContext(connection) as consultas:
+                response = self.client.get(f"{base}aluno-por-id/{self.aluno.id}")
+            self.assertRegex(response["Server-Timing"],
+                             rf'^app;dur=\d+\.\d, db;dur=\d+\.\d;desc="{len(consultas)} consultas"$')
+            self.assertGreater(len(consultas), 0)
+
+    def test_endpoint_no_formato_do_prometheus(self):
+        for _ in range(2):
+            self.client.get(f"{self.base}aluno-por-id/{self.aluno.id}")
+        self.client.get(f"{self.base}aluno-por-id/0")
+        self.client.get("/api/v1/nao-existe")
+
+        response = self.client.get("/api/v1/metrics")
+        self.assertEqual(response["Content-Type"], "text/plain; version=0.0.4; charset=utf-8")
+        linhas = response.content.decode().splitlines()
+        rotulos = f'method="GET",route="{self.rota}"'
+        self.assertIn(f"http_requests_total{{{rotulos},status=\"200\"}} 3", linhas)
+        self.assertIn('http_requests_total{method="GET",route="<nao_resolvida>",status="404"} 1', linhas)
+        for serie in ("http_request_duration_seconds", "http_request_db_duration_seconds", "http_request_db_queries"):
+            self.assertIn(f"# TYPE {serie} histogram", linhas)
+            self.assertIn(f"{serie}_count{{{rotulos}}} 3", linhas)
+            self.assertIn(f'{serie}_bucket{{{rotulos},le="+Inf"}} 3', linhas)
+        # Uma consulta por requisição: acumulado 0 até le="0", 3 a partir de le="1".
+        self.assertIn(f'http_request_db_queries_bucket{{{rotulos},le="0"}} 0', linhas)
+        self.assertIn(f'http_request_db_queries_bucket{{{rotulos},le="1"}} 3', linhas)
+        self.assertIn(f"http_request_db_queries_sum{{{rotulos}}} 3.0", linhas)
+        # As métricas de fora do registro de rotas (coletores) vêm junto.
+        self.assertTrue(any(linha.startswith("tarefas_em_execucao ") for linha in linhas))
+
+
+class AtualizarAlunoTests(TestCase):
+    def test_sincrono_e_assincrono_respondem_igual(self):
+        aluno = TbAlunos.objects.create(matricula="1", nome="Antes")
+        for base in ("/api/v1/cadastro_aluno/", "/api/v1/cadastro_aluno/async/"):
+            def atualizar(aluno_id, dados):
+                return self.client.put(f"{base}atualizar-aluno/{aluno_id}", dados, content_type="application/json")
+
+            self.assertEqual(atualizar(aluno.id, {}).status_code, 400, base)
+            self.assertEqual(atualizar(0, {"nome": "Ninguém"}).status_code, 404, base)
+            self.assertEqual(atualizar(aluno.id, {"nome": f"Depois {base}"}).status_code, 200, base)
+            aluno.refresh_from_db()
+            self.assertEqual((aluno.nome, aluno.matricula), (f"Depois {base}", "1"))
+
+
+class VersoesTabelasTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        versoes_tabelas.cache.clear()
+
+    def versao(self):
+        return versoes_tabelas.obter(TbDisciplinas._meta.db_table)[0]
+
+    def test_uma_versao_por_transacao(self):
+        inicial = self.versao()
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                for i in range(3):
+                    TbDisciplinas.objects.create(disciplina=f"D{i}", carga=60, semestre=1)
+                TbAlunos.objects.create(matricula="1", nome="Aluno")
+        self.assertEqual(self.versao(), inicial + 1)
+
+    def test_savepoint_desfeito_nao_perde_a_versao(self):
+        inicial = self.versao()
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                try:
+                    with transaction.atomic():
+                        TbDisciplinas.objects.create(disciplina="Desfeita", carga=60, semestre=1)
+                        raise ValueError
+                except ValueError:
+                    pass
+                TbDisciplinas.objects.create(disciplina="Gravada", carga=60, semestre=1)
+        self.assertEqual(self.versao(), inicial + 1)
+
+    def test_versao_expira_pelo_ttl(self):
+        with self.settings(VERSOES_TABELAS_TTL=0.05):
+            inicial = self.versao()
+            time.sleep(0.1)
+            self.assertNotEqual(self.versao(), inicial)
+
+    def test_aviso_de_versoes_em_memoria(self):
+        self.assertEqual([a.id for a in checks.versoes_compartilhadas(None)], ["cadastro_aluno.W001"])
+        compartilhado = {**settings.CACHES, "versoes": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+        with self.settings(CACHES=compartilhado):
+            self.assertEqual(checks.versoes_compartilhadas(None), [])
+
+    def test_rotas_assincronas_com_etag(self):
+        TbDisciplinas.objects.create(disciplina="D", carga=60, semestre=1)
+        for caminho in ("disciplinas", "consultar-alunos"):
+            url = f"/api/v1/cadastro_aluno/async/{caminho}"
+            etag = self.client.get(url)["ETag"]
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            # Mesmo ETag da rota síncrona não vale: o caminho faz parte dele.
+            sincrona = self.client.get(url.replace("async/", ""))["ETag"]
+            self.assertNotEqual(sincrona, etag)
+
+    def test_modelos_derivados_mantem_o_delete_rapido(self):
+        for modelo in (TbAlunosBusca, TbEstatisticasDisciplina, TbTarefas):
+            self.assertTrue(Collector(using="default").can_fast_delete(modelo.objects.all()), modelo)
+
+
+class BoletimTests(TestCase):
+    base = "/api/v1/cadastro_aluno/boletim"
+
+    @classmethod
+    def setUpTestData(cls):
+        calculo, fisica, historia, quimica = TbDisciplinas.objects.bulk_create([
+            TbDisciplinas(disciplina="Cálculo", carga=60, semestre=1),
+            TbDisciplinas(disciplina="Física", carga=90, semestre=1),
+            TbDisciplinas(disciplina="História", carga=30, semestre=2),
+            TbDisciplinas(disciplina="Química", carga=40, semestre=2),
+        ])
+        cls.ana = TbAlunos.objects.create(matricula="1", nome="Ana")
+        cls.bruno = TbAlunos.objects.create(matricula="2", nome="Bruno")
+        TbNotas.objects.bulk_create(
+            TbNotas(aluno=aluno, disciplina=disciplina, nota=nota) for aluno, disciplina, nota in [
+                (cls.ana, calculo, "7"), (cls.ana, calculo, "8"), (cls.ana, fisica, "5"),
+                (cls.ana, historia, "10"), (cls.ana, historia, "9"), (cls.ana, historia, None),
+                (cls.ana, quimica, None), (cls.bruno, calculo, "6.5"),
+            ]
+        )
+
+    def boletim(self, **parametros):
+        response = self.client.get(self.base, parametros)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_medias_do_aluno(self):
+        [ana] = self.boletim(aluno_id=self.ana.id)
+        linhas = [(d["disciplina"], d["quantidade"], d["media"], d["minima"], d["maxima"]) for d in ana["disciplinas"]]
+        self.assertEqual(linhas, [
+            ("Cálculo", 2, 7.5, 7.0, 8.0),
+            ("Física", 1, 5.0, 5.0, 5.0),
+            ("História", 2, 9.5, 9.0, 10.0),  # a nota nula não conta
+            ("Química", 0, None, None, None),
+        ])
+        # Química, sem nota, fica fora: (7,5 + 5 + 9,5) / 3 e
+        # (7,5 * 60 + 5 * 90 + 9,5 * 30) / (60 + 90 + 30) = 1185 / 180.
+        self.assertEqual((ana["media"], ana["media_ponderada"]), (7.33, 6.58))
+
+    def test_boletim_do_semestre(self):
+        ana, bruno = self.boletim(semestre=1)
+        self.assertEqual((ana["nome"], ana["media"], ana["media_ponderada"]), ("Ana", 6.25, 6.0))
+        self.assertEqual((bruno["nome"], bruno["media"], bruno["media_ponderada"]), ("Bruno", 6.5, 6.5))
+        [so_nulas] = [d for d in self.boletim(aluno_id=self.ana.id, semestre=2)[0]["disciplinas"] if not d["quantidade"]]
+        self.assertEqual(so_nulas["disciplina"], "Química")
+        self.assertEqual(self.boletim(semestre=3), [])
+        self.assertEqual(self.client.get(self.base).status_code, 400)
+
+    def test_uma_consulta_para_o_semestre_inteiro(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(len(montar_boletim(semestre=1)), 2)
+
+
+class EstatisticasNotasTests(TestCase):
+    base = "/api/v1/cadastro_aluno/"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.disciplinas = TbDisciplinas.objects.bulk_create(
+            TbDisciplinas(disciplina=f"Disciplina {i}", carga=60, semestre=1) for i in range(2)
+        )
+        cls.aluno = TbAlunos.objects.create(matricula="1", nome="Aluno")
+
+    def setUp(self):
+        cache.clear()
+
+    def lancar(self, disciplina, nota):
+        response = self.client.post(f"{self.base}inserir-nota/",
+                                    {"aluno_id": self.aluno.id, "disciplina_id": disciplina.id, "nota": nota},
+                                    content_type="application/json")
+        return response.json()["id_criado"]
+
+    def resumo(self, disciplina):
+        return self.client.get(f"{self.base}estatisticas-disciplina/{disciplina.id}").json()
+
+    def test_resumo_acompanha_insercao_alteracao_e_remocao(self):
+        primeira, segunda = self.disciplinas
+        ids = [self.lancar(primeira, nota) for nota in ("4.00", "7.50", "10.00")]
+        resumo = self.resumo(primeira)
+        self.assertEqual((resumo["quantidade"], resumo["minima"], resumo["maxima"]), (3, 4.0, 10.0))
+        self.assertAlmostEqual(resumo["media"], 7.1666, places=3)
+        self.assertEqual([f["quantidade"] for f in resumo["faixas"]], [0, 0, 0, 0, 1, 0, 0, 1, 0, 1])
+
+        # Trocar de disciplina tira da antiga e soma na nova.
+        self.client.put(f"{self.base}atualizar-nota/{ids[2]}", {"disciplina_id": segunda.id},
+                        content_type="application/json")
+        self.client.put(f"{self.base}atualizar-nota/{ids[0]}", {"nota": "9.00"}, content_type="application/json")
+        self.client.delete(f"{self.base}deletar-nota/{ids[1]}")
+        resumo = self.resumo(primeira)
+        self.assertEqual((resumo["quantidade"], resumo["minima"], resumo["maxima"]), (1, 9.0, 9.0))
+        self.assertEqual(self.resumo(segunda)["maxima"], 10.0)
+        self.assertEqual(estatisticas.divergencias(), [])
+
+        semestre = self.client.get(f"{self.base}estatisticas-semestre/1").json()
+        self.assertEqual((semestre["disciplinas"], semestre["quantidade"], semestre["media"]), (2, 2, 9.5))
+        self.assertEqual(self.client.get(f"{self.base}estatisticas-disciplina/0").status_code, 404)
+
+    def test_leitura_nao_consulta_as_notas(self):
+        self.lancar(self.disciplinas[0], "8.00")
+        with CaptureQueriesContext(connection) as contexto:
+            self.resumo(self.disciplinas[0])
+        self.assertEqual(len(contexto.captured_queries), 1)
+        self.assertNotIn("tb_notas", contexto.captured_queries[0]["sql"])
+
+    def test_etag_muda_com_a_disciplina_removida(self):
+        disciplina = TbDisciplinas.objects.create(disciplina="Sem notas", carga=60, semestre=1)
+        caminho = f"{self.base}estatisticas-disciplina/{disciplina.id}"
+        with self.captureOnCommitCallbacks(execute=True):
+            etag = self.client.get(caminho)["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f"{self.base}deletar-disciplina/{disciplina.id}")
+        self.assertEqual(self.client.get(caminho, HTTP_IF_NONE_MATCH=etag).status_code, 404)
+
+    def test_comando_reconstroi_e_verifica(self):
+        # Escrita por fora dos signals: o resumo fica para trás até a reconstrução.
+        TbNotas.objects.bulk_create([TbNotas(aluno=self.aluno, disciplina=self.disciplinas[1], nota=5)])
+        with self.assertRaisesMessage(CommandError, "divergências"):
+            call_command("reconstruir_estatisticas", "--verificar", stdout=StringIO())
+        saida = StringIO()
+        call_command("reconstruir_estatisticas", stdout=saida, stderr=StringIO())
+        self.assertIn("confere com as notas", saida.getvalue())
+        self.assertEqual(TbEstatisticasDisciplina.objects.get(disciplina=self.disciplinas[1]).faixa_5, 1)
+
+    def test_comando_muda_a_versao_compartilhada(self):
+        caminho = f"{self.base}estatisticas-disciplina/{self.disciplinas[1].id}"
+        etag = self.client.get(caminho)["ETag"]
+        TbNotas.objects.bulk_create([TbNotas(aluno=self.aluno, disciplina=self.disciplinas[1], nota=5)])
+        tabela = TbEstatisticasDisciplina._meta.db_table
+        [versao] = versoes_tabelas.obter(tabela)
+        avisos = StringIO()
+        call_command("reconstruir_estatisticas", stdout=StringIO(), stderr=avisos)
+        # Direto no cache de versões, sem depender de signal ou de on_commit.
+        self.assertEqual(versoes_tabelas.obter(tabela), [versao + 1])
+        self.assertEqual(self.client.get(caminho, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertIn("VERSOES_TABELAS_CACHE", avisos.getvalue())
+        with mock.patch.object(versoes_tabelas, "compartilhado", return_value=True):
+            avisos = StringIO()
+            call_command("reconstruir_estatisticas", stdout=StringIO(), stderr=avisos)
+        self.assertEqual(avisos.getvalue(), "")
+
+
+class RankingTests(TestCase):
+    base = "/api/v1/cadastro_aluno/"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.disciplinas = TbDisciplinas.objects.bulk_create(
+            TbDisciplinas(disciplina=f"Disciplina {i}", carga=60, semestre=1) for i in range(2)
+        )
+        cls.alunos = TbAlunos.objects.bulk_create(TbAlunos(matricula=str(i), nome=f"Aluno {i}") for i in range(5))
+        # Médias no semestre: aluno 0 = 9, 1 = 8, 2 = 8, 3 = 6, 4 = 5.
+        notas = [(9, 9), (7, 9), (8, 8), (6, 6), (5, 5)]
+        TbNotas.objects.bulk_create(
+            TbNotas(aluno=aluno, disciplina=disciplina, nota=nota)
+            for aluno, par in zip(cls.alunos, notas) for disciplina, nota in zip(cls.disciplinas, par)
+        )
+
+    def setUp(self):
+        cache.clear()
+        ranking.cache_ranking.cache.clear()
+
+    def posicoes(self, **parametros):
+        response = self.client.get(f"{self.base}ranking", parametros)
+        self.assertEqual(response.status_code, 200)
+        return [(linha["posicao"], linha["nome"], linha["media"]) for linha in response.json()]
+
+    def test_top_n_do_semestre_com_empates(self):
+        self.assertEqual(self.posicoes(semestre=1, n=3),
+                         [(1, "Aluno 0", 9.0), (2, "Aluno 1", 8.0), (2, "Aluno 2", 8.0)])
+        self.assertEqual(self.posicoes(disciplina_id=self.disciplinas[0].id, n=2),
+                         [(1, "Aluno 0", 9.0), (2, "Aluno 2", 8.0)])
+        self.assertEqual(self.client.get(f"{self.base}ranking").status_code, 400)
+
+    def test_heap_igual_as_funcoes_de_janela(self):
+        for n in (1, 3, 10):
+            com_janela = ranking.calcular(semestre=1, n=n)
+            with mock.patch.object(connection.features, "supports_over_clause", False):
+                self.assertEqual(ranking.calcular(semestre=1, n=n), com_janela)
+
+    def test_cache_invalidado_pelas_notas_do_escopo(self):
+        outra = TbDisciplinas.objects.create(disciplina="Outra", carga=60, semestre=2)
+        self.posicoes(semestre=1, n=3)
+        with self.assertNumQueries(1):  # só os nomes
+            self.posicoes(semestre=1, n=3)
+        # Nota em outro semestre não derruba o cache do semestre 1.
+        self.lancar(self.alunos[4], outra)
+        with self.assertNumQueries(1):
+            self.posicoes(semestre=1, n=3)
+
+        self.lancar(self.alunos[2], self.disciplinas[0])
+        self.assertEqual(self.posicoes(semestre=1, n=3),
+                         [(1, "Aluno 0", 9.0), (2, "Aluno 2", 8.67), (3, "Aluno 1", 8.0)])
+
+    def lancar(self, aluno, disciplina):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f"{self.base}inserir-nota/", {"aluno_id": aluno.id, "disciplina_id": disciplina.id,
+                                                           "nota": "10"}, content_type="application/json")
+
+
+class ConsultaPorIdsTests(TestCase):
+    base = "/api/v1/cadastro_aluno/"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alunos = TbAlunos.objects.bulk_create(TbAlunos(matricula=str(i), nome=f"Aluno {i}") for i in range(3))
+
+    def test_alunos_indexados_pelo_id_em_uma_consulta(self):
+        a, b, c = (aluno.id for aluno in self.alunos)
+        with self.assertNumQueries(1):
+            response = self.client.get(f"{self.base}alunos-por-ids", {"ids": f"{c},{a},{c},0"})
+        dados = response.json()
+        self.assertEqual(list(dados["itens"]), [str(c), str(a)])
+        self.assertEqual(dados["itens"][str(a)]["nome"], "Aluno 0")
+        self.assertEqual(dados["nao_encontrados"], [0])
+        with self.settings(API_SAIDA_CONFIAVEL=True):
+            self.assertEqual(self.client.get(f"{self.base}alunos-por-ids", {"ids": f"{c},{a},{c},0"}).json(), dados)
+
+    def test_ids_invalidos_ou_demais(self):
+        for ids in ("1,x", "", ",".join(map(str, range(600)))):
+            response = self.client.get(f"{self.base}enderecos-por-ids", {"ids": ids})
+            self.assertEqual(response.status_code, 400, ids)
+
+    def test_so_os_campos_do_schema(self):
+        disciplina = TbDisciplinas.objects.create(disciplina="Cálculo", carga=60, semestre=1)
+        with self.assertNumQueries(1):
+            response = self.client.get(f"{self.base}disciplinas-por-ids", {"ids": f"0,{disciplina.id}"})
+        self.assertEqual(response.json(), {
+            "itens": {str(disciplina.id): {"id": disciplina.id, "disciplina": "Cálculo", "carga": 60, "semestre": 1}},
+            "nao_encontrados": [0],
+        })
+
+
+class AlunosPorLocalidadeTests(TestCase):
+    url = "/api/v1/cadastro_aluno/alunos-por-localidade"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.enderecos = TbEnderecos.objects.bulk_create([
+            TbEnderecos(cep="01000-000", endereco="Rua A", cidade="São Paulo", estado="SP", regiao="Sudeste"),
+            TbEnderecos(cep="13000-000", endereco="Rua B", cidade="Campinas", estado="SP", regiao="Sudeste"),
+            TbEnderecos(cep="20000-000", endereco="Rua C", cidade="Rio de Janeiro", estado="RJ", regiao="Sudeste"),
+            TbEnderecos(cep="40000-000", endereco="Rua D", cidade="Salvador", estado="BA", regiao="Nordeste"),
+        ])
+        sp, campinas, rio, salvador = cls.enderecos
+        cls.alunos = TbAlunos.objects.bulk_create(
+            TbAlunos(matricula=str(i), nome=f"Aluno {i}", endereco=endereco)
+            for i, endereco in enumerate([sp, sp, campinas, rio, salvador, None])
+        )
+
+    def setUp(self):
+        cache.clear()
+        geografia.cache_geografia.cache.clear()
+
+    def consultar(self, **parametros):
+        response = self.client.get(self.url, parametros)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_contagens_em_um_group_by(self):
+        with self.assertNumQueries(1):
+            dados = self.consultar()
+        self.assertEqual((dados["total"], dados["sem_endereco"]), (6, 1))
+        self.assertEqual(dados["regioes"], [{"regiao": "Sudeste", "quantidade": 4},
+                                            {"regiao": "Nordeste", "quantidade": 1}])
+        self.assertEqual([(e["estado"], e["quantidade"]) for e in dados["estados"]], [("SP", 3), ("BA", 1), ("RJ", 1)])
+        self.assertEqual(dados["cidades"][0], {"cidade": "São Paulo", "estado": "SP", "quantidade": 2})
+        with self.assertNumQueries(0):
+            self.assertEqual(self.consultar(), dados)
+
+        sp = self.consultar(estado="sp")
+        self.assertEqual([c["cidade"] for c in sp["cidades"]], ["São Paulo", "Campinas"])
+        self.assertEqual([r["regiao"] for r in sp["regioes"]], ["Sudeste"])
+
+    def test_cache_invalidado_por_alunos_e_enderecos(self):
+        aluno, salvador = self.alunos[0], self.enderecos[3]
+        self.consultar()
+        # Campos fora do agrupamento não derrubam o cache.
+        self.atualizar(f"atualizar-aluno/{aluno.id}", {"nome": "Outro nome"})
+        with self.assertNumQueries(0):
+            self.consultar()
+
+        self.atualizar(f"atualizar-aluno/{aluno.id}", {"endereco_id": salvador.id})
+        self.assertEqual(self.consultar(estado="BA")["estados"], [{"estado": "BA", "regiao": "Nordeste", "quantidade": 2}])
+
+        self.atualizar(f"atualizar-enderecos/{salvador.id}", {"regiao": "NE"})
+        self.assertEqual(self.consultar(estado="BA")["regioes"], [{"regiao": "NE", "quantidade": 2}])
+
+    def atualizar(self, caminho, dados):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put(f"/api/v1/cadastro_aluno/{caminho}", dados, content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(TAREFAS_EXECUTAR_NO_PROCESSO=False, BULK_BATCH_SIZE=2)
+class TarefasTests(TestCase):
+    base = "/api/v1/cadastro_aluno/tarefas/"
+
+    def setUp(self):
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        self.pasta = Path(pasta.name)
+        ajustes = self.settings(TAREFAS_DIRETORIO=pasta.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def enfileirar(self, caminho, dados, status=202):
+        response = self.client.post(f"{self.base}{caminho}", dados, content_type="application/json")
+        self.assertEqual(response.status_code, status, response.content)
+        return response
+
+    def consultar(self, tarefa_id):
+        return self.client.get(f"{self.base}{tarefa_id}").json()
+
+    def test_lote_executado_em_blocos_com_relatorio(self):
+        itens = [{"matricula": f"T{i}", "nome": f"Aluno {i}"} for i in range(4)] + [{"nome": "sem matrícula"}]
+        itens.insert(3, {"matricula": "T0", "nome": "repetido"})
+        tarefa = self.enfileirar("inserir-lote/alunos", itens).json()
+        self.assertEqual((tarefa["estado"], tarefa["processados"], tarefa["total"]), ("pendente", 0, 6))
+
+        self.assertTrue(tarefas.processar())
+        self.assertFalse(tarefas.processar())
+        tarefa = self.consultar(tarefa["id"])
+        self.assertEqual((tarefa["estado"], tarefa["processados"]), ("concluida", 6))
+        self.assertEqual(tarefa["resultado"]["criados"], 4)
+        # Linhas numeradas no lote inteiro, não no bloco.
+        self.assertEqual([r["linha"] for r in tarefa["resultado"]["resultados"]], [3, 5])
+        self.assertEqual(TbAlunos.objects.filter(matricula__startswith="T").count(), 4)
+        self.assertEqual(TbTarefas.objects.get(id=tarefa["id"]).entrada, "")
+
+        self.enfileirar("inserir-lote/carros", itens, status=400)
+        self.enfileirar("inserir-lote/alunos", [], status=400)
+
+    def test_fila_cheia_responde_503(self):
+        with self.settings(TAREFAS_FILA_MAXIMA=1):
+            self.enfileirar("deletar-alunos", [1])
+            response = self.enfileirar("deletar-alunos", [2], status=503)
+            self.assertEqual(response["Retry-After"], "30")
+            tarefas.processar()
+            self.enfileirar("deletar-alunos", [2])
+
+    def test_remocao_e_importacao(self):
+        alunos = TbAlunos.objects.bulk_create(TbAlunos(matricula=f"R{i}", nome="Remover") for i in range(3))
+        ids = [alunos[0].id, 0, alunos[2].id, alunos[0].id]
+        tarefa = self.enfileirar("deletar-alunos", ids).json()
+        csv = "matricula,nome\nI1,Importado\nI2,Importado\n,sem matrícula\n"
+        importacao = self.client.post(f"{self.base}importar-csv/alunos", {"arquivo": StringIO(csv)}).json()
+        self.assertEqual(importacao["total"], 3)
+        # O CSV fica no disco, não na tarefa, até ela terminar.
+        self.assertEqual(TbTarefas.objects.get(id=importacao["id"]).entrada, "")
+        self.assertEqual(len(list(self.pasta.iterdir())), 1)
+
+        call_command("processar_tarefas", "--uma-vez", "--trabalhadores", "1", stdout=StringIO())
+        resultado = self.consultar(tarefa["id"])["resultado"]
+        self.assertEqual((resultado["removidos"], resultado["resultados"]), (2, [{"id": 0, "erro": "aluno não encontrado"}]))
+        self.assertEqual(list(TbAlunos.objects.filter(matricula__startswith="R").values_list("id", flat=True)),
+                         [alunos[1].id])
+        importacao = self.consultar(importacao["id"])
+        self.assertEqual((importacao["estado"], importacao["processados"]), ("concluida", 3))
+        self.assertEqual((importacao["resultado"]["gravadas"], importacao["resultado"]["rejeitadas"]), (2, 1))
+        self.assertEqual(list(self.pasta.iterdir()), [])
+
+    def test_lote_acima_do_limite_de_upload_do_django(self):
+        itens = [{"matricula": f"G{i}", "nome": f"Aluno {i}"} for i in range(50)]
+        with self.settings(DATA_UPLOAD_MAX_MEMORY_SIZE=100):
+            tarefa = self.enfileirar("inserir-lote/alunos", itens).json()
+            self.assertEqual(tarefa["total"], 50)
+            # As outras rotas respondem 413, não 500, acima do limite do Django.
+            response = self.enfileirar("deletar-alunos", list(range(100)), status=413)
+            self.assertIn("mensagem", response.json())
+        with self.settings(TAREFAS_CORPO_MAXIMO=100):
+            self.enfileirar("inserir-lote/alunos", itens, status=413)
+        self.enfileirar("inserir-lote/alunos", {"matricula": "G"}, status=400)
+        response = self.client.post(f"{self.base}inserir-lote/alunos", "[{", content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+        tarefas.processar()
+        self.assertEqual(TbAlunos.objects.filter(matricula__startswith="G").count(), 50)
+
+    def test_csv_recusado_ou_fila_cheia_nao_deixa_arquivo(self):
+        arquivo = {"arquivo": StringIO("matricula,nome\nI1,Importado\n")}
+        with self.settings(TAREFAS_FILA_MAXIMA=0):
+            response = self.client.post(f"{self.base}importar-csv/alunos", arquivo)
+            self.assertEqual(response.status_code, 503)
+        response = self.client.post(f"{self.base}importar-csv/alunos", {"arquivo": BytesIO(b"nome\n\xff\n")})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(self.pasta.iterdir()), [])
+
+    def test_reserva_exclusiva_e_interrompidas(self):
+        tarefa = tarefas.enfileirar("deletar_alunos", "[]")
+        self.assertIsNotNone(tarefas.reservar(tarefa.id))
+        self.assertIsNone(tarefas.reservar(tarefa.id))
+        self.assertEqual(tarefas.recuperar_interrompidas(), 0)
+        with self.settings(TAREFAS_TEMPO_SEM_PROGRESSO=-1):
+            self.assertEqual(tarefas.recuperar_interrompidas(), 1)
+        self.assertEqual(self.consultar(tarefa.id)["estado"], "erro")
+        self.assertEqual(self.client.get(f"{self.base}0").status_code, 404)
+
+    def test_pool_do_servidor_acionado_depois_do_commit(self):
+        with self.settings(TAREFAS_EXECUTAR_NO_PROCESSO=True), mock.patch.object(tarefas, "_pool") as pool:
+            with self.captureOnCommitCallbacks(execute=True):
+                tarefa = self.enfileirar("deletar-alunos", [1]).json()
+                pool.return_value.submit.assert_not_called()
+        pool.return_value.submit.assert_called_once_with(tarefas._executar_em_thread, tarefa["id"])
+
+    def test_tarefas_de_um_processo_anterior_nao_travam_a_fila(self):
+        antiga = timezone.now() - timedelta(hours=1)
+        TbTarefas.objects.create(tipo="deletar_alunos", entrada="[]", estado=TbTarefas.EXECUTANDO,
+                                 iniciada_em=antiga, atualizada_em=antiga)
+        with self.settings(TAREFAS_FILA_MAXIMA=1):
+            # A parada sem progresso não conta para o limite.
+            pendente = self.enfileirar("deletar-alunos", [1]).json()
+            self.enfileirar("deletar-alunos", [2], status=503)
+            # Com o pool do servidor, a primeira tarefa do processo retoma a pendente.
+            with self.settings(TAREFAS_EXECUTAR_NO_PROCESSO=True), mock.patch.object(tarefas, "_retomadas", False), \
+                    mock.patch.object(tarefas, "_pool") as pool:
+                self.enfileirar("deletar-alunos", [2], status=503)
+        pool.return_value.submit.assert_called_once_with(tarefas._executar_em_thread, pendente["id"])
+        self.assertEqual(TbTarefas.objects.filter(estado=TbTarefas.ERRO).count(), 1)
+
+
+class ExportacaoAlunosTests(TestCase):
+    base = "/api/v1/cadastro_aluno/exportar-alunos"
+
+    @classmethod
+    def setUpTestData(cls):
+        sp, rj = TbEnderecos.objects.bulk_create([
+            TbEnderecos(cep="01000-000", endereco="Rua A", cidade="São Paulo", estado="SP", regiao="Sudeste"),
+            TbEnderecos(cep="20000-000", endereco="Rua B", cidade="Rio de Janeiro", estado="RJ"),
+        ])
+        cls.alunos = TbAlunos.objects.bulk_create(
+            TbAlunos(matricula=f"X{i}", nome=f"Aluno {i}", endereco=[sp, rj, None][i % 3]) for i in range(250)
+        )
+        disciplina = TbDisciplinas.objects.create(disciplina="Cálculo", carga=60, semestre=2)
+        TbNotas.objects.bulk_create(TbNotas(aluno=aluno, disciplina=disciplina, nota=7) for aluno in cls.alunos[:4])
+
+    def exportar(self, **parametros):
+        response = self.client.get(self.base, parametros)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def ndjson(self, **parametros):
+        corpo = b"".join(self.exportar(formato="ndjson", **parametros).streaming_content)
+        return [json.loads(linha) for linha in corpo.splitlines()]
+
+    def test_csv_com_endereco_juntado(self):
+        response = self.exportar()
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="alunos.csv"')
+        linhas = list(csv.reader(StringIO(b"".join(response.streaming_content).decode())))
+        self.assertEqual(linhas[0], [nome for nome, _ in exportacao.COLUNAS])
+        self.assertEqual(len(linhas), 251)
+        primeiro, sem_endereco = dict(zip(linhas[0], linhas[1])), dict(zip(linhas[0], linhas[3]))
+        self.assertEqual((primeiro["matricula"], primeiro["cep"], primeiro["regiao"]), ("X0", "01000-000", "Sudeste"))
+        self.assertEqual((sem_endereco["endereco_id"], sem_endereco["cidade"]), ("", ""))
+
+    def test_ndjson_e_filtros(self):
+        linhas = self.ndjson(estado="sp")
+        self.assertEqual(len(linhas), 84)
+        self.assertEqual({linha["estado"] for linha in linhas}, {"SP"})
+        self.assertEqual(list(linhas[0]), [nome for nome, _ in exportacao.COLUNAS])
+        self.assertEqual([linha["matricula"] for linha in self.ndjson(semestre=2)], ["X0", "X1", "X2", "X3"])
+        self.assertEqual([linha["matricula"] for linha in self.ndjson(estado="RJ", semestre=2)], ["X1"])
+        self.assertIsNone(self.ndjson(semestre=2)[2]["cep"])
+
+    @skipUnless(importlib.util.find_spec("pyarrow"), "requer o pyarrow")
+    def test_parquet_igual_ao_ndjson(self):
+        import pyarrow.parquet
+
+        with self.settings(STREAMING_CHUNK_SIZE=100):
+            response = self.exportar(formato="parquet")
+            arquivo = pyarrow.parquet.ParquetFile(BytesIO(b"".join(response.streaming_content)))
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="alunos.parquet"')
+        # Um row group por bloco lido do banco.
+        self.assertEqual(arquivo.metadata.num_row_groups, 3)
+        self.assertEqual(arquivo.read().to_pylist(), self.ndjson())
+
+    def test_formato_invalido_ou_sem_pyarrow(self):
+        response = self.client.get(self.base, {"formato": "xlsx"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("xlsx", response.json()["mensagem"])
+        with mock.patch.dict("sys.modules", {"pyarrow": None}):
+            response = self.client.get(self.base, {"formato": "parquet"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("pyarrow", response.json()["mensagem"])
+
+    def test_exportacao_grande_em_blocos_por_keyset(self):
+        with self.settings(STREAMING_CHUNK_SIZE=100), CaptureQueriesContext(connection) as consultas:
+            pedacos = list(self.exportar().streaming_content)
+        # Cabeçalho + um pedaço por bloco de 100 alunos.
+        self.assertEqual(len(pedacos), 4)
+        self.assertEqual(sum(pedaco.count(b"\n") for pedaco in pedacos), 251)
+        selects = [c["sql"] for c in consultas if c["sql"].startswith("SELECT") and "tb_alunos" in c["sql"]]
+        # 3 blocos e a consulta vazia do fim, todas com LIMIT e nenhuma com OFFSET.
+        self.assertEqual(len(selects), 4)
+        self.assertTrue(all("LIMIT 100" in sql and "OFFSET" not in sql for sql in selects))
+        self.assertTrue(all("LEFT OUTER JOIN" in sql for sql in selects))
+
+    def test_comando_grava_o_arquivo(self):
+        with tempfile.TemporaryDirectory() as pasta:
+            destino = Path(pasta) / "alunos.ndjson"
+            saida = StringIO()
+            call_command("exportar_alunos", "--formato", "ndjson", "--estado", "RJ", "--saida", str(destino), stdout=saida)
+            linhas = destino.read_bytes().splitlines()
+        self.assertEqual(len(linhas), 83)
+        self.assertIn("bytes gravados", saida.getvalue())
+        with self.assertRaises(CommandError):
+            call_command("exportar_alunos", "--formato", "parquet", stdout=StringIO())
+
+
+class ImportacaoCsvTests(TestCase):
+    def test_celula_vazia_nao_apaga_o_valor_gravado(self):
+        endereco = TbEnderecos.objects.create(cep="01000-000", endereco="Rua A", cidade="São Paulo", estado="SP")
+        TbAlunos.objects.create(matricula="1", nome="Antigo", email="antigo@escola.com", endereco=endereco)
+        TbAlunos.objects.create(matricula="2", nome="Outro", email="outro@escola.com")
+        csv = ("matricula,nome,email,cep\n"
+               "1,Novo,,\n"
+               "2,Outro,novo@escola.com,01000-000\n"
+               "3,Criado,,\n"
+               "2,Outro,,\n")
+        resultado = importacao.importar_csv(StringIO(csv), "alunos")
+        self.assertEqual((resultado["gravadas"], resultado["rejeitadas"]), (4, 0))
+        alunos = {a.matricula: (a.nome, a.email, a.endereco_id) for a in TbAlunos.objects.all()}
+        self.assertEqual(alunos, {
+            "1": ("Novo", "antigo@escola.com", endereco.id),
+            "2": ("Outro", "novo@escola.com", endereco.id),
+            "3": ("Criado", None, None),
+        })
+
+
+class PerfilRequisicoesTests(TestCase):
+    rota = "/api/v1/cadastro_aluno/disciplinas"
+
+    def setUp(self):
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        ajustes = self.settings(PERFIL_TOKEN="segredo", PERFIL_DIRETORIO=pasta.name, PERFIL_MAXIMO=2)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def perfilar(self, modo):
+        response = self.client.get(self.rota, headers={"X-Perfil": "segredo", "X-Perfil-Modo": modo})
+        self.assertEqual(response.status_code, 200)
+        return response["X-Perfil-Id"]
+
+    def baixar(self, perfil_id, formato, token="segredo"):
+        return self.client.get(f"/api/v1/perfis/{perfil_id}/{formato}", headers={"X-Perfil": token})
+
+    def test_so_com_token_ou_amostragem(self):
+        self.assertNotIn("X-Perfil-Id", self.client.get(self.rota))
+        self.assertNotIn("X-Perfil-Id", self.client.get(self.rota, headers={"X-Perfil": "errado"}))
+        with self.settings(PERFIL_AMOSTRAGEM=1.0):
+            self.assertIn("X-Perfil-Id", self.client.get(self.rota))
+            self.assertNotIn("X-Perfil-Id", self.client.get("/api/v1/metrics"))
+        with self.settings(PERFIL_TOKEN=None):
+            self.assertNotIn("X-Perfil-Id", self.client.get(self.rota, headers={"X-Perfil": ""}))
+
+    def test_pstats_e_collapsed_nos_dois_modos(self):
+        # O handler passa 50 ms dormindo: é o que tem que aparecer no topo.
+        lento = mock.patch("cadastro_aluno.api.cache_disciplinas.obter", side_effect=lambda *a, **k: time.sleep(0.05) or [])
+        with lento:
+            ids = [self.perfilar("deterministico"), self.perfilar("amostragem")]
+        for perfil_id in ids:
+            with tempfile.NamedTemporaryFile(suffix=".pstats") as arquivo:
+                arquivo.write(b"".join(self.baixar(perfil_id, "pstats").streaming_content))
+                arquivo.flush()
+                estatisticas_perfil = pstats.Stats(arquivo.name)
+            funcoes = {nome for _, _, nome in estatisticas_perfil.stats}
+            self.assertIn("listar_disciplinas", funcoes)
+
+            collapsed = b"".join(self.baixar(perfil_id, "collapsed").streaming_content).decode()
+            pilha, microssegundos = collapsed.splitlines()[0].rsplit(" ", 1)
+            self.assertIn("listar_disciplinas (cadastro_aluno/api.py:", pilha)
+            self.assertTrue(pilha.split(";")[-1].startswith("<lambda> (cadastro_aluno/tests.py:"))
+            self.assertGreater(int(microssegundos), 10000)
+
+    def test_buffer_circular_lista_e_acesso(self):
+        ids = [self.perfilar("amostragem") for _ in range(3)]
+        response = self.client.get("/api/v1/perfis", headers={"X-Perfil": "segredo"})
+        perfis = response.json()
+        self.assertEqual([p["id"] for p in perfis], ids[:0:-1])
+        self.assertEqual((perfis[0]["rota"], perfis[0]["status"], perfis[0]["modo"]),
+                         ("listar_disciplinas", 200, "amostragem"))
+        self.assertEqual(self.baixar(ids[0], "pstats").status_code, 404)
+        self.assertEqual(self.baixar(ids[2], "json").status_code, 404)
+        self.assertEqual(self.baixar("../../etc", "pstats").status_code, 404)
+        self.assertEqual(self.baixar(ids[2], "pstats", token="errado").status_code, 403)
+        self.assertEqual(self.client.get("/api/v1/perfis").status_code, 403)
+
+    def test_falha_ao_gravar_nao_derruba_a_resposta(self):
+        with mock.patch.object(perfilador, "_gravar", side_effect=OSError("disco cheio")), \
+                self.assertLogs("core.perfilador", "ERROR"):
+            response = self.client.get(self.rota, headers={"X-Perfil": "segredo"})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("X-Perfil-Id", response)
+
+    def test_perfil_descartado_antes_de_abrir(self):
+        perfil_id = self.perfilar("amostragem")
+        caminho = perfilador.arquivo(perfil_id, "pstats")
+        with mock.patch.object(perfilador, "arquivo", return_value=caminho):
+            caminho.unlink()
+            self.assertEqual(self.baixar(perfil_id, "pstats").status_code, 404)
@@ -0,0 +1,233 @@
+"""
+Controle de admissão das rotas da API (settings.ADMISSAO_*).
+
+Antes de chegar ao handler, cada requisição das rotas sob ADMISSAO_PREFIXO é
+classificada em uma das classes de ADMISSAO_CLASSES:
+    escrita     POST/PUT/PATCH/DELETE
+    varredura   GETs caros (rotas listadas em ADMISSAO_VARREDURAS)
+    leitura     os demais GETs
+
+e precisa passar por dois limites da classe:
+  - balde de fichas por cliente (TAXA por segundo, até RAJADA acumuladas):
+    sem ficha, responde 429 na hora;
+  - concorrência máxima da classe no processo (CONCORRENCIA), esperando no
+    máximo ESPERA segundos por uma vaga: sem vaga, responde 503.
+As duas respostas levam Retry-After, para o cliente saber quando voltar.
+
+O cliente é identificado pelo IP da conexão ou, atrás de um proxy
+confiável, pelo cabeçalho de ADMISSAO_CABECALHO_CLIENTE; nunca pelo
+X-Cliente-Id, que o próprio cliente escolhe e trocaria a cada 429. Sob ASGI
+a vaga da classe não espera: process_view roda na thread compartilhada das
+partes síncronas, e esperar nela pararia todas as requisições. Os
+baldes ficam na memória do processo; com ADMISSAO_CACHE apontando para um
+cache compartilhado (ex: Redis) o limite por cliente passa a valer para
+todos os servidores, contado em janelas fixas de RAJADA / TAXA segundos. A
+concorrência é sempre por processo.
+"""
+import math
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse
+
+from core.metricas import _rotulos, registro
+
+METODOS_LEITURA = {"GET", "HEAD", "OPTIONS"}
+
+
+class BaldesFichas:
+    """
+    Baldes de fichas em memória, um por (classe, cliente).
+    """
+
+    def __init__(self, maximo_clientes=10000):
+        self.maximo_clientes = maximo_clientes
+        self._baldes = {}  # (classe, cliente) -> [fichas, instante]
+        self._lock = threading.Lock()
+
+    def retirar(self, classe, cliente, taxa, rajada):
+        """
+        Retira uma ficha; devolve 0 se conseguiu ou os segundos até a
+        próxima ficha.
+        """
+        agora = time.monotonic()
+        with self._lock:
+            balde = self._baldes.get((classe, cliente))
+            if balde is None:
+                if len(self._baldes) >= self.maximo_clientes:
+                    self._descartar_cheios(agora, taxa, rajada)
+                balde = self._baldes[(classe, cliente)] = [rajada, agora]
+            else:
+                balde[0] = min(rajada, balde[0] + (agora - balde[1]) * taxa)
+                balde[1] = agora
+            if balde[0] >= 1:
+                balde[0] -= 1
+                return 0
+            return (1 - balde[0]) / taxa
+
+    def _descartar_cheios(self, agora, taxa, rajada):
+        # Baldes que já se encheram de novo equivalem a um balde novo.
+        cheios = [k for k, (fichas, instante) in self._baldes.items()
+                  if fichas + (agora - instante) * taxa >= rajada]
+        for chave in cheios or list(self._baldes)[: len(self._baldes) // 2]:
+            del self._baldes[chave]
+
+
+def _retirar_no_cache(cache, classe, cliente, taxa, rajada):
+    # Janela fixa: até RAJADA requisições a cada RAJADA / TAXA segundos. O
+    # add + incr é atômico nos caches compartilhados (Redis, memcached).
+    janela = rajada / taxa
+    agora = time.time()
+    inicio = int(agora // janela)
+    chave = f"admissao:{classe}:{cliente}:{inicio}"
+    cache.add(chave, 0, timeout=math.ceil(janela) + 1)
+    try:
+        usadas = cache.incr(chave)
+    except ValueError:  # expirou entre o add e o incr
+        cache.add(chave, 1, timeout=math.ceil(janela) + 1)
+        usadas = 1
+    if usadas <= rajada:
+        return 0
+    return (inicio + 1) * janela - agora
+
+
+class _Estado:
+    def __init__(self):
+        self.baldes = BaldesFichas()
+        self._semaforos = {}
+        self._lock = threading.Lock()
+        self.em_andamento = {}
+        self.rejeitadas = {}
+
+    def semaforo(self, classe, limite):
+        with self._lock:
+            atual = self._semaforos.get(classe)
+            if atual is None or atual[0] != limite:
+                atual = self._semaforos[classe] = (limite, threading.BoundedSemaphore(limite))
+            return atual[1]
+
+    def contar(self, contador, chave, valor=1):
+        with self._lock:
+            contador[chave] = contador.get(chave, 0) + valor
+
+
+estado = _Estado()
+
+
+def identificar_cliente(request):
+    """
+    O IP da conexão ou, com ADMISSAO_CABECALHO_CLIENTE, o último endereço
+    desse cabeçalho (o acrescentado pelo proxy; os anteriores vêm do cliente).
+    """
+    cabecalho = settings.ADMISSAO_CABECALHO_CLIENTE
+    if cabecalho:
+        enderecos = request.headers.get(cabecalho, "").rsplit(",", 1)
+        if enderecos[-1].strip():
+            return enderecos[-1].strip()
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def classificar(request, url_name):
+    if request.method not in METODOS_LEITURA:
+        return "escrita"
+    if url_name in settings.ADMISSAO_VARREDURAS:
+        return "varredura"
+    return "leitura"
+
+
+def _recusar(status, mensagem, segundos):
+    response = JsonResponse({"mensagem": mensagem}, status=status)
+    response["Retry-After"] = str(max(1, math.ceil(segundos)))
+    return response
+
+
+class AdmissaoMiddleware:
+    """
+    Aplica os limites em process_view (quando a rota já foi resolvida) e
+    libera a vaga da classe ao fim da resposta; em streaming, só quando o
+    corpo termina de ser enviado.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.assincrono = iscoroutinefunction(get_response)
+        if self.assincrono:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self._liberar_ao_fim(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self._liberar_ao_fim(request, await self.get_response(request))
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not settings.ADMISSAO_ATIVA or not request.path.startswith(settings.ADMISSAO_PREFIXO):
+            return None
+        classe = classificar(request, request.resolver_match.url_name)
+        limites = settings.ADMISSAO_CLASSES[classe]
+
+        cliente = identificar_cliente(request)
+        if settings.ADMISSAO_CACHE:
+            espera = _retirar_no_cache(caches[settings.ADMISSAO_CACHE], classe, cliente,
+                                       limites["TAXA"], limites["RAJADA"])
+        else:
+            espera = estado.baldes.retirar(classe, cliente, limites["TAXA"], limites["RAJADA"])
+        if espera:
+            estado.contar(estado.rejeitadas, (classe, "429"))
+            return _recusar(429, "Muitas requisições; tente novamente mais tarde.", espera)
+
+        semaforo = estado.semaforo(classe, limites["CONCORRENCIA"])
+        if self.assincrono:
+            admitida = semaforo.acquire(blocking=False)
+        else:
+            admitida = semaforo.acquire(timeout=limites.get("ESPERA", 0))
+        if not admitida:
+            estado.contar(estado.rejeitadas, (classe, "503"))
+            return _recusar(503, "Servidor ocupado; tente novamente em instantes.", settings.ADMISSAO_RETRY_503)
+        estado.contar(estado.em_andamento, classe)
+
+        liberado = False
+
+        def liberar():
+            nonlocal liberado
+            if not liberado:
+                liberado = True
+                estado.contar(estado.em_andamento, classe, -1)
+                semaforo.release()
+
+        request._admissao_liberar = liberar
+        return None
+
+    def _liberar_ao_fim(self, request, response):
+        liberar = getattr(request, "_admissao_liberar", None)
+        if liberar is None:
+            return response
+        if response.streaming:
+            # O servidor chama response.close() ao terminar de enviar o
+            # corpo (ou quando o cliente desconecta).
+            response._resource_closers.append(liberar)
+        else:
+            liberar()
+        return response
+
+
+def linhas_metricas():
+    linhas = ["# TYPE admissao_em_andamento gauge"]
+    linhas.extend(f"admissao_em_andamento{{{_rotulos(classe=c)}}} {n}" for c, n in sorted(estado.em_andamento.items()))
+    linhas.append("# TYPE admissao_rejeitadas_total counter")
+    linhas.extend(
+        f"admissao_rejeitadas_total{{{_rotulos(classe=c, status=s)}}} {n}"
+        for (c, s), n in sorted(estado.rejeitadas.items())
+    )
+    return linhas
+
+
+registro.adicionar_coletor(linhas_metricas)
@@ -5,6 +5,17 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Execução com uvicorn (modo ASGI):
+
+    uv sync --extra asgi
+    uv run uvicorn core.asgi:application --host 0.0.0.0 --port 8000 --workers 4
+
+Os endpoints async ficam em /api/v1/cadastro_aluno/async/ e usam o ORM
+assíncrono (aget, acreate, aupdate, iteração async). Os endpoints síncronos
+continuam em /api/v1/cadastro_aluno/ e também funcionam sob ASGI, mas cada
+chamada ocupa uma thread do pool do sync_to_async. Para comparar os dois
+caminhos: python benchmarks/wsgi_vs_asgi.py
 """
 
 import os
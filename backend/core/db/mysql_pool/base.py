@@ -0,0 +1,15 @@
+"""
+Backend MySQL do Django com pool de conexões (ver core/db/pool.py).
+
+    DATABASES = {'default': {'ENGINE': 'core.db.mysql_pool', ..., 'POOL': {...}}}
+"""
+from django.db.backends.mysql import base
+
+from core.db.pool import PoolMixin
+
+
+class DatabaseWrapper(PoolMixin, base.DatabaseWrapper):
+    def _validar_conexao(self, conexao):
+        # Uma ida e volta ao servidor; falha se a conexão caiu (wait_timeout,
+        # restart do MySQL) e então o pool a descarta e abre outra.
+        conexao.ping()
@@ -0,0 +1,284 @@
+"""
+Pool de conexões por processo para os backends de banco do Django.
+
+O Django abre uma conexão nova a cada requisição quando CONN_MAX_AGE é 0 e
+a fecha no fim dela; com MySQL o handshake (TCP + autenticação) acaba
+custando mais que as consultas curtas da API. Os backends em core/db/
+(mysql_pool, e sqlite_pool para testes locais) trocam o "abrir" e o
+"fechar" do Django por "pegar do pool" e "devolver ao pool".
+
+Configuração, em DATABASES[alias]['POOL'] (todas opcionais):
+    TAMANHO_MAXIMO   conexões abertas no máximo por processo (padrão 10)
+    TEMPO_ESPERA     segundos esperando uma conexão livre antes de falhar (padrão 10)
+    IDADE_MAXIMA     segundos até a conexão ser reciclada (padrão 1800; None = nunca)
+    VERIFICAR_APOS   conexões paradas há mais que isso são testadas (ping) antes
+                     de serem entregues (padrão 1; 0 = testar sempre)
+
+As estatísticas de cada pool saem no /api/v1/metrics (ver linhas_metricas).
+"""
+import os
+import threading
+import time
+from collections import deque
+
+from core.metricas import _rotulos, registro
+
+
+class PoolEsgotado(Exception):
+    pass
+
+
+class _Entrada:
+    __slots__ = ("conexao", "criada_em", "devolvida_em")
+
+    def __init__(self, conexao):
+        self.conexao = conexao
+        self.criada_em = self.devolvida_em = time.monotonic()
+
+
+class Pool:
+    """
+    Pool limitado de conexões DB-API.
+
+    'criar' abre uma conexão nova; 'validar' recebe uma conexão e levanta
+    exceção (ou devolve False) se ela não estiver utilizável. As conexões
+    livres são reutilizadas na ordem LIFO: a mais recente tem mais chance de
+    ainda estar viva e as antigas ficam paradas até serem recicladas.
+    """
+
+    def __init__(self, criar, validar=None, tamanho_maximo=10, tempo_espera=10.0,
+                 idade_maxima=1800.0, verificar_apos=1.0, nome="default"):
+        self.criar = criar
+        self.validar = validar
+        self.tamanho_maximo = tamanho_maximo
+        self.tempo_espera = tempo_espera
+        self.idade_maxima = idade_maxima
+        self.verificar_apos = verificar_apos
+        self.nome = nome
+        self._condicao = threading.Condition()
+        self._livres = deque()
+        self._em_uso = {}  # id(conexao) -> _Entrada
+        self._abertas = 0
+        self.contadores = {
+            "retiradas": 0, "criadas": 0, "recicladas": 0, "descartadas": 0,
+            "esperas": 0, "tempo_espera": 0.0, "esgotamentos": 0,
+        }
+
+    def _fechar(self, entrada, motivo):
+        # Chamado com o lock; o close em si é rápido (não espera o servidor).
+        self._abertas -= 1
+        self.contadores[motivo] += 1
+        try:
+            entrada.conexao.close()
+        except Exception:
+            pass
+
+    def _saudavel(self, entrada, agora):
+        if self.idade_maxima is not None and agora - entrada.criada_em > self.idade_maxima:
+            return "recicladas"
+        if self.validar is not None and agora - entrada.devolvida_em >= self.verificar_apos:
+            try:
+                if self.validar(entrada.conexao) is False:
+                    return "descartadas"
+            except Exception:
+                return "descartadas"
+        return None
+
+    def obter(self):
+        """
+        Entrega uma conexão livre (testada, se ficou parada) ou abre uma nova;
+        com o pool cheio espera até TEMPO_ESPERA e então levanta PoolEsgotado.
+        """
+        limite = None
+        with self._condicao:
+            self.contadores["retiradas"] += 1
+            while True:
+                agora = time.monotonic()
+                while self._livres:
+                    entrada = self._livres.pop()
+                    motivo = self._saudavel(entrada, agora)
+                    if motivo is None:
+                        self._em_uso[id(entrada.conexao)] = entrada
+                        return entrada.conexao
+                    self._fechar(entrada, motivo)
+                if self._abertas < self.tamanho_maximo:
+                    self._abertas += 1  # reserva a vaga; a conexão é aberta fora do lock
+                    break
+                if limite is None:
+                    limite = agora + self.tempo_espera
+                    self.contadores["esperas"] += 1
+                restante = limite - agora
+                if restante <= 0:
+                    self.contadores["esgotamentos"] += 1
+                    raise PoolEsgotado(
+                        f"Nenhuma conexão livre no pool '{self.nome}' após {self.tempo_espera}s "
+                        f"({self.tamanho_maximo} em uso)."
+                    )
+                inicio_espera = time.monotonic()
+                self._condicao.wait(restante)
+                self.contadores["tempo_espera"] += time.monotonic() - inicio_espera
+
+        try:
+            conexao = self.criar()
+        except Exception:
+            with self._condicao:
+                self._abertas -= 1
+                self._condicao.notify()
+            raise
+        with self._condicao:
+            self.contadores["criadas"] += 1
+            self._em_uso[id(conexao)] = _Entrada(conexao)
+        return conexao
+
+    def devolver(self, conexao, descartar=False):
+        """
+        Devolve a conexão ao pool; com descartar=True (conexão com erro ou em
+        estado incerto) ela é fechada e a vaga liberada.
+        """
+        with self._condicao:
+            entrada = self._em_uso.pop(id(conexao), None)
+            if entrada is None:
+                # Não veio deste pool (ex: pool recriado depois de um fork).
+                try:
+                    conexao.close()
+                except Exception:
+                    pass
+                return
+            if descartar:
+                self._fechar(entrada, "descartadas")
+            else:
+                entrada.devolvida_em = time.monotonic()
+                self._livres.append(entrada)
+            self._condicao.notify()
+
+    def fechar_livres(self):
+        with self._condicao:
+            while self._livres:
+                self._fechar(self._livres.popleft(), "descartadas")
+
+    def estatisticas(self):
+        with self._condicao:
+            return {
+                "nome": self.nome,
+                "tamanho_maximo": self.tamanho_maximo,
+                "abertas": self._abertas,
+                "em_uso": len(self._em_uso),
+                "livres": len(self._livres),
+                **self.contadores,
+            }
+
+
+##################### Pools por processo #################################
+_pools = {}
+_lock_pools = threading.Lock()
+
+
+def pool_para(chave, nome, criar, validar, config):
+    """
+    Pool identificado por 'chave' neste processo. Depois de um fork (ex:
+    workers do gunicorn com --preload) o filho cria o seu: conexões não
+    podem ser compartilhadas entre processos.
+    """
+    pid = os.getpid()
+    with _lock_pools:
+        atual = _pools.get(chave)
+        if atual is None or atual[0] != pid:
+            atual = _pools[chave] = (pid, Pool(
+                criar, validar,
+                tamanho_maximo=config.get("TAMANHO_MAXIMO", 10),
+                tempo_espera=config.get("TEMPO_ESPERA", 10.0),
+                idade_maxima=config.get("IDADE_MAXIMA", 1800.0),
+                verificar_apos=config.get("VERIFICAR_APOS", 1.0),
+                nome=nome,
+            ))
+        return atual[1]
+
+
+def linhas_metricas():
+    """
+    Estado dos pools deste processo no formato do Prometheus.
+    """
+    pools = [pool for pid, pool in _pools.values() if pid == os.getpid()]
+    if not pools:
+        return []
+    estatisticas = [p.estatisticas() for p in pools]
+    series = (
+        ("db_pool_connections_open", "gauge", "abertas"),
+        ("db_pool_connections_in_use", "gauge", "em_uso"),
+        ("db_pool_connections_idle", "gauge", "livres"),
+        ("db_pool_connections_max", "gauge", "tamanho_maximo"),
+        ("db_pool_checkouts_total", "counter", "retiradas"),
+        ("db_pool_connections_created_total", "counter", "criadas"),
+        ("db_pool_connections_recycled_total", "counter", "recicladas"),
+        ("db_pool_connections_discarded_total", "counter", "descartadas"),
+        ("db_pool_waits_total", "counter", "esperas"),
+        ("db_pool_wait_seconds_total", "counter", "tempo_espera"),
+        ("db_pool_exhausted_total", "counter", "esgotamentos"),
+    )
+    linhas = []
+    for nome, tipo, campo in series:
+        linhas.append(f"# TYPE {nome} {tipo}")
+        linhas.extend(f'{nome}{{{_rotulos(pool=e["nome"])}}} {e[campo]}' for e in estatisticas)
+    return linhas
+
+
+registro.adicionar_coletor(linhas_metricas)
+
+
+class PoolMixin:
+    """
+    Mixin para o DatabaseWrapper de um backend do Django: get_new_connection
+    pega do pool e _close devolve. Precisa vir antes do DatabaseWrapper do
+    backend na lista de bases.
+    """
+
+    def _validar_conexao(self, conexao):
+        """
+        Confere que uma conexão parada no pool ainda responde. Vale para
+        qualquer driver DB-API; os backends podem trocar por algo mais
+        barato (ex: o ping do MySQL).
+        """
+        cursor = conexao.cursor()
+        try:
+            cursor.execute("SELECT 1")
+        finally:
+            cursor.close()
+
+    @property
+    def pool(self):
+        # Guardado no wrapper (um por thread e alias) e refeito só quando o
+        # NAME muda: o runner de testes troca o NAME do alias pelo do banco
+        # de teste e não pode receber de volta uma conexão aberta no banco
+        # real. A chave inclui todos os parâmetros de conexão, e não só o alias.
+        nome = self.settings_dict["NAME"]
+        if getattr(self, "_pool_nome", None) != nome:
+            params = self.get_connection_params()
+            chave = (self.alias, repr(sorted(params.items(), key=lambda item: item[0])))
+            self._pool_conexoes = pool_para(
+                chave,
+                nome=f"{self.alias}:{nome}",
+                criar=lambda: super(PoolMixin, self).get_new_connection(params),
+                validar=self._validar_conexao,
+                config=self.settings_dict.get("POOL", {}),
+            )
+            self._pool_nome = nome
+        return self._pool_conexoes
+
+    def get_new_connection(self, conn_params):
+        return self.pool.obter()
+
+    def _close(self):
+        if self.connection is None:
+            return
+        # Conexão fechada no meio de um atomic ou depois de um erro de banco:
+        # o estado dela é incerto, então não volta para o pool.
+        descartar = self.in_atomic_block or (self.errors_occurred and not self.is_usable())
+        if not descartar and (not self.autocommit or self.needs_rollback):
+            try:
+                # Transação deixada aberta fora de um atomic (set_autocommit(False)):
+                # desfeita antes de a conexão voltar ao pool. Em autocommit não
+                # há o que desfazer e a ida ao banco é poupada.
+                self.connection.rollback()
+            except Exception:
+                descartar = True
+        self.pool.devolver(self.connection, descartar=descartar)
@@ -0,0 +1,11 @@
+"""
+Backend SQLite com o mesmo pool do mysql_pool, para exercitar o pool nos
+testes e na máquina de desenvolvimento sem um MySQL.
+"""
+from django.db.backends.sqlite3 import base
+
+from core.db.pool import PoolMixin
+
+
+class DatabaseWrapper(PoolMixin, base.DatabaseWrapper):
+    pass
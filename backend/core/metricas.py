@@ -0,0 +1,189 @@
+"""
+Instrumentação por rota: tempo total, tempo de banco e número de consultas.
+
+O MetricasMiddleware mede cada requisição, devolve o cabeçalho Server-Timing
+e acumula histogramas em memória (por processo), que são expostos no
+formato do Prometheus em /api/v1/metrics (ver core/urls.py).
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+# Medição da requisição em andamento. É uma ContextVar (e não um atributo
+# da conexão) porque sob ASGI as consultas rodam na thread do sync_to_async,
+# que herda o contexto mas tem outra conexão.
+_medicao_atual = ContextVar("medicao_atual", default=None)
+
+
+class _Medicao:
+    __slots__ = ("consultas", "tempo_banco")
+
+    def __init__(self):
+        self.consultas = 0
+        self.tempo_banco = 0.0
+
+
+def _medir_consulta(execute, sql, params, many, context):
+    medicao = _medicao_atual.get()
+    if medicao is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        medicao.tempo_banco += time.perf_counter() - inicio
+        medicao.consultas += 1
+
+
+@receiver(connection_created)
+def _instrumentar_conexao(sender, connection, **kwargs):
+    if _medir_consulta not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_medir_consulta)
+
+
+class Histograma:
+    def __init__(self, limites):
+        self.limites = limites
+        self.contagens = [0] * (len(limites) + 1)  # a última posição é o +Inf
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        self.contagens[bisect_left(self.limites, valor)] += 1
+        self.soma += valor
+        self.total += 1
+
+    def linhas(self, nome, rotulos):
+        acumulado = 0
+        for limite, contagem in zip(self.limites + ["+Inf"], self.contagens):
+            acumulado += contagem
+            yield f'{nome}_bucket{{{rotulos},le="{limite}"}} {acumulado}'
+        yield f"{nome}_sum{{{rotulos}}} {self.soma}"
+        yield f"{nome}_count{{{rotulos}}} {self.total}"
+
+
+class RegistroMetricas:
+    """
+    Acumula as medições por (método, rota) e gera o texto do Prometheus.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rotas = {}
+        self._coletores = []
+
+    def registrar(self, metodo, rota, status, duracao, tempo_banco, consultas):
+        chave = (metodo, rota)
+        with self._lock:
+            dados = self._rotas.get(chave)
+            if dados is None:
+                limites = list(settings.METRICAS_LIMITES_SEGUNDOS)
+                dados = self._rotas[chave] = {
+                    "duracao": Histograma(limites),
+                    "banco": Histograma(limites),
+                    "consultas": Histograma(list(settings.METRICAS_LIMITES_CONSULTAS)),
+                    "status": {},
+                }
+            dados["duracao"].observar(duracao)
+            dados["banco"].observar(tempo_banco)
+            dados["consultas"].observar(consultas)
+            dados["status"][status] = dados["status"].get(status, 0) + 1
+
+    def adicionar_coletor(self, coletor):
+        """
+        Registra uma função que devolve linhas extras no formato do Prometheus
+        (ex: contadores de cache), incluídas em cada exportação.
+        """
+        self._coletores.append(coletor)
+
+    def exportar(self):
+        linhas = []
+        with self._lock:
+            rotas = sorted(self._rotas.items())
+            series = (
+                ("http_request_duration_seconds", "duracao", "histogram", "Tempo total da requisição."),
+                ("http_request_db_duration_seconds", "banco", "histogram", "Tempo gasto em consultas SQL."),
+                ("http_request_db_queries", "consultas", "histogram", "Consultas SQL por requisição."),
+            )
+            for nome, campo, tipo, ajuda in series:
+                linhas.append(f"# HELP {nome} {ajuda}")
+                linhas.append(f"# TYPE {nome} {tipo}")
+                for (metodo, rota), dados in rotas:
+                    linhas.extend(dados[campo].linhas(nome, _rotulos(method=metodo, route=rota)))
+            linhas.append("# HELP http_requests_total Requisições por rota e status.")
+            linhas.append("# TYPE http_requests_total counter")
+            for (metodo, rota), dados in rotas:
+                for status, total in sorted(dados["status"].items()):
+                    linhas.append(f"http_requests_total{{{_rotulos(method=metodo, route=rota, status=status)}}} {total}")
+        for coletor in self._coletores:
+            linhas.extend(coletor())
+        return "\n".join(linhas) + "\n"
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def _rotulos(**valores):
+    return ",".join(f'{chave}="{_escapar(valor)}"' for chave, valor in valores.items())
+
+
+registro = RegistroMetricas()
+
+
+class MetricasMiddleware:
+    """
+    Mede cada requisição e registra em 'registro' pela rota resolvida
+    (ex: "api/v1/cadastro_aluno/aluno-por-id/<aluno_id>").
+    Em respostas em streaming só o tempo até o início da resposta é medido.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Conexões abertas antes deste módulo ser importado (ex: pelo runner de testes).
+        for conexao in connections.all(initialized_only=True):
+            _instrumentar_conexao(sender=None, connection=conexao)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        medicao = _Medicao()
+        token = _medicao_atual.set(medicao)
+        inicio = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _medicao_atual.reset(token)
+        return self._finalizar(request, response, time.perf_counter() - inicio, medicao)
+
+    async def __acall__(self, request):
+        medicao = _Medicao()
+        token = _medicao_atual.set(medicao)
+        inicio = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _medicao_atual.reset(token)
+        return self._finalizar(request, response, time.perf_counter() - inicio, medicao)
+
+    def _finalizar(self, request, response, duracao, medicao):
+        resolver_match = getattr(request, "resolver_match", None)
+        rota = resolver_match.route if resolver_match else "<nao_resolvida>"
+        registro.registrar(request.method, rota, response.status_code, duracao, medicao.tempo_banco, medicao.consultas)
+        response["Server-Timing"] = (
+            f"app;dur={duracao * 1000:.1f}, "
+            f'db;dur={medicao.tempo_banco * 1000:.1f};desc="{medicao.consultas} consultas"'
+        )
+        return response
@@ -0,0 +1,309 @@
+"""
+Perfil de requisições sob demanda (settings.PERFIL_*).
+
+Uma requisição das rotas sob PERFIL_PREFIXO é perfilada quando:
+  - traz o cabeçalho X-Perfil com o valor de PERFIL_TOKEN, ou
+  - cai na amostragem aleatória (PERFIL_AMOSTRAGEM).
+O modo vem do cabeçalho X-Perfil-Modo ou de PERFIL_MODO:
+    deterministico   cProfile: todas as chamadas, com custo alto por chamada;
+    amostragem       uma thread lê a pilha da requisição a cada
+                     PERFIL_INTERVALO segundos: custo baixo, resultado estatístico.
+
+Cada perfil é gravado em PERFIL_DIRETORIO em dois formatos:
+    <id>.pstats      para pstats/snakeviz (python -m pstats <arquivo>); na
+                     amostragem, montado a partir das amostras;
+    <id>.collapsed   pilhas "a;b;c microssegundos", para flamegraph.pl/speedscope;
+                     sempre das amostras, já que o cProfile só guarda pares
+                     chamador -> chamado (no modo determinístico os tempos
+                     incluem o custo do próprio cProfile);
+mais um <id>.json com a rota, o status e a duração. O diretório é um buffer
+circular: passando de PERFIL_MAXIMO perfis, os mais antigos são apagados.
+A resposta perfilada leva o cabeçalho X-Perfil-Id.
+
+Só requisições síncronas (WSGI) são perfiladas; sob ASGI o middleware não
+faz nada. Em respostas em streaming só a montagem da resposta entra no perfil.
+Um erro ao gravar o perfil (disco cheio, diretório sem permissão) vai para o
+log e a resposta segue sem o X-Perfil-Id.
+"""
+import cProfile
+import hmac
+import json
+import logging
+import marshal
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+MODOS = ("deterministico", "amostragem")
+FORMATOS = {"pstats": "application/octet-stream", "collapsed": "text/plain; charset=utf-8"}
+ID_VALIDO = re.compile(r"^[0-9]+-[0-9a-f]{8}$")
+
+# Só um cProfile pode estar ativo por processo (o Python recusa o segundo):
+# requisições simultâneas pedindo o modo determinístico caem na amostragem.
+_deterministico = threading.Lock()
+
+
+def token_valido(request):
+    token = settings.PERFIL_TOKEN
+    enviado = request.headers.get("X-Perfil", "")
+    return bool(token) and hmac.compare_digest(enviado.encode(), token.encode())
+
+
+def modo_pedido(request):
+    """
+    O modo em que a requisição deve ser perfilada, ou None.
+    """
+    if not request.path.startswith(settings.PERFIL_PREFIXO):
+        return None
+    if token_valido(request):
+        modo = request.headers.get("X-Perfil-Modo", settings.PERFIL_MODO)
+        return modo if modo in MODOS else settings.PERFIL_MODO
+    if settings.PERFIL_AMOSTRAGEM and random.random() < settings.PERFIL_AMOSTRAGEM:
+        return settings.PERFIL_MODO
+    return None
+
+
+##################### Amostragem de pilhas #################################
+def _funcao(codigo):
+    # Mesma chave que o cProfile usa para funções Python: (arquivo, linha, nome).
+    return (codigo.co_filename, codigo.co_firstlineno, codigo.co_name)
+
+
+class Amostrador:
+    """
+    Lê, a cada 'intervalo' segundos, a pilha da thread atual e conta quantas
+    vezes cada pilha (da raiz para a folha) apareceu. As pilhas começam
+    logo abaixo do frame de quem criou o Amostrador (sem o servidor e os
+    middlewares de cima).
+    """
+
+    def __init__(self, intervalo):
+        self.thread_id = threading.get_ident()
+        self.base = sys._getframe(1)
+        self.intervalo = intervalo
+        self.pilhas = Counter()
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._amostrar, name="perfil-amostrador", daemon=True)
+
+    def _amostrar(self):
+        while not self._parar.wait(self.intervalo):
+            frame = sys._current_frames().get(self.thread_id)
+            pilha = []
+            while frame is not None and frame is not self.base:
+                pilha.append(_funcao(frame.f_code))
+                frame = frame.f_back
+            if pilha:
+                self.pilhas[tuple(reversed(pilha))] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        self._thread.join()
+
+
+def stats_das_pilhas(pilhas, duracao):
+    """
+    Monta, a partir das amostras, um dicionário no formato do pstats
+    {funcao: (cc, nc, tt, ct, chamadores)}. As "chamadas" são amostras e os
+    tempos são a fração das amostras vezes a duração da requisição.
+    """
+    total = sum(pilhas.values())
+    por_amostra = duracao / total if total else 0.0
+    stats = {}
+    for pilha, n in pilhas.items():
+        tempo = n * por_amostra
+        vistas = set()
+        for i, funcao in enumerate(pilha):
+            folha = i == len(pilha) - 1
+            dados = stats.setdefault(funcao, [0, 0, 0.0, 0.0, {}])
+            dados[1] += n
+            if folha:
+                dados[2] += tempo
+            # Numa recursão a função aparece mais de uma vez na pilha, mas o
+            # tempo acumulado dela conta uma vez só (como as chamadas
+            # "primitivas" do cProfile).
+            if funcao not in vistas:
+                dados[0] += n
+                dados[3] += tempo
+                vistas.add(funcao)
+            if i:
+                aresta = dados[4].setdefault(pilha[i - 1], [0, 0, 0.0, 0.0])
+                aresta[0] += n
+                aresta[1] += n
+                aresta[2] += tempo if folha else 0.0
+                aresta[3] += tempo
+    return {
+        funcao: (cc, nc, tt, ct, {chamador: tuple(v) for chamador, v in chamadores.items()})
+        for funcao, (cc, nc, tt, ct, chamadores) in stats.items()
+    }
+
+
+##################### Formato collapsed #################################
+def _rotulo(funcao):
+    arquivo, linha, nome = funcao
+    # Caminho a partir do projeto ou do site-packages, para rótulos curtos.
+    for raiz in (str(settings.BASE_DIR) + os.sep, "site-packages" + os.sep):
+        if raiz in arquivo:
+            arquivo = arquivo.split(raiz, 1)[1]
+            break
+    return f"{nome} ({arquivo}:{linha})".replace(";", ",")
+
+
+def formato_collapsed(pilhas):
+    linhas = []
+    for pilha, segundos in sorted(pilhas.items(), key=lambda item: -item[1]):
+        microssegundos = round(segundos * 1_000_000)
+        if microssegundos:
+            linhas.append(f"{';'.join(_rotulo(f) for f in pilha)} {microssegundos}")
+    return "\n".join(linhas) + "\n"
+
+
+##################### Buffer circular em disco #################################
+def diretorio():
+    caminho = Path(settings.PERFIL_DIRETORIO)
+    caminho.mkdir(parents=True, exist_ok=True)
+    return caminho
+
+
+def _gravar(caminho, conteudo):
+    # Grava em um temporário e renomeia: quem lista nunca vê arquivo pela metade.
+    temporario = caminho.with_name(f".{caminho.name}.tmp")
+    temporario.write_bytes(conteudo)
+    os.replace(temporario, caminho)
+
+
+def salvar(stats, pilhas, metadados):
+    perfil_id = f"{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+    pasta = diretorio()
+    _gravar(pasta / f"{perfil_id}.pstats", marshal.dumps(stats))
+    _gravar(pasta / f"{perfil_id}.collapsed", formato_collapsed(pilhas).encode())
+    # Os metadados por último: um perfil só aparece na lista quando completo.
+    _gravar(pasta / f"{perfil_id}.json", json.dumps({"id": perfil_id, **metadados}).encode())
+    descartar_antigos()
+    return perfil_id
+
+
+def descartar_antigos():
+    ids = sorted(p.stem for p in diretorio().glob("*.json"))
+    for perfil_id in ids[:max(0, len(ids) - settings.PERFIL_MAXIMO)]:
+        for formato in (*FORMATOS, "json"):
+            # Outro processo pode estar apagando o mesmo perfil.
+            (diretorio() / f"{perfil_id}.{formato}").unlink(missing_ok=True)
+
+
+def listar():
+    """
+    Metadados dos perfis gravados, do mais recente para o mais antigo.
+    """
+    perfis = []
+    for caminho in sorted(diretorio().glob("*.json"), reverse=True):
+        try:
+            perfis.append(json.loads(caminho.read_text()))
+        except (OSError, ValueError):
+            continue  # descartado no meio da leitura
+    return perfis
+
+
+def arquivo(perfil_id, formato):
+    """
+    Caminho do perfil no formato pedido, ou None se não existir.
+    """
+    if formato not in FORMATOS or not ID_VALIDO.match(perfil_id):
+        return None
+    caminho = diretorio() / f"{perfil_id}.{formato}"
+    return caminho if caminho.exists() else None
+
+
+##################### Middleware #################################
+class PerfilMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        modo = modo_pedido(request)
+        if modo is None:
+            return self.get_response(request)
+        if modo == "deterministico" and _deterministico.acquire(blocking=False):
+            try:
+                return self._deterministico(request)
+            finally:
+                _deterministico.release()
+        return self._amostragem(request)
+
+    async def __acall__(self, request):
+        # Views assíncronas nunca são perfiladas: o cProfile e o Amostrador
+        # acompanham uma thread, e a requisição passa por várias (o loop de
+        # eventos e as do sync_to_async).
+        return await self.get_response(request)
+
+    def _deterministico(self, request):
+        perfil = cProfile.Profile()
+        inicio = time.perf_counter()
+        with Amostrador(settings.PERFIL_INTERVALO) as amostrador:
+            try:
+                perfil.enable()
+            except ValueError:
+                # Outro profiler já ativo no processo (ex: o servidor rodando sob cProfile).
+                perfil = None
+            try:
+                response = self.get_response(request)
+            finally:
+                if perfil is not None:
+                    perfil.disable()
+        duracao = time.perf_counter() - inicio
+        if perfil is None:
+            return self._salvar(request, response, "amostragem", duracao,
+                                stats_das_pilhas(amostrador.pilhas, duracao), amostrador.pilhas)
+        perfil.create_stats()
+        return self._salvar(request, response, "deterministico", duracao, perfil.stats, amostrador.pilhas)
+
+    def _amostragem(self, request):
+        inicio = time.perf_counter()
+        with Amostrador(settings.PERFIL_INTERVALO) as amostrador:
+            response = self.get_response(request)
+        duracao = time.perf_counter() - inicio
+        return self._salvar(request, response, "amostragem", duracao,
+                            stats_das_pilhas(amostrador.pilhas, duracao), amostrador.pilhas)
+
+    def _salvar(self, request, response, modo, duracao, stats, amostras):
+        total = sum(amostras.values()) or 1
+        pilhas = {pilha: n * duracao / total for pilha, n in amostras.items()}
+        resolver_match = getattr(request, "resolver_match", None)
+        try:
+            perfil_id = salvar(stats, pilhas, {
+                "metodo": request.method,
+                "caminho": request.path,
+                "rota": resolver_match.url_name if resolver_match else None,
+                "status": response.status_code,
+                "modo": modo,
+                "duracao_ms": round(duracao * 1000, 2),
+                "amostras": sum(amostras.values()),
+                "criado_em": time.time(),
+            })
+        except Exception:
+            # O perfil é só diagnóstico: não pode derrubar a resposta.
+            logger.exception("Falha ao gravar o perfil de %s %s", request.method, request.path)
+            return response
+        response["X-Perfil-Id"] = perfil_id
+        return response
@@ -0,0 +1,65 @@
+"""
+Renderização JSON rápida para o NinjaAPI (ver core/urls.py).
+
+Usa o orjson quando instalado (pip install "backend-django[orjson]") e cai
+para o json da biblioteca padrão com o encoder do ninja quando não está.
+
+Também oferece o modo de saída confiável (settings.API_SAIDA_CONFIAVEL):
+rotas de listagem que devolvem linhas do ORM já com exatamente os campos do
+schema de resposta podem pular a validação linha a linha do pydantic e ir
+direto para o encoder (ver saida_confiavel).
+"""
+import json
+from decimal import Decimal
+
+from django.conf import settings
+from django.http import HttpResponse
+from ninja.renderers import BaseRenderer
+from ninja.responses import NinjaJSONEncoder
+
+try:
+    import orjson
+except ImportError:  # dependência opcional
+    orjson = None
+
+_encoder_padrao = NinjaJSONEncoder()
+
+
+def _converter(valor):
+    # Decimal sai como número, igual ao que os schemas (campos float) já fazem
+    # nas rotas validadas; o resto (UUID, datas com fuso, modelos pydantic)
+    # segue as regras do encoder do ninja.
+    if isinstance(valor, Decimal):
+        return float(valor)
+    return _encoder_padrao.default(valor)
+
+
+def dumps(dados):
+    """
+    Serializa 'dados' para bytes JSON (UTF-8).
+    """
+    if orjson is not None:
+        return orjson.dumps(dados, default=_converter, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(dados, default=_converter, ensure_ascii=False).encode()
+
+
+class RendererRapido(BaseRenderer):
+    media_type = "application/json"
+
+    def render(self, request, data, *, response_status):
+        return dumps(data)
+
+
+def saida_confiavel(dados):
+    """
+    Com settings.API_SAIDA_CONFIAVEL ligado, devolve uma HttpResponse já
+    serializada, que o ninja repassa sem validar com o schema de resposta.
+    Desligado, devolve 'dados' sem mudança e o fluxo normal (com validação)
+    continua.
+
+    Só use em rotas cujas linhas saem do ORM com exatamente os campos e
+    tipos do schema de resposta (ex: .values(*Schema.model_fields)).
+    """
+    if not settings.API_SAIDA_CONFIAVEL:
+        return dados
+    return HttpResponse(dumps(dados), content_type="application/json; charset=utf-8")
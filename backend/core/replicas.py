@@ -0,0 +1,135 @@
+"""
+Leituras nas réplicas, escritas no primário (settings.DATABASE_REPLICAS).
+
+O ReplicasMiddleware marca as requisições GET/HEAD como "podem ler da
+réplica" e o RoteadorReplicas (settings.DATABASE_ROUTERS) manda as leituras
+dessas requisições para uma das réplicas. Todo o resto (escritas, e as
+leituras feitas dentro de um POST/PUT/PATCH/DELETE) fica no 'default'.
+
+Ler o que acabou de escrever: depois de uma escrita com sucesso o cliente
+fica preso ao primário por REPLICA_FIXAR_SEGUNDOS, tempo que deve cobrir o
+atraso da replicação. O cliente é identificado pelo cabeçalho X-Cliente-Id
+ou, sem ele, pelo IP. A marca fica no cache 'default'; com vários servidores
+ele precisa ser compartilhado (ex: Redis), senão a fixação só vale no
+processo que atendeu a escrita.
+"""
+import hashlib
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+
+# Se a requisição em andamento pode ler das réplicas. ContextVar pelo mesmo
+# motivo de core/metricas.py: sob ASGI as consultas rodam em outra thread.
+_ler_da_replica = ContextVar("ler_da_replica", default=False)
+# Réplicas usadas dentro de um observar_leituras(). Um conjunto mutável (e não
+# o valor da ContextVar) para que as leituras feitas em um sync_to_async, que
+# roda numa cópia do contexto, também apareçam.
+_replicas_lidas = ContextVar("replicas_lidas", default=None)
+
+METODOS_LEITURA = {"GET", "HEAD", "OPTIONS"}
+
+
+@contextmanager
+def ler_do_primario():
+    """
+    Manda para o primário as leituras do bloco, mesmo numa requisição
+    liberada para as réplicas.
+    """
+    token = _ler_da_replica.set(False)
+    try:
+        yield
+    finally:
+        _ler_da_replica.reset(token)
+
+
+@contextmanager
+def observar_leituras():
+    """
+    Devolve o conjunto das réplicas lidas dentro do bloco (vazio se todas as
+    leituras foram para o primário).
+    """
+    lidas = set()
+    token = _replicas_lidas.set(lidas)
+    try:
+        yield lidas
+    finally:
+        _replicas_lidas.reset(token)
+
+
+def identificar_cliente(request):
+    """
+    Identificação do cliente: o cabeçalho X-Cliente-Id ou, sem ele, o IP.
+    """
+    return request.headers.get("X-Cliente-Id") or request.META.get("REMOTE_ADDR", "")
+
+
+def _chave_cliente(request):
+    return "replica_fixo:" + hashlib.blake2b(identificar_cliente(request).encode(), digest_size=12).hexdigest()
+
+
+class RoteadorReplicas:
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if replicas and _ler_da_replica.get():
+            replica = random.choice(replicas)
+            lidas = _replicas_lidas.get()
+            if lidas is not None:
+                lidas.add(replica)
+            return replica
+        return None  # 'default'
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Réplicas têm os mesmos dados do primário: objetos lidos de uma e
+        # gravados no outro podem se relacionar.
+        return True
+
+
+class ReplicasMiddleware:
+    """
+    Libera a leitura das réplicas nas requisições de leitura de clientes que
+    não escreveram nos últimos REPLICA_FIXAR_SEGUNDOS, e marca o cliente
+    depois de cada escrita com sucesso.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _pode_ler_da_replica(self, request):
+        if not settings.DATABASE_REPLICAS or request.method not in METODOS_LEITURA:
+            return False
+        return cache.get(_chave_cliente(request)) is None
+
+    def _depois(self, request, response):
+        if request.method not in METODOS_LEITURA and response.status_code < 400 and settings.DATABASE_REPLICAS:
+            cache.set(_chave_cliente(request), True, settings.REPLICA_FIXAR_SEGUNDOS)
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _ler_da_replica.set(self._pode_ler_da_replica(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _ler_da_replica.reset(token)
+        return self._depois(request, response)
+
+    async def __acall__(self, request):
+        token = _ler_da_replica.set(self._pode_ler_da_replica(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _ler_da_replica.reset(token)
+        return self._depois(request, response)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -47,6 +48,10 @@ INSTALLED_APPS = [
 ]
 # mudança
 MIDDLEWARE = [
+    'core.metricas.MetricasMiddleware',  # primeiro, para medir a requisição inteira
+    'core.perfilador.PerfilMiddleware',
+    'core.replicas.ReplicasMiddleware',
+    'core.admissao.AdmissaoMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -82,16 +87,34 @@ WSGI_APPLICATION = 'core.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.mysql',
+        # Backend MySQL do Django com pool de conexões (core/db/pool.py)
+        'ENGINE': 'core.db.mysql_pool',
         'NAME': 'db_escola',        # seu banco no MySQL
         'USER': 'root',          # usuário do MySQL
         'PASSWORD': '46230769',        # senha do MySQL
         'HOST': 'localhost',            # ou IP do servidor MySQL
         'PORT': '3306',                 # porta padrão do MySQL
-        
-    }
+        # O pool é por processo: com N workers o MySQL recebe até
+        # N * TAMANHO_MAXIMO conexões (mantenha abaixo do max_connections).
+        'POOL': {
+            'TAMANHO_MAXIMO': 10,       # conexões abertas no máximo
+            'TEMPO_ESPERA': 10,         # segundos esperando uma conexão livre
+            'IDADE_MAXIMA': 1800,       # recicla antes do wait_timeout do MySQL
+            'VERIFICAR_APOS': 1,        # ping em conexões paradas há mais que isso
+        },
+    },
+    # Réplicas de leitura: mesmo formato do 'default', apontando para o
+    # servidor réplica, e o alias listado em DATABASE_REPLICAS. Ex:
+    # 'replica': {'ENGINE': 'core.db.mysql_pool', 'NAME': 'db_escola', 'HOST': 'replica1', ...},
 }
 
+# Leituras das rotas GET vão para as réplicas (core/replicas.py); vazio =
+# tudo no 'default'. Depois de escrever, o cliente lê do primário por
+# REPLICA_FIXAR_SEGUNDOS (deixe acima do atraso normal da replicação).
+DATABASE_ROUTERS = ['core.replicas.RoteadorReplicas']
+DATABASE_REPLICAS = []
+REPLICA_FIXAR_SEGUNDOS = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -133,3 +156,137 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Paginação e streaming das consultas de alunos
+PAGINACAO_LIMITE_PADRAO = 100    # itens por página quando o cliente não informa 'limite'
+PAGINACAO_LIMITE_MAXIMO = 1000   # teto para o 'limite' pedido pelo cliente
+STREAMING_CHUNK_SIZE = 2000      # linhas lidas do banco por bloco no modo streaming
+
+# Consultas de vários registros de uma vez (?ids=1,2,3 nas rotas '-por-ids')
+CONSULTA_IDS_MAXIMO = 500        # ids aceitos por consulta
+
+# Inserção em lote
+BULK_BATCH_SIZE = 500            # linhas por INSERT no bulk_create
+LOTE_MAXIMO_ITENS = 10000        # itens aceitos por requisição nos endpoints de lote
+
+# Tarefas em segundo plano (cadastro_aluno/tarefas.py): lotes grandes,
+# importação de CSV e remoção em massa, acompanhadas por GET /tarefas/{id}.
+# Com TAREFAS_EXECUTAR_NO_PROCESSO = False só o `manage.py processar_tarefas`
+# executa as tarefas (o servidor só enfileira).
+TAREFAS_EXECUTAR_NO_PROCESSO = True
+TAREFAS_TRABALHADORES = 2           # threads por processo (servidor ou comando)
+TAREFAS_FILA_MAXIMA = 20            # pendentes + em execução; acima disso, 503
+TAREFAS_MAXIMO_ITENS = 200000       # itens (ou ids) por tarefa
+TAREFAS_RETRY_503 = 30              # segundos no Retry-After da fila cheia
+TAREFAS_INTERVALO_CONSULTA = 1.0    # segundos entre consultas à fila no comando
+TAREFAS_TEMPO_SEM_PROGRESSO = 600   # segundos até uma tarefa parada ser dada como interrompida
+TAREFAS_CORPO_MAXIMO = 64 * 1024 * 1024  # bytes do JSON de /tarefas/inserir-lote; acima disso, 413
+# CSVs recebidos por /tarefas/importar-csv ficam aqui até a tarefa terminar.
+# Com o `processar_tarefas` em outra máquina, o diretório precisa ser compartilhado.
+TAREFAS_DIRETORIO = BASE_DIR / 'tarefas'
+
+# Busca de alunos por nome (índice de trigramas)
+BUSCA_LIMITE_PADRAO = 20         # alunos devolvidos quando o cliente não informa 'limite'
+BUSCA_LIMITE_MAXIMO = 200
+BUSCA_SIMILARIDADE_MINIMA = 0.3  # fração mínima dos trigramas da busca presentes no nome
+BUSCA_FATOR_CANDIDATOS = 4       # candidatos lidos do índice por aluno devolvido
+
+# Ranking de alunos pela média das notas (cadastro_aluno/ranking.py)
+RANKING_N_MAXIMO = 100           # teto para o 'n' pedido no /ranking
+
+# Índice de CEPs em memória (cadastro_aluno/indice_cep.py). Cada processo tem
+# o seu; a recarga periódica (numa thread, sem parar as buscas) pega endereços
+# gravados por outros processos.
+INDICE_CEP_TTL_SEGUNDOS = 300    # 0 = nunca recarregar por tempo
+
+# Cache
+# O alias 'disciplinas' guarda o catálogo de disciplinas. Para compartilhar o
+# cache entre processos basta trocar o BACKEND (ex: RedisCache, PyMemcacheCache).
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'disciplinas': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'disciplinas',
+        'TIMEOUT': 300,                  # segundos
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    },
+    'ranking': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'ranking',
+        'TIMEOUT': 600,
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    },
+    'geografia': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'geografia',
+        'TIMEOUT': 600,
+    },
+    # Versões das tabelas (ETags, cadastro_aluno/etag.py). Com mais de um
+    # processo (uvicorn --workers, manage.py processar_tarefas) precisa ser
+    # um cache compartilhado, ex:
+    #   {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://127.0.0.1:6379/1'}
+    # Em memória, cada processo só vê as próprias escritas (o check
+    # cadastro_aluno.W001 avisa).
+    'versoes': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'versoes',
+    },
+}
+VERSOES_TABELAS_CACHE = 'versoes'
+# Segundos de vida de cada versão. Ao expirar, a tabela ganha uma versão nova
+# (e as rotas, ETags novos): é o atraso máximo para um processo que não viu
+# uma escrita (cache em memória, ou o incremento perdido) voltar a acertar.
+VERSOES_TABELAS_TTL = 300
+
+# Respostas JSON (core/renderizacao.py). Com True as rotas de listagem que
+# devolvem linhas do ORM pulam a validação do pydantic por linha e vão direto
+# para o encoder. Só ligue depois de conferir que os .values() dessas rotas
+# batem com os schemas de resposta (o benchmarks/serializacao.py mede o ganho).
+API_SAIDA_CONFIAVEL = False
+
+# Controle de admissão das rotas de cadastro_aluno (core/admissao.py).
+# Por classe: TAXA requisições/s por cliente, com até RAJADA acumuladas (acima
+# disso, 429), e no máximo CONCORRENCIA em andamento por processo, esperando
+# até ESPERA segundos por uma vaga (acima disso, 503). Some a CONCORRENCIA das
+# classes com o TAMANHO_MAXIMO do pool de conexões em mente.
+ADMISSAO_ATIVA = True
+ADMISSAO_PREFIXO = '/api/v1/cadastro_aluno/'
+ADMISSAO_CLASSES = {
+    'leitura': {'TAXA': 20, 'RAJADA': 40, 'CONCORRENCIA': 32, 'ESPERA': 0.05},
+    'varredura': {'TAXA': 2, 'RAJADA': 5, 'CONCORRENCIA': 4, 'ESPERA': 0.1},
+    'escrita': {'TAXA': 5, 'RAJADA': 20, 'CONCORRENCIA': 8, 'ESPERA': 0.1},
+}
+# GETs que leem muitas linhas (listagens, buscas, exportação, agregações).
+ADMISSAO_VARREDURAS = {
+    'consultar_alunos', 'consultar_alunos_detalhe', 'consultar_alunos_por_nome',
+    'exportar_alunos', 'consulta_enderecos_por_estado', 'consultar_notas_por_disciplina',
+    'consultar_boletim', 'consultar_ranking', 'consultar_alunos_por_localidade',
+}
+ADMISSAO_RETRY_503 = 1          # segundos no Retry-After do 503
+# Alias de CACHES compartilhado para os limites por cliente; None = em memória
+ADMISSAO_CACHE = None
+# Cabeçalho com o IP do cliente escrito pelo proxy reverso (ex:
+# 'X-Forwarded-For'). Só configure se o servidor não aceita conexões diretas:
+# senão o cliente escolhe o próprio IP. None = REMOTE_ADDR.
+ADMISSAO_CABECALHO_CLIENTE = None
+
+# Perfil de requisições sob demanda (core/perfilador.py). Com PERFIL_TOKEN
+# definido, uma requisição com o cabeçalho "X-Perfil: <token>" é perfilada
+# (e o mesmo cabeçalho dá acesso a /api/v1/perfis); PERFIL_AMOSTRAGEM perfila
+# também essa fração das rotas sob PERFIL_PREFIXO, sem cabeçalho.
+# Só funciona sob WSGI: sob ASGI (core.asgi, uvicorn) nenhuma requisição é
+# perfilada, nem com o token, e a resposta não traz X-Perfil-Id.
+PERFIL_TOKEN = os.environ.get('PERFIL_TOKEN')
+PERFIL_AMOSTRAGEM = 0.0
+PERFIL_PREFIXO = '/api/v1/cadastro_aluno/'
+PERFIL_MODO = 'amostragem'              # ou 'deterministico' (cProfile)
+PERFIL_INTERVALO = 0.001                # segundos entre amostras da pilha
+PERFIL_DIRETORIO = BASE_DIR / 'perfis'
+PERFIL_MAXIMO = 100                     # perfis guardados; os mais antigos são apagados
+
+# Métricas por rota (core/metricas.py, expostas em /api/v1/metrics)
+METRICAS_LIMITES_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+METRICAS_LIMITES_CONSULTAS = (0, 1, 2, 5, 10, 20, 50, 100)
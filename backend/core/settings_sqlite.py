@@ -0,0 +1,49 @@
+"""
+Configurações para rodar a API sem o MySQL, com um SQLite local no lugar.
+
+Usado pelos benchmarks (benchmarks/carga.py) e para rodar os testes na
+máquina de desenvolvimento:
+
+    python manage.py test cadastro_aluno --settings=core.settings_sqlite
+"""
+import os
+
+from core.settings import *  # noqa: F401,F403
+from core.settings import BASE_DIR
+
+# Os bancos de teste (e o dos benchmarks) são montados direto dos models, sem
+# rodar as migrações ('MIGRATE': False): as tabelas legadas vieram prontas do
+# MySQL de produção, então o 0001 as declara com managed=False e não as cria,
+# e o 0002 só passa o managed para True no estado. Num banco novo o 0003 já
+# falharia. As migrações são testadas à parte (MigracoesTests), num banco com
+# as tabelas legadas criadas antes.
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('SQLITE_NAME', BASE_DIR / 'db.sqlite3'),
+        # Espera o lock de escrita em vez de falhar com "database is locked"
+        # quando várias threads escrevem ao mesmo tempo. O IMMEDIATE pega o
+        # lock já no início do atomic: uma transação que lê e depois escreve
+        # (ex: o reindex da busca) não tem como esperar pelo lock no meio.
+        'OPTIONS': {'timeout': 30, 'transaction_mode': 'IMMEDIATE'},
+        'TEST': {'MIGRATE': False},
+    },
+    # Réplica de leitura para testar o core/replicas.py. O SQLite não
+    # replica, então ela só recebe leituras se listada em DATABASE_REPLICAS
+    # (os testes fazem isso com override_settings).
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('SQLITE_REPLICA_NAME', BASE_DIR / 'db_replica.sqlite3'),
+        'OPTIONS': {'timeout': 30},
+        'TEST': {'MIGRATE': False},
+    },
+}
+
+# Sem controle de admissão (core/admissao.py): nos testes e benchmarks todas
+# as requisições vêm do mesmo cliente. Os testes do próprio controle o ligam
+# com override_settings.
+ADMISSAO_ATIVA = False
+
+# Um processo só (testes, benchmarks, runserver): as versões das tabelas
+# podem ficar em memória.
+SILENCED_SYSTEM_CHECKS = ['cadastro_aluno.W001']
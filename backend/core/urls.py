@@ -1,17 +1,75 @@
 from django.contrib import admin
+from django.core.exceptions import RequestDataTooBig
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
 from django.urls import path
 from ninja import NinjaAPI, Redoc
 from cadastro_aluno.api import router as router_cadastro_alunos
+from cadastro_aluno.api_async import router as router_cadastro_alunos_async
+from core import perfilador
+from core.metricas import registro as registro_metricas
+from core.renderizacao import RendererRapido
 
 api = NinjaAPI(
     version= "1.0",
     title="API para o sistema de escola do IBMEC",
     description="Essa api servem para controlar as notas dos alunos",
-    docs=Redoc()
+    docs=Redoc(),
+    # orjson quando instalado; ver core/renderizacao.py
+    renderer=RendererRapido(),
 )
 
 
+@api.exception_handler(RequestDataTooBig)
+def corpo_muito_grande(request, exc):
+    """
+    Corpo acima de DATA_UPLOAD_MAX_MEMORY_SIZE: 413 em vez do 500 padrão.
+    Lotes maiores vão por /tarefas/inserir-lote (ver TAREFAS_CORPO_MAXIMO).
+    """
+    return api.create_response(request, {"mensagem": f"Corpo da requisição muito grande: {exc}"}, status=413)
+
+
 api.add_router("/cadastro_aluno/", router_cadastro_alunos)#  
+# Mesmos endpoints em async def, para rodar sob ASGI (ver core/asgi.py)
+api.add_router("/cadastro_aluno/async/", router_cadastro_alunos_async)
+
+
+@api.get("/metrics", include_in_schema=False)
+def metricas(request):
+    """
+    Métricas por rota deste processo no formato texto do Prometheus.
+    """
+    return HttpResponse(registro_metricas.exportar(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# Perfis gravados pelo core.perfilador.PerfilMiddleware. Pedem o mesmo
+# cabeçalho X-Perfil que dispara o perfil: revelam o código por dentro.
+@api.get("/perfis", include_in_schema=False)
+def listar_perfis(request):
+    """
+    Perfis no buffer circular, do mais recente para o mais antigo.
+    """
+    if not perfilador.token_valido(request):
+        return JsonResponse({"mensagem": "Informe o token de perfil no cabeçalho X-Perfil."}, status=403)
+    return perfilador.listar()
+
+
+@api.get("/perfis/{perfil_id}/{formato}", include_in_schema=False)
+def baixar_perfil(request, perfil_id: str, formato: str):
+    """
+    Arquivo de um perfil: 'pstats' (python -m pstats) ou 'collapsed' (flamegraph).
+    """
+    if not perfilador.token_valido(request):
+        return JsonResponse({"mensagem": "Informe o token de perfil no cabeçalho X-Perfil."}, status=403)
+    caminho = perfilador.arquivo(perfil_id, formato)
+    if caminho is None:
+        return JsonResponse({"mensagem": f"Perfil '{perfil_id}' não encontrado em '{formato}'."}, status=404)
+    try:
+        conteudo = open(caminho, "rb")
+    except FileNotFoundError:
+        # Descartado pelo buffer circular entre a verificação e a abertura.
+        raise Http404(f"Perfil '{perfil_id}' não encontrado em '{formato}'.")
+    return FileResponse(conteudo, as_attachment=True, filename=caminho.name,
+                        content_type=perfilador.FORMATOS[formato])
 
 urlpatterns = [
     path('admin/', admin.site.urls),
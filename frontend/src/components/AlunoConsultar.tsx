@@ -13,6 +13,13 @@ interface Aluno {
   endereco_id?: number; 
 }
 
+// Espelha o 'AlunosPaginaSchema' devolvido por /consultar-alunos
+interface PaginaAlunos {
+  itens: Aluno[];
+  proximo_cursor: number | null;
+  limite: number;
+}
+
 // --- Componente ---
 export default function AlunoConsultar() {
   // --- Estados ---
@@ -32,9 +39,18 @@ export default function AlunoConsultar() {
     setErro(null);
     setResultados([]); // Limpa resultados anteriores
     try {
-      const res = await api.get("consultar-alunos");
-      setResultados(res.data);
-      if (res.data.length === 0) {
+      // O endpoint é paginado por cursor: segue 'proximo_cursor' até o fim.
+      const todos: Aluno[] = [];
+      let cursor: number | null = null;
+      do {
+        const res: { data: PaginaAlunos } = await api.get("consultar-alunos", {
+          params: cursor === null ? {} : { cursor },
+        });
+        todos.push(...res.data.itens);
+        cursor = res.data.proximo_cursor;
+      } while (cursor !== null);
+      setResultados(todos);
+      if (todos.length === 0) {
         setErro("Nenhum aluno encontrado.");
       }
     } catch (err) {